@@ -1,12 +1,16 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
-from .models import User, Order, OrderHistory
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils import timezone
+from .models import ArchivedOrder, ArchivedOrderHistory, OutboxMessage, User, Order, OrderHistory
+from .search import SEARCH_FIELDS, search_orders
 
 
 @admin.register(User)
 class UserAdmin(DjangoUserAdmin):
     fieldsets = DjangoUserAdmin.fieldsets + (
-        ("Роль", {"fields": ("role",)}),
+        ("Роль", {"fields": ("role", "categories")}),
     )
     list_display = ("username", "email", "first_name", "last_name", "role", "is_active", "is_staff")
     list_filter = ("role", "is_active", "is_staff")
@@ -16,11 +20,78 @@ class UserAdmin(DjangoUserAdmin):
 class OrderAdmin(admin.ModelAdmin):
     list_display = ("id", "created_at", "category", "customer_name", "status", "assigned_master", "dispatcher")
     list_filter = ("status", "category")
-    search_fields = ("customer_name", "customer_contact", "address", "description")
+    search_fields = SEARCH_FIELDS
+    search_help_text = "Поиск по словам: клиент, контакт, адрес, описание, категория."
+
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый индекс вместо icontains по каждому полю; слова короче
+        # search.MIN_WORD — по-прежнему icontains (core.search).
+        return search_orders(queryset, search_term), False
+
+    def change_view(self, request, object_id, form_url="", extra_context=None):
+        # Закрытая заявка могла уйти в архив (core.archive): ссылки на неё ведут туда же по id.
+        if (object_id.isdigit() and not Order.objects.filter(id=object_id).exists()
+                and ArchivedOrder.objects.filter(id=object_id).exists()):
+            return redirect(reverse("admin:core_archivedorder_change", args=[object_id]))
+        return super().change_view(request, object_id, form_url, extra_context)
 
 
 @admin.register(OrderHistory)
 class OrderHistoryAdmin(admin.ModelAdmin):
     list_display = ("order", "timestamp", "changed_by", "old_status", "new_status")
     list_filter = ("old_status", "new_status")
+    ordering = ("-timestamp",)
+
+
+class ArchivedOrderHistoryInline(admin.TabularInline):
+    model = ArchivedOrderHistory
+    fields = ("timestamp", "changed_by", "old_status", "new_status", "comment")
+    ordering = ("-timestamp",)
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """Архив только для чтения: заявки переносит core.archive."""
+    list_display = ("id", "created_at", "category", "customer_name", "status", "assigned_master", "archived_at")
+    list_filter = ("status", "category")
+    search_fields = ("=id", *SEARCH_FIELDS)
+    ordering = ("-created_at", "-id")
+    show_full_result_count = False
+    inlines = [ArchivedOrderHistoryInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    """Outbox уведомлений (core.notifications): просмотр и повтор недоставленных."""
+    list_display = ("id", "created_at", "channel", "address", "order_id", "event", "status", "attempts", "sent_at")
+    list_filter = ("status", "channel")
+    search_fields = ("address", "=order_id")
+    ordering = ("-id",)
+    show_full_result_count = False
+    actions = ["retry"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
+    @admin.action(description="Отправить повторно")
+    def retry(self, request, queryset):
+        n = queryset.exclude(status=OutboxMessage.SENT).update(
+            status=OutboxMessage.PENDING, attempts=0, available_at=timezone.now())
+        self.message_user(request, f"Поставлено в очередь повторно: {n}.")
@@ -0,0 +1,233 @@
+"""
+Длительности этапов заявки: создание → назначение, назначение → начало
+работ, начало работ → завершение, в разрезе категории, мастера и дня.
+
+Моменты этапов берутся из истории (OrderHistory): первое назначение и
+первое начало работ; конец — Order.completed_at. Длительности считает
+один SQL-запрос (ROLLUP_SQL) с условной агрегацией истории по заявке — без
+обхода заявок в Python — и сразу сворачивает их в гистограмму: строки
+LifecycleRollup (день × категория × мастер × этап × корзина BUCKETS) с
+числом заявок и суммой секунд. День — дата окончания этапа по TIME_ZONE.
+
+Свёртки пересчитываются за последние ANALYTICS_REFRESH_DAYS дней задачей
+core.tasks.refresh_lifecycle_rollups (Celery beat, CELERY_BEAT_SCHEDULE):
+строки этих дней удаляются и пишутся заново, так что повторный прогон
+безопасен. Полный пересчёт — manage.py rebuild_lifecycle_rollups;
+архив (core.archive) учитывается наравне с живыми заявками.
+
+Страница статистики читает только свёртки: перцентили по корзинам
+(с линейной интерполяцией внутри корзины), и готовый результат лежит в
+кэше до следующего пересчёта (версия в ключе VERSION_KEY). Пересчёт идёт
+в воркере Celery, и с кэшем в памяти процесса новая версия до веб-процесса
+не доходит, поэтому результат живёт не дольше интервала пересчёта
+(SUMMARY_TTL).
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import LifecycleRollup, User
+
+STAGES = [key for key, _ in LifecycleRollup.STAGE_CHOICES]
+PERCENTILES = (50, 90)
+
+# Верхние границы корзин гистограммы, секунды; последняя корзина — всё,
+# что дольше 30 дней.
+BUCKETS = [
+    60, 5 * 60, 15 * 60, 30 * 60, 3600, 2 * 3600, 4 * 3600, 8 * 3600,
+    86400, 2 * 86400, 4 * 86400, 7 * 86400, 14 * 86400, 30 * 86400,
+]
+
+# Разрезы страницы статистики: разрез -> поле LifecycleRollup.
+DIMENSIONS = {"category": "category", "master": "master_id", "day": "day"}
+
+VERSION_KEY = "analytics:lifecycle:version"
+# Не дольше интервала refresh-lifecycle-rollups в CELERY_BEAT_SCHEDULE.
+SUMMARY_TTL = 15 * 60
+
+_SECONDS = {
+    "sqlite": "((julianday({end}) - julianday({start})) * 86400.0)",
+    "postgresql": "EXTRACT(EPOCH FROM ({end} - {start}))",
+}
+_DAY = {
+    "sqlite": "django_datetime_cast_date({ts}, '{tz}', 'UTC')",
+    "postgresql": "(({ts}) AT TIME ZONE '{tz}')::date",
+}
+
+ROLLUP_SQL = """
+WITH orders AS (
+    SELECT id, category, assigned_master_id, created_at, completed_at FROM core_order
+    UNION ALL
+    SELECT id, category, assigned_master_id, created_at, completed_at FROM core_archivedorder
+), history AS (
+    SELECT order_id, new_status, timestamp FROM core_orderhistory
+    UNION ALL
+    SELECT order_id, new_status, timestamp FROM core_archivedorderhistory
+), touched AS (
+    SELECT DISTINCT order_id FROM history WHERE timestamp >= %s AND timestamp < %s
+), stages AS (
+    SELECT h.order_id,
+           MIN(CASE WHEN h.new_status = 'assigned' THEN h.timestamp END) AS assigned_at,
+           MIN(CASE WHEN h.new_status = 'in_progress' THEN h.timestamp END) AS started_at
+    FROM history h JOIN touched t ON t.order_id = h.order_id
+    GROUP BY h.order_id
+), durations AS (
+    SELECT o.category, o.assigned_master_id AS master_id, 'assign' AS stage,
+           s.assigned_at AS ended_at, {assign} AS seconds
+    FROM stages s JOIN orders o ON o.id = s.order_id
+    WHERE s.assigned_at IS NOT NULL
+    UNION ALL
+    SELECT o.category, o.assigned_master_id, 'start', s.started_at, {start}
+    FROM stages s JOIN orders o ON o.id = s.order_id
+    WHERE s.started_at IS NOT NULL AND s.assigned_at IS NOT NULL
+    UNION ALL
+    SELECT o.category, o.assigned_master_id, 'complete', o.completed_at, {complete}
+    FROM stages s JOIN orders o ON o.id = s.order_id
+    WHERE o.completed_at IS NOT NULL AND s.started_at IS NOT NULL
+)
+SELECT {day} AS day, category, master_id, stage, {bucket} AS bucket, COUNT(*), SUM(seconds)
+FROM durations
+WHERE ended_at >= %s AND ended_at < %s AND seconds >= 0
+GROUP BY 1, 2, 3, 4, 5
+"""
+
+
+def rollup_sql(vendor: str) -> str:
+    seconds = _SECONDS[vendor]
+    bucket = "CASE {} ELSE {} END".format(
+        " ".join(f"WHEN seconds < {bound} THEN {i}" for i, bound in enumerate(BUCKETS)), len(BUCKETS))
+    return ROLLUP_SQL.format(
+        assign=seconds.format(start="o.created_at", end="s.assigned_at"),
+        start=seconds.format(start="s.assigned_at", end="s.started_at"),
+        complete=seconds.format(start="s.started_at", end="o.completed_at"),
+        day=_DAY[vendor].format(ts="ended_at", tz=settings.TIME_ZONE),
+        bucket=bucket,
+    )
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def refresh(days: int | None = None) -> int:
+    """
+    Пересчитать свёртки за последние days дней (включая сегодня); вернуть
+    число записанных строк.
+    """
+    days = settings.ANALYTICS_REFRESH_DAYS if days is None else days
+    today = timezone.localdate()
+    first_day = today - timedelta(days=days - 1)
+    start, end = _day_start(first_day), _day_start(today + timedelta(days=1))
+    bounds = [connection.ops.adapt_datetimefield_value(value) for value in (start, end)]
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(rollup_sql(connection.vendor), bounds + bounds)
+            rows = [
+                LifecycleRollup(day=day, category=category, master_id=master_id, stage=stage,
+                                bucket=bucket, count=count, total_seconds=total)
+                for day, category, master_id, stage, bucket, count, total in cursor.fetchall()
+            ]
+        LifecycleRollup.objects.filter(day__gte=first_day).delete()
+        LifecycleRollup.objects.bulk_create(rows, batch_size=1000)
+    transaction.on_commit(_bump_version)
+    return len(rows)
+
+
+def _bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+# ---------- перцентили ----------
+
+
+def bucket_bounds(bucket: int) -> tuple:
+    lower = BUCKETS[bucket - 1] if bucket else 0
+    upper = BUCKETS[bucket] if bucket < len(BUCKETS) else lower * 2
+    return lower, upper
+
+
+def percentile(histogram: dict, q: float) -> float | None:
+    """q-й перцентиль (секунды) по гистограмме {корзина: число}."""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = total * q / 100
+    seen = 0
+    for bucket in sorted(histogram):
+        count = histogram[bucket]
+        if seen + count >= rank:
+            lower, upper = bucket_bounds(bucket)
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return bucket_bounds(max(histogram))[1]
+
+
+def summary(days: int | None = None) -> dict:
+    """
+    Таблицы длительностей за последние days дней по разрезам DIMENSIONS:
+    {разрез: [{"key", "stages": [{"count", "avg", "p50", "p90"} по каждому
+    этапу STAGES]}]}. Все разрезы — из одного чтения свёрток; результат
+    кэшируется до следующего пересчёта.
+    """
+    days = settings.ANALYTICS_WINDOW_DAYS if days is None else days
+    key = f"analytics:lifecycle:{cache.get(VERSION_KEY, 0)}:{days}"
+    tables = cache.get(key)
+    if tables is None:
+        tables = _summary(days)
+        cache.set(key, tables, SUMMARY_TTL)
+    return tables
+
+
+def _summary(days):
+    since = timezone.localdate() - timedelta(days=days - 1)
+    cells = (LifecycleRollup.objects.filter(day__gte=since)
+             .values_list(*DIMENSIONS.values(), "stage", "bucket", "count", "total_seconds"))
+    histograms = {dimension: defaultdict(lambda: defaultdict(int)) for dimension in DIMENSIONS}
+    totals = {dimension: defaultdict(float) for dimension in DIMENSIONS}
+    for *values, stage, bucket, n, seconds in cells:
+        for dimension, value in zip(DIMENSIONS, values):
+            histograms[dimension][value, stage][bucket] += n
+            totals[dimension][value, stage] += seconds
+
+    masters = {value for value, _ in histograms["master"] if value}
+    names = {u.id: u.get_full_name() or u.username for u in User.objects.filter(id__in=masters)} if masters else {}
+    tables = {}
+    for dimension in DIMENSIONS:
+        keys = sorted({value for value, _ in histograms[dimension]}, key=lambda v: (v is None, v),
+                      reverse=dimension == "day")
+        rows = []
+        for value in keys:
+            stages = []
+            for stage in STAGES:
+                histogram = histograms[dimension].get((value, stage), {})
+                count = sum(histogram.values())
+                cell = {"count": count, "avg": totals[dimension][value, stage] / count if count else None}
+                for q in PERCENTILES:
+                    cell[f"p{q}"] = percentile(histogram, q)
+                stages.append(cell)
+            label = names.get(value, value) if dimension == "master" else value
+            rows.append({"key": "—" if label is None else label, "stages": stages})
+        tables[dimension] = rows
+    return tables
+
+
+def format_duration(seconds) -> str:
+    """1 д 2 ч, 3 ч 15 мин, 12 мин."""
+    if seconds is None:
+        return "—"
+    minutes = int(round(seconds / 60))
+    d, rest = divmod(minutes, 24 * 60)
+    h, m = divmod(rest, 60)
+    if d:
+        return f"{d} д {h} ч"
+    if h:
+        return f"{h} ч {m} мин"
+    return f"{m} мин"
@@ -1,7 +1,30 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
 
+    def ready(self):
+        from .caching import on_order_change, on_user_change
+        from .db import apply_sqlite_pragmas
+        from . import auth, geo, metrics, sync
+        from .models import Order, User
+        from .workload import invalidate_masters
+
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid="core.apply_sqlite_pragmas")
+        connection_created.connect(metrics.instrument_connection, dispatch_uid="core.metrics.query_timer")
+        post_save.connect(invalidate_masters, sender=User, dispatch_uid="core.workload.save")
+        post_delete.connect(invalidate_masters, sender=User, dispatch_uid="core.workload.delete")
+        post_save.connect(on_user_change, sender=User, dispatch_uid="core.caching.user_save")
+        post_delete.connect(on_user_change, sender=User, dispatch_uid="core.caching.user_delete")
+        post_save.connect(on_order_change, sender=Order, dispatch_uid="core.caching.order_save")
+        post_delete.connect(on_order_change, sender=Order, dispatch_uid="core.caching.order_delete")
+        post_save.connect(sync.on_order_change, sender=Order, dispatch_uid="core.sync.order_save")
+        post_delete.connect(sync.on_order_change, sender=Order, dispatch_uid="core.sync.order_delete")
+        pre_save.connect(geo.on_order_pre_save, sender=Order, dispatch_uid="core.geo.order_pre_save")
+        post_save.connect(geo.on_order_save, sender=Order, dispatch_uid="core.geo.order_save")
+        post_save.connect(auth.on_user_change, sender=User, dispatch_uid="core.auth.user_save")
+        post_delete.connect(auth.on_user_change, sender=User, dispatch_uid="core.auth.user_delete")
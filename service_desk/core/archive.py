@@ -0,0 +1,98 @@
+"""
+Архивация закрытых заявок.
+
+Заявки DONE/CANCELLED, закрытые больше settings.ARCHIVE_AFTER_DAYS дней
+назад, переносятся вместе с историей в ArchivedOrder/ArchivedOrderHistory
+с теми же id. Рабочие таблицы Order и OrderHistory остаются маленькими:
+списки, счётчики и индексы работают только с живыми заявками.
+
+Перенос идёт пачками по ARCHIVE_BATCH_SIZE заявок, каждая пачка — своя
+короткая транзакция, поэтому блокировки держатся доли секунды, а не всё
+время прогона. В PostgreSQL заявки пачки выбираются FOR UPDATE SKIP LOCKED:
+параллельный прогон или смена статуса не ждут друг друга.
+
+Заявка считается закрытой давно, если дата завершения (для отменённых —
+дата создания) старше порога и в истории нет записей новее порога:
+отменённую заявку можно снова назначить, и недавняя отмена её не
+архивирует.
+
+Запуск — задача core.tasks.archive_closed_orders (Celery beat, см.
+CELERY_BEAT_SCHEDULE) или manage.py archive_orders. Статистика не
+меняется: OrderCounter считает и архив (core.counters.actual_counts).
+Карточка диспетчера и админка находят заявку в архиве по тому же id.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderHistory, Order, OrderHistory, OrderStatus
+
+CLOSED_STATUSES = (OrderStatus.DONE, OrderStatus.CANCELLED)
+
+ORDER_FIELDS = (
+    "id", "category", "description", "address", "customer_name", "customer_contact", "status",
+    "created_at", "assigned_master_id", "dispatcher_id", "planned_date", "completed_at",
+    "lat", "lon", "geohash", "geocoded_at",
+)
+HISTORY_FIELDS = ("id", "order_id", "changed_by_id", "old_status", "new_status", "timestamp", "comment")
+
+
+def cutoff_for(days: int | None = None):
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def candidates(cutoff):
+    """Закрытые заявки без движения с cutoff."""
+    recent = OrderHistory.objects.filter(order_id=OuterRef("id"), timestamp__gte=cutoff)
+    return (Order.objects
+            .filter(status__in=CLOSED_STATUSES)
+            .alias(closed_at=Coalesce("completed_at", "created_at"))
+            .filter(closed_at__lt=cutoff)
+            .exclude(Exists(recent)))
+
+
+def archive_batch(cutoff, batch_size: int | None = None) -> int:
+    """Перенести одну пачку заявок в архив; вернуть число перенесённых."""
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(candidates(cutoff)
+                   .select_for_update(skip_locked=True)
+                   .order_by("id")
+                   .values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return 0
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(archived_at=now, **row)
+            for row in Order.objects.filter(id__in=ids).values(*ORDER_FIELDS)
+        ])
+        ArchivedOrderHistory.objects.bulk_create(
+            [ArchivedOrderHistory(**row)
+             for row in OrderHistory.objects.filter(order_id__in=ids).order_by().values(*HISTORY_FIELDS)],
+            batch_size=1000,
+        )
+        OrderHistory.objects.filter(order_id__in=ids).delete()
+        Order.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive_closed_orders(days: int | None = None, batch_size: int | None = None,
+                          max_batches: int | None = None, on_batch=None) -> int:
+    """Архивировать все подходящие заявки пачками; вернуть их число."""
+    cutoff = cutoff_for(days)
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        total += moved
+        batches += 1
+        if on_batch:
+            on_batch(total)
+    return total
+
@@ -0,0 +1,183 @@
+"""
+Автоназначение мастеров на заявки.
+
+Мастер выбирается по наименьшей оценке (score):
+- загрузка — число открытых заявок (ASSIGNED/IN_PROGRESS);
+- пересечения плановой даты с плановыми датами его открытых заявок
+  (ближе CONFLICT_WINDOW);
+- категория: мастер с подходящей категорией лучше универсала (пустой
+  список категорий), мастер с другими категориями не рассматривается.
+Мастера с MAX_OPEN_ORDERS открытыми заявками не рассматриваются.
+
+Загрузка берётся из индекса в памяти (core.workload), а не из COUNT по
+заявкам на каждый запрос.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+
+from .models import Order, User
+from .queries import new_orders_qs
+from .services import BulkResult, assign_master, bulk_assign_plan
+from .transitions import TRANSITIONS
+from .workload import LoadIndex, index
+
+CONFLICT_WINDOW = timedelta(hours=2)
+MAX_OPEN_ORDERS = 25
+
+# Веса оценки: одна открытая заявка = 1.
+LOAD_WEIGHT = 1.0
+CONFLICT_WEIGHT = 5.0
+GENERALIST_WEIGHT = 2.0
+
+
+# ---------- оценка ----------
+
+
+class Planner:
+    """
+    Выбор мастеров поверх индекса. Для пакета заявок учитывает ещё не
+    записанные назначения (reserve), не трогая сам индекс: его обновят
+    сервисы после фиксации.
+
+    Кандидаты категории лежат в куче по базовой оценке (загрузка и штраф
+    универсала). Пересечения дат только добавляют к ней, поэтому перебор
+    останавливается, как только база следующего кандидата не лучше
+    найденной оценки: обычно это один-два мастера, а не все.
+    """
+
+    def __init__(self, load_index: LoadIndex = index):
+        load_index.ensure_loaded()
+        self.index = load_index
+        self.reserved = defaultdict(list)  # master_id -> [planned_date]
+        self.heaps = {}                    # категория -> [(база, master_id)]
+
+    def candidates(self, category: str) -> tuple:
+        return self.index.by_category.get(_key(category), ()) + self.index.generalists
+
+    def base_score(self, master_id: int) -> float | None:
+        """Оценка без учёта дат или None, если мастер недоступен либо загружен до предела."""
+        master = self.index.masters.get(master_id)
+        if master is None:
+            return None
+        load = len(self.index.open.get(master_id, ())) + len(self.reserved.get(master_id, ()))
+        if load >= MAX_OPEN_ORDERS:
+            return None
+        return LOAD_WEIGHT * load + (0 if master.categories else GENERALIST_WEIGHT)
+
+    def conflicts(self, master_id: int, planned_date) -> int:
+        if not planned_date:
+            return 0
+        dates = (*self.index.open.get(master_id, {}).values(), *self.reserved.get(master_id, ()))
+        return sum(1 for other in dates if other and abs(other - planned_date) < CONFLICT_WINDOW)
+
+    def score(self, master_id: int, category: str, planned_date=None) -> float | None:
+        """Оценка мастера для заявки (меньше — лучше) или None, если мастер не подходит."""
+        master = self.index.masters.get(master_id)
+        if master is None or (master.categories and _key(category) not in master.categories):
+            return None
+        base = self.base_score(master_id)
+        if base is None:
+            return None
+        return base + CONFLICT_WEIGHT * self.conflicts(master_id, planned_date)
+
+    def _heap(self, key: str) -> list:
+        heap = self.heaps.get(key)
+        if heap is None:
+            heap = [(base, m) for m in self.candidates(key) if (base := self.base_score(m)) is not None]
+            heapq.heapify(heap)
+            self.heaps[key] = heap
+        return heap
+
+    def pick(self, category: str, planned_date=None) -> int | None:
+        """id лучшего мастера; при равной оценке — меньший id (детерминированно)."""
+        heap = self._heap(_key(category))
+        best, seen = None, []
+        while heap and (best is None or heap[0] < best):
+            base, master_id = heapq.heappop(heap)
+            current = self.base_score(master_id)
+            if current != base:
+                # Запись устарела (мастер получил заявку после её добавления).
+                if current is not None:
+                    heapq.heappush(heap, (current, master_id))
+                continue
+            seen.append((base, master_id))
+            candidate = (base + CONFLICT_WEIGHT * self.conflicts(master_id, planned_date), master_id)
+            if best is None or candidate < best:
+                best = candidate
+        for entry in seen:
+            heapq.heappush(heap, entry)
+        return best[1] if best else None
+
+    def reserve(self, master_id: int, planned_date=None):
+        # Записи мастера в кучах устаревают и обновятся при следующем pick.
+        self.reserved[master_id].append(planned_date)
+
+
+def _key(category: str) -> str:
+    return (category or "").strip().lower()
+
+
+# ---------- назначение ----------
+
+
+NO_MASTER = "Нет подходящего мастера."
+
+
+def auto_assign(order: Order, dispatcher: User, planned_date=None) -> User:
+    """Назначить заявке лучшего мастера (через assign_master); ValueError, если некого."""
+    planned_date = planned_date or order.planned_date
+    master_id = Planner().pick(order.category, planned_date)
+    master = User.objects.filter(id=master_id, role="master", is_active=True).first() if master_id else None
+    if master is None:
+        index.invalidate()
+        raise ValueError(NO_MASTER)
+    assign_master(order, dispatcher, master, planned_date=planned_date)
+    return master
+
+
+@transaction.atomic
+def auto_assign_batch(dispatcher: User, order_ids=None, limit: int | None = None) -> BulkResult:
+    """
+    Автоназначение пачки: указанных заявок или всей очереди NEW (старые первыми).
+    План строится в памяти, затем записывается bulk_assign по мастеру.
+    """
+    t = TRANSITIONS["assign"]
+    if dispatcher.role not in t.roles:
+        raise PermissionError(t.role_error)
+
+    result = BulkResult()
+    if order_ids is None:
+        qs = new_orders_qs()
+    else:
+        order_ids = {int(i) for i in order_ids}
+        qs = Order.objects.filter(id__in=order_ids, status__in=t.sources)
+    qs = qs.order_by("created_at", "id").only("id", "category", "planned_date", "status")
+    orders = list(qs[:limit] if limit else qs)
+    if order_ids is not None:
+        for missing in order_ids - {o.id for o in orders}:
+            result.errors[missing] = t.error
+
+    planner = Planner()
+    plan = defaultdict(list)
+    for order in orders:
+        master_id = planner.pick(order.category, order.planned_date)
+        if master_id is None:
+            result.errors[order.id] = NO_MASTER
+            continue
+        planner.reserve(master_id, order.planned_date)
+        plan[master_id].append(order.id)
+
+    masters = User.objects.filter(role="master", is_active=True).in_bulk(list(plan))
+    missing = [master_id for master_id in plan if master_id not in masters]
+    if missing:
+        index.invalidate()
+        for master_id in missing:
+            result.errors.update({order_id: NO_MASTER for order_id in plan.pop(master_id)})
+    if plan:
+        written = bulk_assign_plan({masters[m]: ids for m, ids in plan.items()}, dispatcher)
+        result.updated = written.updated
+        result.errors.update(written.errors)
+    return result
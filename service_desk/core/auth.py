@@ -0,0 +1,116 @@
+"""
+Пользователь запроса без запроса к core_user.
+
+AuthenticationMiddleware Django на каждый запрос читает пользователя из
+базы. Для частых JSON-точек (счётчик новых заявок, start/complete
+мастера) это половина всех запросов: вместе с сессией (SESSION_PROFILE,
+см. settings) — весь SQL до вызова представления.
+
+get_user() держит в памяти процесса копию пользователя на USER_CACHE_TTL
+секунд. Проверки Django сохраняются: бэкенд из сессии должен быть в
+AUTHENTICATION_BACKENDS, а хеш сессии — совпадать с хешем пароля
+пользователя (смена пароля разлогинивает сразу). Сохранение или
+удаление User в этом процессе сбрасывает запись (сигналы в apps.py);
+изменения из других процессов видны не позже чем через TTL.
+
+Async-представления получают пользователя через aget_user(): сессия и
+пользователь читаются одним переходом в поток, дальше request.user —
+обычный объект в памяти (в Django 4.2 нет request.auser()).
+"""
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.views import redirect_to_login
+from django.utils.crypto import constant_time_compare
+
+_users = {}  # id пользователя (как в сессии) -> (истекает, пользователь)
+_lock = threading.Lock()
+_stats = {"hit": 0, "miss": 0}
+
+
+def ttl() -> float:
+    return getattr(settings, "USER_CACHE_TTL", 0)
+
+
+def get_user(request):
+    user_id = request.session.get(SESSION_KEY)
+    backend_path = request.session.get(BACKEND_SESSION_KEY)
+    if not ttl() or user_id is None or backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return auth.get_user(request)
+
+    key = str(user_id)
+    with _lock:
+        expires, cached = _users.get(key, (0, None))
+    session_hash = request.session.get(HASH_SESSION_KEY)
+    if cached is not None and expires > time.monotonic() and session_hash \
+            and constant_time_compare(session_hash, cached.get_session_auth_hash()):
+        _count("hit")
+        # Копия на запрос: представления не должны менять общий экземпляр.
+        user = _copy(cached)
+        user.backend = backend_path
+        return user
+
+    _count("miss")
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        with _lock:
+            _users[key] = (time.monotonic() + ttl(), _copy(user))
+    return user
+
+
+def _resolve(request):
+    request.user.is_authenticated  # вычислить SimpleLazyObject из middleware
+    return request.user
+
+
+async def aget_user(request):
+    """Пользователь запроса для async-кода (AnonymousUser, если не вошёл)."""
+    return await sync_to_async(_resolve)(request)
+
+
+def login_required_async(view):
+    """login_required для async-представлений (декоратор Django 4.2 их не поддерживает)."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _copy(user):
+    values = [getattr(user, f.attname) for f in user._meta.concrete_fields]
+    return user.__class__.from_db(user._state.db, None, values)
+
+
+def _count(result: str):
+    with _lock:
+        _stats[result] += 1
+
+
+def invalidate(user_id) -> None:
+    with _lock:
+        _users.pop(str(user_id), None)
+
+
+def clear() -> None:
+    with _lock:
+        _users.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        return dict(_stats)
+
+
+def on_user_change(sender, instance, **kwargs):
+    """post_save/post_delete User: роль, активность, пароль могли измениться."""
+    invalidate(instance.pk)
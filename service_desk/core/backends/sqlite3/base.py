@@ -0,0 +1,18 @@
+"""
+SQLite с транзакциями BEGIN IMMEDIATE (аналог OPTIONS["transaction_mode"]
+из Django 5.1).
+
+При обычном BEGIN транзакция сначала берёт блокировку чтения и повышает
+её до записи на первом изменении. Если за это время писал кто-то ещё,
+SQLite сразу возвращает SQLITE_BUSY, не дожидаясь busy_timeout. Так
+падает INSERT заявки: триггер полнотекстового индекса (core.search)
+читает таблицы FTS5 до записи. IMMEDIATE берёт блокировку записи в
+начале транзакции, и конкурирующие запросы ждут её в пределах
+busy_timeout.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE")
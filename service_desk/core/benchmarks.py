@@ -0,0 +1,412 @@
+"""
+Общие помощники для бенчмарков (management-команды bench_*).
+
+Бенчмарки работают на отдельной временной базе (как тестовый раннер),
+чтобы не засорять рабочую db.sqlite3 синтетическими заявками.
+"""
+import asyncio
+import http.cookiejar
+import threading
+import json
+import math
+import random
+import statistics
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+from datetime import timedelta
+from http import HTTPStatus
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.staticfiles.handlers import StaticFilesHandler
+from django.db import connection
+from django.test.testcases import LiveServerThread
+from django.utils import timezone
+
+from .models import Order, OrderHistory, OrderStatus, User
+
+CATEGORIES = ["Сантехника", "Электрика", "Отопление", "Бытовая техника", "Вентиляция"]
+STREETS = ["Ленина", "Мира", "Гагарина", "Советская", "Садовая", "Лесная"]
+
+
+@contextmanager
+def scratch_database(verbosity: int = 0, sqlite_file=None):
+    """
+    Создать временную базу с миграциями и удалить её на выходе.
+    sqlite_file — файл вместо базы в памяти (нужен, чтобы PRAGMA
+    профиля sqlite-tuned и блокировки вели себя как в работе).
+    """
+    old_name = connection.settings_dict["NAME"]
+    if sqlite_file and connection.vendor == "sqlite":
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = str(sqlite_file)
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+@contextmanager
+def explicit_created_at(model=Order, field_name: str = "created_at"):
+    """bulk_create с явной датой (auto_now_add иначе перезапишет значение)."""
+    field = model._meta.get_field(field_name)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+BENCH_PASSWORD = "bench-password"
+
+
+def seed_masters(count: int) -> list:
+    password = make_password(BENCH_PASSWORD)  # один хэш на всех — создание не упирается в PBKDF2
+    User.objects.bulk_create(
+        [User(username=f"bench_master_{i}", role="master", first_name=f"Мастер {i}", password=password)
+         for i in range(count)],
+        batch_size=1000,
+    )
+    return list(User.objects.filter(role="master", username__startswith="bench_master_"))
+
+
+def seed_orders(count: int, masters=(), days: int = 365, batch_size: int = 5000, seed: int = 42) -> None:
+    """Быстрое заполнение таблицы заявок через bulk_create пачками."""
+    rnd = random.Random(seed)
+    now = timezone.now()
+    span = days * 24 * 3600
+    statuses = [s for s, _ in OrderStatus.choices]
+    masters = list(masters)
+
+    with explicit_created_at():
+        batch = []
+        for i in range(count):
+            status = rnd.choice(statuses)
+            master = rnd.choice(masters) if masters and status != OrderStatus.NEW else None
+            batch.append(Order(
+                category=rnd.choice(CATEGORIES),
+                description=f"Синтетическая заявка {i}: не работает {rnd.choice(CATEGORIES).lower()}",
+                address=f"ул. {rnd.choice(STREETS)}, д. {rnd.randint(1, 200)}",
+                customer_name=f"Клиент {i}",
+                customer_contact=f"+7999{i:07d}",
+                status=status,
+                assigned_master=master,
+                created_at=now - timedelta(seconds=rnd.randint(0, span)),
+            ))
+            if len(batch) >= batch_size:
+                Order.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Order.objects.bulk_create(batch)
+
+
+# Путь заявки по статусам: история содержит переходы до текущего статуса.
+LIFECYCLE = [OrderStatus.NEW, OrderStatus.ASSIGNED, OrderStatus.IN_PROGRESS, OrderStatus.DONE]
+
+
+def seed_history(dispatcher=None, batch_size: int = 5000) -> int:
+    """
+    История для уже засеянных заявок: переходы по LIFECYCLE до статуса заявки
+    (отменённые — из NEW), по часу между шагами. Возвращает число записей.
+    """
+    written = 0
+    dispatcher_id = dispatcher.id if dispatcher else None
+    with explicit_created_at(OrderHistory, "timestamp"):
+        batch = []
+        rows = Order.objects.exclude(status=OrderStatus.NEW).values_list(
+            "id", "status", "created_at", "assigned_master_id")
+        for order_id, status, created_at, master_id in rows.iterator(chunk_size=batch_size):
+            if status == OrderStatus.CANCELLED:
+                steps = [(OrderStatus.NEW, OrderStatus.CANCELLED, dispatcher_id)]
+            else:
+                path = LIFECYCLE[:LIFECYCLE.index(status) + 1]
+                steps = [(old, new, dispatcher_id if new == OrderStatus.ASSIGNED else master_id)
+                         for old, new in zip(path, path[1:])]
+            for hour, (old, new, user_id) in enumerate(steps, 1):
+                batch.append(OrderHistory(order_id=order_id, old_status=old, new_status=new, changed_by_id=user_id,
+                                          timestamp=created_at + timedelta(hours=hour)))
+            if len(batch) >= batch_size:
+                OrderHistory.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            OrderHistory.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def seed_dispatcher(username: str = "bench_dispatcher") -> User:
+    return User.objects.create(username=username, role="dispatcher", password=make_password(BENCH_PASSWORD))
+
+
+def measure(fn, repeat: int = 5) -> float:
+    """Медианное время вызова fn() в миллисекундах."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def percentile(samples: list, p: float) -> float:
+    """Перцентиль p (0..100) методом ближайшего ранга."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    # Ранг ceil(p/100 * n); round() здесь округлял бы 95.5 к 96 (банковское округление).
+    rank = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    """Сводка по конечной точке: число запросов, req/s и перцентили в мс."""
+    return {
+        "requests": len(samples),
+        "throughput": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        **{f"p{p}": round(percentile(samples, p), 2) for p in (50, 95, 99)},
+    }
+
+
+def load_baseline(path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results: dict, **meta) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "endpoints": results}, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float = 0.2) -> list:
+    """
+    Регрессии относительно базовой линии: [(точка, метрика, было, стало)].
+    Задержка — регрессия, если выросла больше чем в 1 + tolerance раз,
+    пропускная способность — если упала больше чем в 1 + tolerance раз,
+    ошибки — если их стало больше.
+    Точки, которых нет в базовой линии, не сравниваются.
+    """
+    regressions = []
+    for endpoint, current in results.items():
+        before = baseline.get("endpoints", {}).get(endpoint)
+        if not before:
+            continue
+        for metric in ("p50", "p95", "p99"):
+            if before.get(metric) and current[metric] > before[metric] * (1 + tolerance):
+                regressions.append((endpoint, metric, before[metric], current[metric]))
+        if before.get("throughput") and current["throughput"] * (1 + tolerance) < before["throughput"]:
+            regressions.append((endpoint, "throughput", before["throughput"], current["throughput"]))
+        if current.get("errors", 0) > before.get("errors", 0):
+            regressions.append((endpoint, "errors", before.get("errors", 0), current["errors"]))
+    return regressions
+
+
+# ---------- HTTP-нагрузка на живой сервер ----------
+
+
+@contextmanager
+def live_server():
+    """Поднять многопоточный WSGI-сервер Django на свободном порту текущей базы."""
+    overrides = {"default": connection} if connection.is_in_memory_db() else None
+    thread = LiveServerThread("127.0.0.1", StaticFilesHandler, connections_override=overrides)
+    thread.daemon = True
+    thread.start()
+    thread.is_ready.wait()
+    if thread.error:
+        raise thread.error
+    try:
+        yield f"http://127.0.0.1:{thread.port}"
+    finally:
+        thread.terminate()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Редирект после POST не входит в замер конечной точки: 302 — это успех.
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """Клиент с cookie и CSRF-токеном для сценариев нагрузки (одна сессия на поток)."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.location = ""  # Location последнего ответа-редиректа
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def csrf_token(self) -> str:
+        return next((c.value for c in self.cookies if c.name == "csrftoken"), "")
+
+    def request(self, path: str, data: dict | None = None) -> tuple:
+        """Выполнить запрос; вернуть (HTTP-статус, время в мс)."""
+        body = None
+        headers = {"Referer": self.base_url + path}
+        if data is not None:
+            body = urllib.parse.urlencode({**data, "csrfmiddlewaretoken": self.csrf_token()}).encode()
+        started = time.perf_counter()
+        try:
+            with self.opener.open(urllib.request.Request(self.base_url + path, body, headers)) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+            self.location = e.headers.get("Location", "")
+        return status, (time.perf_counter() - started) * 1000
+
+    def login(self, username: str, password: str = BENCH_PASSWORD):
+        self.request("/auth/login/")
+        self.request("/auth/login/", {"username": username, "password": password})
+
+
+# ---------- ASGI: сервер и клиенты на asyncio ----------
+
+
+class _AsgiConnection:
+    """Одно keep-alive соединение HTTP/1.1 минимального ASGI-сервера."""
+
+    def __init__(self, app, reader, writer, port):
+        self.app, self.reader, self.writer, self.port = app, reader, writer, port
+
+    async def serve(self):
+        try:
+            while await self.serve_one():
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.writer.close()
+
+    async def serve_one(self) -> bool:
+        line = await self.reader.readline()
+        if not line.strip():
+            return False
+        method, target, _ = line.decode("latin-1").split()
+        headers = []
+        while (header := await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = header.decode("latin-1").partition(":")
+            headers.append((name.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+        length = int(dict(headers).get(b"content-length", b"0"))
+        body = await self.reader.readexactly(length) if length else b""
+        path, _, query = target.partition("?")
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+            "path": urllib.parse.unquote(path), "raw_path": path.encode("latin-1"),
+            "query_string": query.encode("latin-1"), "root_path": "", "headers": headers,
+            "client": self.writer.get_extra_info("peername")[:2], "server": ("127.0.0.1", self.port),
+        }
+        finished = asyncio.Event()
+        start, chunks = {}, []
+
+        async def receive():
+            nonlocal body
+            if body is not None:
+                message, body = {"type": "http.request", "body": body, "more_body": False}, None
+                return message
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            else:
+                chunks.append(message.get("body", b""))
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            finished.set()
+        payload = b"".join(chunks)
+        lines = [f"HTTP/1.1 {start['status']} {HTTPStatus(start['status']).phrase}"]
+        lines += [f"{name.decode('latin-1')}: {value.decode('latin-1')}" for name, value in start.get("headers", [])
+                  if name.lower() != b"content-length"]
+        lines.append(f"Content-Length: {len(payload)}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+        await self.writer.drain()
+        return True
+
+
+@contextmanager
+def asgi_server(app=None):
+    """
+    Поднять минимальный ASGI-сервер (HTTP/1.1, keep-alive, ответ целиком) на
+    свободном порту в отдельном потоке со своим циклом событий — пара к
+    live_server() для сравнения WSGI и ASGI в одном процессе. Потоковые
+    ответы (SSE) он буферизует, для них нужен настоящий сервер (uvicorn).
+    """
+    if app is None:
+        from django.core.handlers.asgi import ASGIHandler
+
+        app = ASGIHandler()
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state = {}
+
+    async def main():
+        async def accept(reader, writer):
+            await _AsgiConnection(app, reader, writer, state["port"]).serve()
+
+        server = await asyncio.start_server(accept, "127.0.0.1", 0, backlog=2048)
+        state["port"] = server.sockets[0].getsockname()[1]
+        state["stop"] = asyncio.Event()
+        ready.set()
+        async with server:
+            await state["stop"].wait()
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(main(),), daemon=True)
+    thread.start()
+    ready.wait()
+    try:
+        yield f"http://127.0.0.1:{state['port']}"
+    finally:
+        loop.call_soon_threadsafe(state["stop"].set)
+        thread.join(timeout=10)
+
+
+class AsyncHttpClient:
+    """
+    Клиент нагрузки на asyncio: одно keep-alive соединение, готовые cookie
+    сессии и CSRF (заголовок X-CSRFToken). Сотни таких клиентов работают в
+    одном потоке и почти не отнимают GIL у сервера.
+    """
+
+    def __init__(self, base_url: str, cookies: dict):
+        parts = urllib.parse.urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port
+        self.cookie = "; ".join(f"{name}={value}" for name, value in cookies.items())
+        self.csrf = cookies.get("csrftoken", "")
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    async def request(self, method: str, path: str) -> tuple:
+        """Выполнить запрос без тела; вернуть (HTTP-статус, время в мс)."""
+        started = time.perf_counter()
+        if self.writer is None:
+            await self.connect()
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nCookie: {self.cookie}\r\n"
+                f"X-CSRFToken: {self.csrf}\r\nContent-Length: 0\r\n\r\n")
+        self.writer.write(head.encode("latin-1"))
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length, close = 0, False
+        while (header := await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = header.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value == "close":
+                close = True
+        if length:
+            await self.reader.readexactly(length)
+        if close:
+            await self.close()
+        return status, (time.perf_counter() - started) * 1000
@@ -0,0 +1,159 @@
+"""
+Кэш списка мастеров и отрендеренных строк заявок.
+
+Список мастеров (для выпадающих списков диспетчера) хранится под
+ключом roster:<версия>. Версия — отдельный ключ, который увеличивается
+при сохранении или удалении мастера (post_save/post_delete User): все
+процессы сразу читают новый ключ, старый истекает сам.
+
+Строки заявок ({% order_row %}, см. core.templatetags.fragments)
+хранятся в кэше "fragments" под ключом frag:<имя>:<id заявки> вместе со
+«штампом»: статусом, мастером, версией списка мастеров и ревизией шаблона
+строки. Смена статуса
+идёт условным UPDATE без сигналов (core.services.apply_transition),
+поэтому устаревшую строку отсекает штамп. Остальные правки заявки
+(Order.save, удаление) удаляют её строки по сигналу.
+
+Попадания и промахи считаются по имени кэша и отдаются в /metrics.
+"""
+import threading
+from collections import defaultdict
+
+from django.core.cache import caches
+
+from .models import User
+
+ROSTER_TTL = 3600
+FRAGMENT_TTL = 3600
+# Имена фрагментов строк заявки — чтобы сигнал мог удалить их все.
+FRAGMENT_NAMES = ("dispatcher_row", "master_row", "master_card")
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {"hit": 0, "miss": 0})
+
+
+def _default():
+    return caches["default"]
+
+
+def _fragments():
+    return caches["fragments"]
+
+
+# ---------- счётчики ----------
+
+
+def record(name: str, hits: int = 0, misses: int = 0):
+    with _stats_lock:
+        _stats[name]["hit"] += hits
+        _stats[name]["miss"] += misses
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return {name: dict(v) for name, v in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def prometheus_lines() -> list:
+    lines = [
+        "# HELP service_desk_cache_requests_total Обращения к кэшам core.caching по результату.",
+        "# TYPE service_desk_cache_requests_total counter",
+    ]
+    for name, v in sorted(stats().items()):
+        for result in ("hit", "miss"):
+            lines.append(f'service_desk_cache_requests_total{{cache="{name}",result="{result}"}} {v[result]}')
+    return lines
+
+
+# ---------- список мастеров ----------
+
+ROSTER_VERSION_KEY = "roster:version"
+
+
+def roster_version() -> int:
+    cache = _default()
+    version = cache.get(ROSTER_VERSION_KEY)
+    if version is None:
+        cache.add(ROSTER_VERSION_KEY, 1, None)
+        version = cache.get(ROSTER_VERSION_KEY, 1)
+    return version
+
+
+def bump_roster_version():
+    cache = _default()
+    try:
+        cache.incr(ROSTER_VERSION_KEY)
+    except ValueError:
+        cache.add(ROSTER_VERSION_KEY, 2, None)
+
+
+def master_roster() -> list:
+    """Активные мастера для выпадающих списков: [{"id", "username", "name"}]."""
+    cache = _default()
+    key = f"roster:{roster_version()}"
+    roster = cache.get(key)
+    if roster is not None:
+        record("roster", hits=1)
+        return roster
+    record("roster", misses=1)
+    roster = [
+        {"id": m.id, "username": m.username, "name": m.get_full_name() or m.username}
+        for m in User.objects.filter(role="master", is_active=True).order_by("first_name", "username")
+    ]
+    cache.set(key, roster, ROSTER_TTL)
+    return roster
+
+
+def on_user_change(sender, instance, **kwargs):
+    """post_save/post_delete User: имя или активность мастера попадают в список и строки."""
+    update_fields = kwargs.get("update_fields")
+    if update_fields and set(update_fields) <= {"last_login", "password"}:
+        return
+    if instance.role == "master":
+        bump_roster_version()
+
+
+# ---------- строки заявок ----------
+
+
+def fragment_key(name: str, order_id: int) -> str:
+    return f"frag:{name}:{order_id}"
+
+
+def fragment_stamp(order, version) -> tuple:
+    return order.status, order.assigned_master_id, version
+
+
+def prefetch_fragments(name: str, orders) -> None:
+    """
+    Забрать строки страницы одним get_many до рендеринга (для Redis — один
+    запрос вместо запроса на строку). Результат кладётся в order._fragments.
+    """
+    orders = list(orders)
+    found = _fragments().get_many([fragment_key(name, o.id) for o in orders])
+    for order in orders:
+        order.__dict__.setdefault("_fragments", {})[name] = found.get(fragment_key(name, order.id))
+
+
+def get_fragment(name: str, order, version):
+    prefetched = order.__dict__.get("_fragments", {})
+    cached = prefetched[name] if name in prefetched else _fragments().get(fragment_key(name, order.id))
+    if cached is not None and cached[0] == fragment_stamp(order, version):
+        record("fragments", hits=1)
+        return cached[1]
+    record("fragments", misses=1)
+    return None
+
+
+def set_fragment(name: str, order, version, html: str):
+    _fragments().set(fragment_key(name, order.id), (fragment_stamp(order, version), html), FRAGMENT_TTL)
+
+
+def on_order_change(sender, instance, **kwargs):
+    """post_save/post_delete Order: строки заявки больше не актуальны."""
+    _fragments().delete_many([fragment_key(name, instance.id) for name in FRAGMENT_NAMES])
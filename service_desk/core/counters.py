@@ -0,0 +1,143 @@
+"""
+Инкрементальные счётчики заявок для StatsView.
+
+Вместо GROUP BY по всей таблице Order на каждой загрузке страницы
+статистики хранятся готовые значения в OrderCounter. Каждая смена
+статуса в core.services сдвигает их на ±1 в той же транзакции.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ArchivedOrder, Order, OrderCounter, OrderStatus
+
+
+def order_keys(order) -> list:
+    """Пары (разрез, ключ), в которые попадает заявка."""
+    day = timezone.localdate(order.created_at) if order.created_at else timezone.localdate()
+    return [
+        ("status", ""),
+        ("category", order.category),
+        ("day", day.isoformat()),
+    ]
+
+
+def _upsert(rows):
+    """
+    Сдвинуть счётчики [(разрез, ключ, статус, дельта)] одним запросом:
+    INSERT ... ON CONFLICT DO UPDATE прибавляет дельту к существующей строке
+    или создаёт её (SQLite 3.24+, PostgreSQL 9.5+).
+    """
+    qn = connection.ops.quote_name
+    table = qn(OrderCounter._meta.db_table)
+    columns = ", ".join(qn(c) for c in ("dimension", "key", "status", "value"))
+    placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+    sql = (
+        f"INSERT INTO {table} ({columns}) VALUES {placeholders} "
+        f"ON CONFLICT ({qn('dimension')}, {qn('key')}, {qn('status')}) "
+        f"DO UPDATE SET {qn('value')} = {table}.{qn('value')} + excluded.{qn('value')}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+def record_transition(order, old_status: str | None, new_status: str | None):
+    """Учесть смену статуса (old_status=None — новая заявка, new_status=None — удаление)."""
+    record_transitions([(order, old_status, new_status)])
+
+
+def record_transitions(changes):
+    """Учесть пачку переходов [(заявка, старый, новый)] одним запросом к OrderCounter."""
+    deltas = Counter()
+    for order, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        for dimension, key in order_keys(order):
+            if old_status:
+                deltas[(dimension, key, old_status)] -= 1
+            if new_status:
+                deltas[(dimension, key, new_status)] += 1
+    # Строки счётчиков блокируются в одном глобальном порядке: иначе отмена
+    # из ASSIGNED и назначение из CANCELLED взяли бы одни и те же строки
+    # навстречу друг другу — взаимная блокировка в PostgreSQL.
+    rows = [(*k, delta) for k, delta in sorted(deltas.items()) if delta]
+    if rows:
+        _upsert(rows)
+
+
+def actual_counts(order_models=(Order, ArchivedOrder)) -> dict:
+    """
+    Честный пересчёт по таблицам заявок: {(разрез, ключ, статус): число}.
+    Архив (core.archive) входит в счёт: архивация статистику не меняет.
+    """
+    counts = Counter()
+    for order_model in order_models:
+        for row in order_model.objects.values("status").annotate(n=Count("id")).order_by():
+            counts[("status", "", row["status"])] += row["n"]
+        for row in order_model.objects.values("category", "status").annotate(n=Count("id")).order_by():
+            counts[("category", row["category"], row["status"])] += row["n"]
+        days = (order_model.objects
+                .annotate(day=TruncDate("created_at"))
+                .values("day", "status")
+                .annotate(n=Count("id"))
+                .order_by())
+        for row in days:
+            counts[("day", row["day"].isoformat(), row["status"])] += row["n"]
+    return dict(counts)
+
+
+@transaction.atomic
+def rebuild(dry_run: bool = False, order_models=(Order, ArchivedOrder), counter_model=OrderCounter) -> dict:
+    """
+    Пересобрать счётчики с нуля. Возвращает расхождения
+    {(разрез, ключ, статус): (было, стало)}.
+    """
+    # Сначала блокируем счётчики, чтобы параллельные смены статуса
+    # дождались пересборки, а не наложились на неё.
+    stored = {
+        (c.dimension, c.key, c.status): c.value
+        for c in counter_model.objects.select_for_update()
+    }
+    actual = actual_counts(order_models)
+    drift = {
+        k: (stored.get(k, 0), actual.get(k, 0))
+        for k in stored.keys() | actual.keys()
+        if stored.get(k, 0) != actual.get(k, 0)
+    }
+    if not dry_run:
+        counter_model.objects.all().delete()
+        counter_model.objects.bulk_create(
+            [counter_model(dimension=d, key=k, status=s, value=v) for (d, k, s), v in actual.items()],
+            batch_size=1000,
+        )
+    return drift
+
+
+def status_totals() -> list:
+    return list(
+        OrderCounter.objects.filter(dimension="status", value__gt=0)
+        .order_by("status")
+        .values("status", count=F("value"))
+    )
+
+
+def breakdown(dimension: str, limit: int | None = None) -> list:
+    """
+    Таблица разреза по категории или по дню: строки
+    {"key", "counts": [число по каждому статусу OrderStatus], "total"}.
+    """
+    keys = (OrderCounter.objects.filter(dimension=dimension, value__gt=0)
+            .values_list("key", flat=True).distinct()
+            .order_by("-key" if dimension == "day" else "key"))
+    keys = list(keys[:limit] if limit else keys)
+    cells = {}
+    for c in OrderCounter.objects.filter(dimension=dimension, key__in=keys):
+        cells[(c.key, c.status)] = c.value
+    rows = []
+    for key in keys:
+        counts = [cells.get((key, status), 0) for status in OrderStatus.values]
+        rows.append({"key": key, "counts": counts, "total": sum(counts)})
+    return rows
@@ -0,0 +1,20 @@
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Обработчик connection_created: PRAGMA профиля sqlite-tuned.
+
+    WAL позволяет читать во время записи, synchronous=NORMAL в режиме WAL
+    убирает fsync на каждую транзакцию. Ожидание блокировки вместо
+    немедленной ошибки "database is locked" задаёт OPTIONS["timeout"]
+    (DB_BUSY_TIMEOUT), а не PRAGMA: иначе два значения спорили бы.
+    """
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,314 @@
+"""
+Выгрузка заявок и истории в CSV/XLSX потоком.
+
+Строки читаются QuerySet.iterator(chunk_size=CHUNK_SIZE) и сразу
+сериализуются кусками, поэтому память не растёт с числом строк. Это
+касается и ответа StreamingHttpResponse, и файла, который пишет
+management-команда export_orders или задача core.tasks.export_orders_job.
+
+XLSX собирается без сторонних библиотек: это zip из нескольких XML,
+лист пишется построчно в zipfile, открытый на поток без seek.
+"""
+import csv
+import os
+import re
+import uuid
+import zipfile
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderHistory, Order, OrderHistory, OrderStatus
+
+CHUNK_SIZE = 2000
+# Каждые столько строк отдаётся кусок ответа и обновляется прогресс задачи.
+FLUSH_EVERY = 500
+PROGRESS_TTL = 24 * 3600
+
+STATUS_LABELS = dict(OrderStatus.choices)
+
+
+@dataclass(frozen=True)
+class Dataset:
+    model: type
+    # Та же таблица в архиве (core.archive): выгрузка за период включает и её.
+    archive_model: type
+    date_field: str
+    # (заголовок, поле values_list); статусы выводятся названиями.
+    columns: tuple
+
+    @property
+    def headers(self) -> list:
+        return [title for title, _ in self.columns]
+
+    @property
+    def fields(self) -> list:
+        return [field for _, field in self.columns]
+
+
+DATASETS = {
+    "orders": Dataset(Order, ArchivedOrder, "created_at", (
+        ("ID", "id"),
+        ("Создана", "created_at"),
+        ("Категория", "category"),
+        ("Статус", "status"),
+        ("Клиент", "customer_name"),
+        ("Контакт", "customer_contact"),
+        ("Адрес", "address"),
+        ("Описание", "description"),
+        ("Мастер", "assigned_master__username"),
+        ("Диспетчер", "dispatcher__username"),
+        ("Плановая дата", "planned_date"),
+        ("Завершена", "completed_at"),
+    )),
+    "history": Dataset(OrderHistory, ArchivedOrderHistory, "timestamp", (
+        ("ID", "id"),
+        ("Заявка", "order_id"),
+        ("Время", "timestamp"),
+        ("Было", "old_status"),
+        ("Стало", "new_status"),
+        ("Кто", "changed_by__username"),
+        ("Комментарий", "comment"),
+    )),
+}
+STATUS_FIELDS = {"status", "old_status", "new_status"}
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_queryset(kind: str, date_from: date | None = None, date_to: date | None = None,
+                    status: str | None = None):
+    """
+    values_list выгрузки: диапазон дат включительно, по полю даты набора
+    (created_at заявки, timestamp истории). Для истории status — новый статус.
+    """
+    dataset = DATASETS[kind]
+    lookups = {}
+    if date_from:
+        lookups[f"{dataset.date_field}__gte"] = _day_start(date_from)
+    if date_to:
+        lookups[f"{dataset.date_field}__lt"] = _day_start(date_to + timedelta(days=1))
+    if status:
+        lookups["status" if kind == "orders" else "new_status"] = status
+    live, archived = (model.objects.filter(**lookups).order_by().values_list(*dataset.fields)
+                      for model in (dataset.model, dataset.archive_model))
+    # По возрастанию даты и id; архив и живые таблицы не пересекаются по id.
+    return live.union(archived, all=True).order_by(dataset.date_field, "id")
+
+
+def _cell(field: str, value):
+    if value is None:
+        return ""
+    if field in STATUS_FIELDS:
+        return STATUS_LABELS.get(value, value)
+    if isinstance(value, datetime):
+        return timezone.localtime(value).strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+def rows(kind: str, **filters):
+    """Заголовок и строки выгрузки; строки читаются кусками по CHUNK_SIZE."""
+    dataset = DATASETS[kind]
+    yield dataset.headers
+    for values in export_queryset(kind, **filters).iterator(chunk_size=CHUNK_SIZE):
+        yield [_cell(f, v) for f, v in zip(dataset.fields, values)]
+
+
+# ---------- форматы ----------
+
+
+class _Buffer:
+    """Приёмник для csv.writer/zipfile: копит записанное до следующего drain()."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data if isinstance(data, bytes) else data.encode("utf-8"))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+# Ячейка CSV с таким началом для Excel — формула (CSV injection): имя, адрес
+# и описание приходят из публичной формы. Телефоны («+7 999 ...») — не формулы.
+_FORMULA_START = ("=", "+", "-", "@", "\t", "\r")
+_PHONE = re.compile(r"\+?[\d\s()-]+")
+
+
+def _csv_safe(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_START) and not _PHONE.fullmatch(value):
+        return "'" + value
+    return value
+
+
+def csv_chunks(row_iter):
+    # BOM — чтобы Excel открыл UTF-8 с кириллицей; разделитель «;» для русской локали.
+    buffer = _Buffer()
+    buffer.write("\ufeff")
+    writer = csv.writer(buffer, delimiter=";")
+    for n, row in enumerate(row_iter, 1):
+        writer.writerow([_csv_safe(value) for value in row])
+        if n % FLUSH_EVERY == 0:
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Выгрузка" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+# Управляющие символы недопустимы в XML: Excel не откроет такой лист.
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _xlsx_row(row) -> str:
+    cells = []
+    for value in row:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f"<c><v>{value}</v></c>")
+        else:
+            text = escape(_XML_INVALID.sub("", str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f"<row>{''.join(cells)}</row>"
+
+
+def xlsx_chunks(row_iter):
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC.items():
+            archive.writestr(name, content)
+        with archive.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            for n, row in enumerate(row_iter, 1):
+                sheet.write(_xlsx_row(row).encode("utf-8"))
+                if n % FLUSH_EVERY == 0:
+                    yield buffer.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield buffer.drain()
+
+
+# Формат -> (генератор кусков, Content-Type).
+FORMATS = {
+    "csv": (csv_chunks, "text/csv; charset=utf-8"),
+    "xlsx": (xlsx_chunks, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+def stream(kind: str, fmt: str, **filters):
+    """Куски байтов выгрузки: для StreamingHttpResponse или записи в файл."""
+    chunks, _ = FORMATS[fmt]
+    return chunks(rows(kind, **filters))
+
+
+def filename(kind: str, fmt: str, date_from=None, date_to=None) -> str:
+    span = "_".join(str(d) for d in (date_from, date_to) if d) or "all"
+    return f"{kind}_{span}.{fmt}"
+
+
+# ---------- фоновая выгрузка в файл ----------
+
+
+def _progress_key(job_id: str) -> str:
+    return f"export:{job_id}"
+
+
+def progress(job_id: str) -> dict | None:
+    """Состояние фоновой выгрузки: state, done, total, path (или None)."""
+    return cache.get(_progress_key(job_id))
+
+
+def _set_progress(job_id: str, **state):
+    cache.set(_progress_key(job_id), state, PROGRESS_TTL)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def write_file(kind: str, fmt: str, path=None, job_id: str | None = None, on_progress=None, **filters) -> dict:
+    """
+    Записать выгрузку в файл (по умолчанию в settings.EXPORT_ROOT) и вести
+    прогресс в кэше под job_id. Возвращает итоговое состояние.
+    """
+    job_id = job_id or new_job_id()
+    if path is None:
+        os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+        path = os.path.join(settings.EXPORT_ROOT, f"{job_id}_{filename(kind, fmt, filters.get('date_from'), filters.get('date_to'))}")
+    path = str(path)
+    total = export_queryset(kind, **filters).count()
+    state = {"state": "running", "done": 0, "total": total, "path": path}
+    _set_progress(job_id, **state)
+
+    def counted():
+        for n, row in enumerate(rows(kind, **filters)):
+            # n == 0 — заголовок.
+            if n and n % FLUSH_EVERY == 0:
+                state["done"] = n
+                _set_progress(job_id, **state)
+                if on_progress:
+                    on_progress(n, total)
+            yield row
+        state["done"] = n
+
+    chunks, _ = FORMATS[fmt]
+    tmp_path = path + ".part"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks(counted()):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except Exception:
+        _set_progress(job_id, **{**state, "state": "failed"})
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    state["state"] = "done"
+    _set_progress(job_id, **state)
+    if on_progress:
+        on_progress(state["done"], total)
+    return state
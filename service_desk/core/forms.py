@@ -1,5 +1,5 @@
 from django import forms
-from .models import Order
+from .models import Order, OrderStatus
 
 
 class PublicOrderForm(forms.ModelForm):
@@ -34,3 +34,56 @@ class AssignOrderForm(forms.Form):
     master_id = forms.IntegerField()
     planned_date = forms.DateTimeField(required=False, input_formats=["%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M"])
 
+
+class AutoAssignForm(forms.Form):
+    """Автоназначение (core.assignment): мастера подбирает система."""
+    planned_date = forms.DateTimeField(required=False, input_formats=["%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M"])
+
+
+class BulkActionForm(forms.Form):
+    ACTION_CHOICES = [("assign", "Назначить"), ("auto_assign", "Назначить автоматически"), ("cancel", "Отменить")]
+
+    action = forms.ChoiceField(choices=ACTION_CHOICES)
+    master_id = forms.IntegerField(required=False)
+    planned_date = forms.DateTimeField(required=False, input_formats=["%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M"])
+
+    def __init__(self, data=None, *args, **kwargs):
+        super().__init__(data, *args, **kwargs)
+        self.order_ids = data.getlist("order_ids") if data is not None else []
+
+    def clean(self):
+        data = super().clean()
+        try:
+            data["order_ids"] = [int(i) for i in self.order_ids]
+        except ValueError:
+            raise forms.ValidationError("Некорректный список заявок.")
+        if not data["order_ids"]:
+            raise forms.ValidationError("Не выбрано ни одной заявки.")
+        if data.get("action") == "assign" and not data.get("master_id"):
+            raise forms.ValidationError("Выберите мастера.")
+        return data
+
+
+class ExportForm(forms.Form):
+    KIND_CHOICES = [("orders", "Заявки"), ("history", "История статусов")]
+    FORMAT_CHOICES = [("csv", "CSV"), ("xlsx", "XLSX")]
+
+    kind = forms.ChoiceField(choices=KIND_CHOICES, required=False)
+    format = forms.ChoiceField(choices=FORMAT_CHOICES, required=False)
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    status = forms.ChoiceField(choices=[("", "Все")] + list(OrderStatus.choices), required=False)
+
+    def clean(self):
+        data = super().clean()
+        data["kind"] = data.get("kind") or "orders"
+        data["format"] = data.get("format") or "csv"
+        if data.get("date_from") and data.get("date_to") and data["date_from"] > data["date_to"]:
+            raise forms.ValidationError("Начало периода позже конца.")
+        return data
+
+    def filters(self) -> dict:
+        """Аргументы core.exports: даты и статус (пустой — без фильтра)."""
+        data = self.cleaned_data
+        return {"date_from": data.get("date_from"), "date_to": data.get("date_to"),
+                "status": data.get("status") or None}
@@ -0,0 +1,395 @@
+"""
+Координаты заявок: геокодирование адреса, геохеш-индекс, новые заявки
+рядом и порядок объезда заявок мастера.
+
+Геокодер подключается через settings.GEOCODER_BACKEND (как SMS-бэкенд в
+core.notifications). По умолчанию — GazetteerGeocoder: офлайн-справочник
+из CSV (settings.GEOCODER_GAZETTEER) для разработки и тестов; в работе —
+YandexGeocoder с ключом GEOCODER_API_KEY. Каждый ответ, в том числе «не
+найдено», сохраняется в GeocodedAddress, поэтому одинаковые адреса
+провайдер видит один раз. Ошибки сети не кэшируются: заявка останется
+необработанной и попадёт в следующий прогон.
+
+Координаты заявки пишутся после фиксации: новая заявка или смена адреса
+ставят задачу core.tasks.geocode_orders (только с брокером, см.
+enqueue_geocoding), а всё остальное подбирает geocode_pending_orders по
+расписанию (CELERY_BEAT_SCHEDULE).
+
+Пространственный индекс — геохеш (PRECISION символов, ячейка ~150 м) в
+Order.geohash. Соседние заявки ищутся по 3×3 ячейкам такой длины, что
+ячейка не меньше радиуса: это девять диапазонов [ячейка, ячейка + "~")
+по индексу order_new_geohash_idx (LIKE 'x%' индекс в SQLite не использует),
+а точное расстояние проверяется уже на десятках строк.
+"""
+import csv
+import json
+import logging
+import math
+import re
+import urllib.parse
+import urllib.request
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import GeocodedAddress, Order, OrderStatus
+
+logger = logging.getLogger(__name__)
+
+PRECISION = 7
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+# ---------- геохеш ----------
+
+
+def encode(lat: float, lon: float, precision: int = PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        ch <<= 1
+        if value >= mid:
+            ch |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> tuple:
+    """(высота, ширина) ячейки в градусах."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def neighbours(lat: float, lon: float, precision: int) -> set:
+    """Ячейка точки и восемь соседних."""
+    height, width = cell_size(precision)
+    return {encode(max(-90.0, min(90.0, lat + dy * height)), (lon + dx * width + 180.0) % 360.0 - 180.0, precision)
+            for dy in (-1, 0, 1) for dx in (-1, 0, 1)}
+
+
+def precision_for(radius_km: float, lat: float) -> int:
+    """Самый длинный геохеш, ячейка которого не меньше радиуса в обе стороны."""
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        if min(height, width * math.cos(math.radians(lat))) * KM_PER_DEGREE >= radius_km:
+            return precision
+    return 1
+
+
+def distance_km(a: tuple, b: tuple) -> float:
+    """Расстояние по дуге между точками (широта, долгота)."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+# ---------- геокодеры ----------
+
+
+def normalize(address: str) -> str:
+    """Ключ кэша: нижний регистр, ё -> е, без знаков препинания и лишних пробелов."""
+    return " ".join(re.sub(r"[^\w]+", " ", (address or "").lower().replace("ё", "е")).split())[:255]
+
+
+class GeocoderError(Exception):
+    """Провайдер недоступен: ответ не кэшируется, адрес повторится позже."""
+
+
+class GazetteerGeocoder:
+    """
+    Офлайн-справочник: CSV «address;lat;lon». Сначала ищется адрес целиком,
+    затем без последних частей через запятую («ул. Мира, д. 5, кв. 3» ->
+    «ул. Мира, д. 5» -> «ул. Мира»), так что хватает координат улиц.
+    """
+
+    name = "gazetteer"
+
+    def __init__(self, path=None):
+        self.entries = _load_gazetteer(str(path or settings.GEOCODER_GAZETTEER))
+
+    def geocode(self, address: str) -> tuple | None:
+        parts = [p for p in (address or "").split(",") if p.strip()]
+        while parts:
+            point = self.entries.get(normalize(",".join(parts)))
+            if point:
+                return point
+            parts.pop()
+        return None
+
+
+@lru_cache(maxsize=4)
+def _load_gazetteer(path: str) -> dict:
+    if not Path(path).exists():
+        logger.warning("gazetteer %s not found", path)
+        return {}
+    with open(path, encoding="utf-8", newline="") as f:
+        return {normalize(row["address"]): (float(row["lat"]), float(row["lon"]))
+                for row in csv.DictReader(f, delimiter=";")}
+
+
+class YandexGeocoder:
+    """HTTP-геокодер Яндекса: settings.GEOCODER_API_KEY, таймаут GEOCODER_TIMEOUT."""
+
+    name = "yandex"
+    URL = "https://geocode-maps.yandex.ru/1.x/"
+
+    def geocode(self, address: str) -> tuple | None:
+        query = urllib.parse.urlencode({
+            "apikey": settings.GEOCODER_API_KEY, "geocode": address, "format": "json", "results": 1, "lang": "ru_RU",
+        })
+        try:
+            with urllib.request.urlopen(f"{self.URL}?{query}", timeout=settings.GEOCODER_TIMEOUT) as response:
+                data = json.load(response)
+        except (OSError, ValueError) as e:
+            raise GeocoderError(str(e)) from e
+        try:
+            members = data["response"]["GeoObjectCollection"]["featureMember"]
+            if not members:
+                return None
+            lon, lat = map(float, members[0]["GeoObject"]["Point"]["pos"].split())
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            # Ответ неожиданного вида (ошибка квоты, смена формата): как недоступность.
+            raise GeocoderError(f"unexpected response: {e!r}") from e
+        return lat, lon
+
+
+def get_geocoder():
+    return import_string(settings.GEOCODER_BACKEND)()
+
+
+def geocode_many(addresses, geocoder=None) -> dict:
+    """
+    {адрес: (широта, долгота) или None}: кэш GeocodedAddress одним
+    запросом, провайдер — только для новых адресов. Адреса, на которых
+    провайдер выдал ошибку, в ответ не попадают.
+    """
+    geocoder = geocoder or get_geocoder()
+    keys = {address: normalize(address) for address in set(addresses) if normalize(address)}
+    cached = {g.query: g for g in GeocodedAddress.objects.filter(provider=geocoder.name, query__in=set(keys.values()))}
+    found, fresh = {}, {}
+    for address, key in keys.items():
+        if key in cached:
+            entry = cached[key]
+            found[address] = (entry.lat, entry.lon) if entry.lat is not None else None
+            continue
+        if key not in fresh:
+            try:
+                fresh[key] = geocoder.geocode(address)
+            except GeocoderError as e:
+                logger.warning("geocoding %r failed: %s", address, e)
+                continue
+        found[address] = fresh[key]
+    GeocodedAddress.objects.bulk_create(
+        [GeocodedAddress(provider=geocoder.name, query=key, lat=point[0] if point else None,
+                         lon=point[1] if point else None)
+         for key, point in fresh.items()],
+        ignore_conflicts=True,
+    )
+    return found
+
+
+def locate(order_ids, geocoder=None) -> int:
+    """Проставить координаты заявкам; вернуть число обработанных."""
+    orders = list(Order.objects.filter(id__in=order_ids).only("id", "address"))
+    points = geocode_many([o.address for o in orders], geocoder)
+    now = timezone.now()
+    by_address = {}
+    for order in orders:
+        if not order.address.strip() or order.address in points:
+            by_address.setdefault(order.address, []).append(order.id)
+    # Один UPDATE на адрес: заявки с одинаковым адресом обновляются вместе.
+    # Адрес в условии — если его успели изменить, координаты старого не
+    # записываются, и заявка остаётся в очереди на геокодирование.
+    updated = 0
+    for address, ids in by_address.items():
+        point = points.get(address)
+        updated += Order.objects.filter(id__in=ids, address=address).update(
+            lat=point[0] if point else None, lon=point[1] if point else None,
+            geohash=encode(*point) if point else "", geocoded_at=now,
+        )
+    return updated
+
+
+def locate_pending(batch_size: int | None = None, max_batches: int | None = None) -> int:
+    """Обработать заявки без координат пачками по GEOCODER_BATCH_SIZE."""
+    batch_size = batch_size or settings.GEOCODER_BATCH_SIZE
+    total = batches = 0
+    last_id = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(Order.objects.filter(geocoded_at__isnull=True, id__gt=last_id)
+                   .order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            break
+        total += locate(ids)
+        last_id = ids[-1]
+        batches += 1
+    return total
+
+
+# ---------- сигналы ----------
+
+
+# Поля читаются из __dict__: у заявки, загруженной через only(), обращение
+# к отложенному полю стоило бы лишнего запроса на каждое сохранение.
+
+
+def on_order_pre_save(sender, instance, **kwargs):
+    """Новая заявка или новый адрес: старые координаты больше не верны."""
+    address = instance.__dict__.get("address")
+    if address is None:
+        return
+    if instance.pk is None or instance.__dict__.get("_loaded_address", address) != address:
+        instance.lat = instance.lon = instance.geocoded_at = None
+        instance.geohash = ""
+
+
+def enqueue_geocoding(task, order_ids: list):
+    """
+    Поставить задачу геокодирования после фиксации. Без брокера
+    (CELERY_TASK_ALWAYS_EAGER) ничего не ставится: eager-задача ходила бы к
+    провайдеру внутри запроса. Заявку с geocoded_at IS NULL подберёт
+    geocode_pending_orders или manage.py geocode_orders; туда же уходит
+    заявка, если брокер недоступен.
+    """
+    if settings.CELERY_TASK_ALWAYS_EAGER:
+        return
+    try:
+        task.delay(order_ids)
+    except Exception:
+        logger.exception("Не удалось поставить геокодирование заявок %s", order_ids)
+
+
+def on_order_save(sender, instance, **kwargs):
+    fields = instance.__dict__
+    if "geocoded_at" in fields and fields["geocoded_at"] is None and fields.get("address"):
+        from .tasks import geocode_orders
+
+        order_id = instance.id
+        transaction.on_commit(lambda: enqueue_geocoding(geocode_orders, [order_id]))
+    if "address" in fields:
+        instance._loaded_address = fields["address"]
+
+
+# ---------- поиск рядом ----------
+
+
+def nearby_new_orders(lat: float, lon: float, radius_km: float | None = None, limit: int = 10,
+                      exclude=None) -> list:
+    """Новые заявки в радиусе, ближние первыми: [(км, заявка)]."""
+    radius_km = radius_km or settings.NEARBY_RADIUS_KM
+    precision = precision_for(radius_km, lat)
+    cells = Q()
+    for cell in neighbours(lat, lon, precision):
+        cells |= Q(geohash__gte=cell, geohash__lt=cell + "~")
+    qs = (Order.objects.filter(cells, status=OrderStatus.NEW)
+          .only("id", "created_at", "category", "address", "lat", "lon", "planned_date"))
+    if exclude:
+        qs = qs.exclude(id=exclude)
+    found = []
+    for order in qs:
+        distance = distance_km((lat, lon), (order.lat, order.lon))
+        if distance <= radius_km:
+            found.append((distance, order))
+    found.sort(key=lambda item: (item[0], item[1].id))
+    return found[:limit]
+
+
+# ---------- маршрут ----------
+
+
+def _path_length(points: list) -> float:
+    return sum(distance_km(a, b) for a, b in zip(points, points[1:]))
+
+
+def route(orders, start: tuple | None = None) -> list:
+    """
+    Порядок объезда: ближайший сосед от start (или от первой по плановому
+    времени заявки), затем улучшение 2-opt. Заявки без координат — в конце
+    в исходном порядке. Возвращает [(заявка, км от предыдущей точки или None)].
+    """
+    located = [o for o in orders if o.lat is not None]
+    unlocated = [o for o in orders if o.lat is None]
+    if not located:
+        return [(o, None) for o in unlocated]
+
+    remaining = list(located)
+    if start is None:
+        first = remaining.pop(0)
+        path, point = [first], (first.lat, first.lon)
+    else:
+        path, point = [], start
+    while remaining:
+        nearest = min(remaining, key=lambda o: (distance_km(point, (o.lat, o.lon)), o.id))
+        remaining.remove(nearest)
+        path.append(nearest)
+        point = (nearest.lat, nearest.lon)
+
+    # 2-opt: разворачивать отрезки, пока это сокращает путь. Заявок у мастера
+    # на день — единицы, квадратичный перебор здесь дешевле любого индекса.
+    prefix = [start] if start is not None else []
+    fixed = 1 if start is None else 0  # без точки старта первая заявка остаётся первой
+    improved = True
+    while improved:
+        improved = False
+        for i in range(fixed, len(path) - 1):
+            for j in range(i + 1, len(path)):
+                candidate = path[:i] + path[i:j + 1][::-1] + path[j + 1:]
+                if (_path_length(prefix + [(o.lat, o.lon) for o in candidate])
+                        < _path_length(prefix + [(o.lat, o.lon) for o in path]) - 1e-9):
+                    path, improved = candidate, True
+
+    stops, point = [], start
+    for order in path:
+        here = (order.lat, order.lon)
+        stops.append((order, distance_km(point, here) if point else None))
+        point = here
+    return stops + [(o, None) for o in unlocated]
+
+
+def master_day_orders(master, day):
+    """Открытые заявки мастера с плановой датой в день day (по TIME_ZONE)."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return (Order.objects
+            .filter(assigned_master=master, status__in=(OrderStatus.ASSIGNED, OrderStatus.IN_PROGRESS),
+                    planned_date__gte=start, planned_date__lt=start + timedelta(days=1))
+            .only("id", "status", "category", "address", "customer_name", "planned_date", "lat", "lon")
+            .order_by("planned_date", "id"))
+
+
+def master_route(master, day) -> tuple:
+    """Маршрут мастера на день: ([(заявка, км)], всего км)."""
+    stops = route(list(master_day_orders(master, day)), start=settings.ROUTE_START)
+    return stops, sum(km for _, km in stops if km)
+
+
+def map_url(order) -> str:
+    """Ссылка на карту: по координатам, если они известны, иначе поиском по адресу."""
+    lat, lon = getattr(order, "lat", None), getattr(order, "lon", None)
+    if lat is not None:
+        return f"https://yandex.ru/maps/?pt={lon},{lat}&z=16&l=map"
+    return f"https://yandex.ru/maps/?text={urllib.parse.quote(order.address)}" if order.address else ""
+
+
+def route_url(stops, start: tuple | None = None) -> str:
+    points = ([start] if start else []) + [(o.lat, o.lon) for o, _ in stops if o.lat is not None]
+    if not points:
+        return ""
+    return "https://yandex.ru/maps/?rtext=" + "~".join(f"{lat},{lon}" for lat, lon in points) + "&rtt=auto"
@@ -0,0 +1,175 @@
+"""
+Приём публичных заявок: ограничение частоты и защита от дублей.
+
+Перед записью заявки (register_new_order) выполняются две проверки:
+
+1. Дубль. Хэш нормализованных (контакт, описание, адрес) ищется в кэше.
+   Если такая заявка уже принята в течение INTAKE_DEDUP_WINDOW секунд,
+   возвращается она, и в базу ничего не пишется. Повторная отправка
+   формы не расходует лимит.
+2. Лимит. Token bucket по IP и по контакту (INTAKE_RATE_LIMITS:
+   ёмкость и период, за который она восполняется). Если корзина пуста,
+   выбрасывается RateLimited со временем до следующей попытки.
+
+Состояние лежит в кэше settings.INTAKE_CACHE, то есть бэкенд
+подключаемый: locmem в тестах, общий Redis/Memcached при нескольких
+процессах. Корзина читается и пишется без блокировки. При гонке
+параллельные запросы могут получить на пару токенов больше — для
+защиты от наводнения этого достаточно.
+IP берётся из REMOTE_ADDR; за обратным прокси его должен подставлять
+сам прокси (или middleware).
+"""
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .services import register_new_order
+
+KEY_PREFIX = "intake"
+# Сколько ждать, пока параллельный запрос с тем же содержимым допишет заявку.
+CLAIM_WAIT_SECONDS = 2.0
+CLAIM_POLL_SECONDS = 0.05
+PENDING = "pending"
+
+
+SCOPE_LABELS = {"ip": "с этого адреса", "contact": "с этого контакта"}
+
+
+class RateLimited(Exception):
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Слишком много заявок {SCOPE_LABELS.get(scope, scope)}. "
+                         f"Повторите через {int(retry_after) + 1} с.")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+@dataclass
+class IntakeResult:
+    order: object
+    duplicate: bool = False
+
+
+def _cache():
+    return caches[getattr(settings, "INTAKE_CACHE", "default")]
+
+
+# ---------- нормализация и хэш ----------
+
+
+def normalize_contact(contact: str) -> str:
+    """Email — в нижнем регистре; телефон — только цифры, 8XXXXXXXXXX -> 7XXXXXXXXXX."""
+    contact = (contact or "").strip().lower()
+    if "@" in contact:
+        return contact
+    digits = re.sub(r"\D", "", contact)
+    if len(digits) == 11 and digits.startswith("8"):
+        digits = "7" + digits[1:]
+    return digits or contact
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join((text or "").lower().replace("ё", "е").split())
+
+
+def fingerprint(contact: str, description: str, address: str) -> str:
+    raw = "\x1f".join([normalize_contact(contact), _normalize_text(description), _normalize_text(address)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ---------- token bucket ----------
+
+
+def _bucket_key(scope: str, key: str) -> str:
+    return f"{KEY_PREFIX}:bucket:{scope}:{key}"
+
+
+def _refill(cache_key: str, capacity: int, period: float, now: float) -> float:
+    tokens, updated = _cache().get(cache_key, (capacity, now))
+    return min(capacity, tokens + (now - updated) * capacity / period)
+
+
+def take_token(scope: str, key: str, capacity: int, period: float, now: float | None = None) -> float:
+    """
+    Взять токен из корзины scope:key. Возвращает 0, если токен взят, иначе
+    число секунд до появления следующего токена.
+    """
+    return take_tokens([(scope, key, capacity, period)], now)[1]
+
+
+def take_tokens(buckets: list, now: float | None = None) -> tuple:
+    """
+    Взять по токену из всех корзин [(scope, key, ёмкость, период)] или ни из
+    одной: отказ по контакту не должен расходовать лимит IP. Возвращает
+    (scope пустой корзины или None, секунд до следующего токена).
+    """
+    cache = _cache()
+    now = time.time() if now is None else now
+    states = [(_bucket_key(scope, key), capacity, period, _refill(_bucket_key(scope, key), capacity, period, now))
+              for scope, key, capacity, period in buckets]
+    for (scope, *_), (_, capacity, period, tokens) in zip(buckets, states):
+        if tokens < 1:
+            return scope, (1 - tokens) * period / capacity
+    cache.set_many({k: (tokens - 1, now) for k, _, _, tokens in states},
+                   int(max((p for _, _, p, _ in states), default=0)) + 1)
+    return None, 0.0
+
+
+def check_rate(ip: str, contact: str):
+    """Списать по токену с корзин IP и контакта; RateLimited, если какая-то пуста."""
+    limits = settings.INTAKE_RATE_LIMITS
+    buckets = [(scope, key, *limits[scope])
+               for scope, key in (("ip", ip), ("contact", normalize_contact(contact)))
+               if key and scope in limits]
+    scope, wait = take_tokens(buckets)
+    if scope:
+        raise RateLimited(scope, wait)
+
+
+# ---------- приём ----------
+
+
+def _existing(order_model, value):
+    if isinstance(value, int):
+        return order_model.objects.filter(id=value).first()
+    return None
+
+
+def _wait_for_claim(cache, key):
+    deadline = time.monotonic() + CLAIM_WAIT_SECONDS
+    value = cache.get(key)
+    while value == PENDING and time.monotonic() < deadline:
+        time.sleep(CLAIM_POLL_SECONDS)
+        value = cache.get(key)
+    return value
+
+
+def submit(order, ip: str) -> IntakeResult:
+    """
+    Принять несохранённую заявку из публичной формы: вернуть уже принятую
+    такую же или проверить лимиты и записать новую.
+    """
+    cache = _cache()
+    window = settings.INTAKE_DEDUP_WINDOW
+    key = f"{KEY_PREFIX}:dup:{fingerprint(order.customer_contact, order.description, order.address)}"
+    model = type(order)
+
+    # Заявку «занимает» тот, кто первым добавил ключ; параллельный дубль
+    # дожидается id вместо второй вставки.
+    if not cache.add(key, PENDING, window):
+        existing = _existing(model, _wait_for_claim(cache, key))
+        if existing is not None:
+            return IntakeResult(existing, duplicate=True)
+        cache.set(key, PENDING, window)
+
+    try:
+        check_rate(ip, order.customer_contact)
+        register_new_order(order)
+    except Exception:
+        cache.delete(key)
+        raise
+    cache.set(key, order.id, window)
+    return IntakeResult(order)
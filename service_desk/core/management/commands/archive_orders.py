@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = "Перенести закрытые заявки с историей в архивные таблицы (то же, что ночная задача Celery beat)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help="сколько дней назад закрыта заявка")
+        parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+        parser.add_argument("--max-batches", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true", help="только посчитать подходящие заявки")
+
+    def handle(self, *args, **opts):
+        if opts["dry_run"]:
+            count = archive.candidates(archive.cutoff_for(opts["days"])).count()
+            self.stdout.write(f"К архивации: {count} заявок (закрыты больше {opts['days']} дн. назад).")
+            return
+
+        total = archive.archive_closed_orders(
+            days=opts["days"], batch_size=opts["batch_size"], max_batches=opts["max_batches"],
+            on_batch=lambda n: self.stdout.write(f"  перенесено {n}"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Архивировано заявок: {total}."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.assignment import auto_assign_batch
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = "Автоназначение мастеров на всю очередь новых заявок (старые первыми)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dispatcher", required=True, help="логин диспетчера, от имени которого назначать")
+        parser.add_argument("--limit", type=int, help="не больше стольких заявок")
+
+    def handle(self, *args, **opts):
+        dispatcher = User.objects.filter(username=opts["dispatcher"], role="dispatcher").first()
+        if dispatcher is None:
+            raise CommandError(f"Диспетчер {opts['dispatcher']} не найден.")
+
+        result = auto_assign_batch(dispatcher, limit=opts["limit"])
+        self.stdout.write(self.style.SUCCESS(f"Назначено: {len(result.updated)}"))
+        if result.errors:
+            self.stdout.write(self.style.WARNING(f"Не назначено: {len(result.errors)}"))
@@ -0,0 +1,139 @@
+import asyncio
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.middleware.csrf import _get_new_csrf_string
+from django.test import Client, override_settings
+
+from core import auth
+from core.benchmarks import (
+    AsyncHttpClient, asgi_server, live_server, scratch_database, seed_dispatcher, seed_masters, summarize,
+)
+from core.models import Order, OrderStatus
+from core.testing import async_urlconf
+
+ENDPOINTS = ["master_start", "master_complete", "dispatcher_new_count", "order_success"]
+# сервер -> (ASGI?, async-версии частых точек); asgi-sync — ASGI на синхронных представлениях
+SERVERS = {"wsgi": (False, False), "asgi": (True, True), "asgi-sync": (True, False)}
+
+
+class Command(BaseCommand):
+    help = (
+        "WSGI (синхронные представления) против ASGI (async-версии, ASYNC_VIEWS=1) на частых точках "
+        "(master_start, master_complete, dispatcher_new_count, order_success): N одновременных клиентов "
+        "с keep-alive, req/s и p50/p95/p99 по точкам. WSGI — "
+        "многопоточный сервер Django (поток на соединение), ASGI — минимальный сервер на asyncio "
+        "(core.benchmarks.asgi_server); оба в этом процессе, клиенты — на asyncio в отдельном потоке."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=500, help="одновременных клиентов")
+        parser.add_argument("--rounds", type=int, default=5, help="циклов на клиента")
+        parser.add_argument("--dispatcher-share", type=float, default=0.1, help="доля клиентов-диспетчеров")
+        parser.add_argument("--public-share", type=float, default=0.1, help="доля клиентов страницы «заявка принята»")
+        parser.add_argument("--servers", default="wsgi,asgi", help="wsgi,asgi,asgi-sync")
+
+    def handle(self, *args, **opts):
+        clients, rounds = opts["clients"], opts["rounds"]
+        dispatchers = int(clients * opts["dispatcher_share"])
+        public = int(clients * opts["public_share"])
+        masters_count = clients - dispatchers - public
+        servers = [name for name in opts["servers"].split(",") if name in SERVERS]
+        self.stdout.write(f"Профиль БД: {settings.DB_PROFILE}, клиентов: {clients} (мастеров {masters_count}, "
+                          f"диспетчеров {dispatchers}, публичных {public}), циклов: {rounds}")
+
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp, scratch_database(sqlite_file=Path(tmp) / "bench_asgi.sqlite3"):
+            masters = seed_masters(masters_count)
+            dispatcher = seed_dispatcher()
+            for server in servers:
+                for cache in caches.all():
+                    cache.clear()
+                auth.clear()
+                plan = self.prepare(masters, dispatcher, dispatchers, public, rounds)
+                is_asgi, async_views = SERVERS[server]
+                urlconf = async_urlconf() if async_views else settings.ROOT_URLCONF
+                with override_settings(ROOT_URLCONF=urlconf), (asgi_server() if is_asgi else live_server()) as base_url:
+                    results[server] = asyncio.run(self.load(base_url, plan, rounds))
+        self.report(results)
+
+    def prepare(self, masters, dispatcher, dispatchers, public, rounds) -> list:
+        """[(cookies, [(точка, метод, путь)] на цикл)] для каждого клиента."""
+        def order(master=None):
+            return Order(category="Сантехника", description="Течет кран", address="ул. Мира, д. 1",
+                         customer_name="Клиент", customer_contact="+79990000000",
+                         status=OrderStatus.ASSIGNED if master else OrderStatus.NEW, assigned_master=master)
+
+        orders = Order.objects.bulk_create([order(master) for master in masters for _ in range(rounds)])
+        created = Order.objects.bulk_create([order() for _ in range(public)])
+        plan = []
+        for i, master in enumerate(masters):
+            steps = [[("master_start", "POST", f"/master/order/{order.id}/start/"),
+                      ("master_complete", "POST", f"/master/order/{order.id}/complete/")]
+                     for order in orders[i * rounds:(i + 1) * rounds]]
+            plan.append((self.session(master), steps))
+        for _ in range(dispatchers):
+            plan.append((self.session(dispatcher), [[("dispatcher_new_count", "GET", "/dispatcher/new_count/")]] * rounds))
+        for new_order in created:
+            plan.append((self.session(None), [[("order_success", "GET", f"/order/success/{new_order.id}/")]] * rounds))
+        return plan
+
+    def session(self, user) -> dict:
+        cookies = {"csrftoken": _get_new_csrf_string()}
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            cookies[settings.SESSION_COOKIE_NAME] = client.cookies[settings.SESSION_COOKIE_NAME].value
+        return cookies
+
+    async def load(self, base_url, plan, rounds) -> dict:
+        clients = [AsyncHttpClient(base_url, cookies) for cookies, _ in plan]
+        # Соединения открываются заранее и понемногу: у WSGI-сервера Django
+        # короткая очередь accept, и лавина подключений мерила бы её, а не сервер.
+        gate = asyncio.Semaphore(16)
+
+        async def connect(client):
+            async with gate:
+                await client.connect()
+
+        await asyncio.gather(*(connect(client) for client in clients))
+        samples = defaultdict(list)
+        errors = defaultdict(int)
+
+        async def run(client, steps):
+            for step in steps:
+                for endpoint, method, path in step:
+                    try:
+                        status, ms = await client.request(method, path)
+                    except (ConnectionError, asyncio.IncompleteReadError):
+                        await client.close()
+                        status, ms = 0, 0.0
+                    samples[endpoint].append(ms)
+                    errors[endpoint] += status != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run(client, steps) for client, (_, steps) in zip(clients, plan)))
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*(client.close() for client in clients))
+
+        result = {endpoint: {**summarize(samples[endpoint], elapsed), "errors": errors[endpoint]}
+                  for endpoint in ENDPOINTS if samples[endpoint]}
+        result["total"] = {"requests": sum(len(v) for v in samples.values()), "elapsed": elapsed}
+        return result
+
+    def report(self, results):
+        for server, result in results.items():
+            total = result.pop("total")
+            self.stdout.write(f"\n{server.upper()}: {total['requests']} запросов за {total['elapsed']:.1f} с "
+                              f"({total['requests'] / total['elapsed']:.1f} req/s)")
+            for endpoint, summary in result.items():
+                self.stdout.write(
+                    f"  {endpoint:<22} запросов {summary['requests']:>6}  ошибок {summary['errors']:>4}  "
+                    f"{summary['throughput']:>8.1f} req/s  p50 {summary['p50']:>8.1f}  "
+                    f"p95 {summary['p95']:>8.1f}  p99 {summary['p99']:>8.1f} мс"
+                )
@@ -0,0 +1,84 @@
+import random
+import time
+
+from django.db.models import Count, Q
+
+from django.core.management.base import BaseCommand
+
+from core.assignment import Planner, auto_assign_batch
+from core.benchmarks import CATEGORIES, measure, scratch_database, seed_dispatcher, seed_masters, seed_orders
+from core.models import Order, OrderStatus, User
+from core.workload import OPEN_STATUSES, index
+
+
+def naive_pick(order):
+    """Прежний подход: агрегат загрузки по всем мастерам на каждую заявку."""
+    return (User.objects.filter(role="master", is_active=True)
+            .filter(Q(categories="") | Q(categories__icontains=order.category))
+            .annotate(load=Count("assigned_orders", filter=Q(assigned_orders__status__in=OPEN_STATUSES)))
+            .order_by("load", "id")
+            .values_list("id", flat=True)
+            .first())
+
+
+class Command(BaseCommand):
+    help = "Автоназначение очереди NEW: индекс загрузки в памяти против агрегата на каждую заявку."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=10_000, help="размер очереди NEW")
+        parser.add_argument("--masters", type=int, default=500)
+        parser.add_argument("--open", type=int, default=2_000, help="уже открытых заявок у мастеров")
+        parser.add_argument("--naive-sample", type=int, default=200,
+                            help="на скольких заявках замерить агрегатный подход")
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(13)
+        with scratch_database():
+            masters = seed_masters(opts["masters"])
+            for m in masters:
+                # Четверть мастеров — универсалы, остальные берут 1–2 категории.
+                m.categories = "" if rnd.random() < 0.25 else ", ".join(rnd.sample(CATEGORIES, rnd.randint(1, 2)))
+            User.objects.bulk_update(masters, ["categories"], batch_size=1000)
+            # Открытые заявки у мастеров (категорию не сверяем — это уже назначенная работа).
+            seed_orders(opts["open"], masters=masters, seed=1)
+            Order.objects.filter(assigned_master__isnull=True).delete()
+            Order.objects.update(status=OrderStatus.ASSIGNED)
+            seed_orders(opts["orders"], seed=2)
+            Order.objects.filter(assigned_master__isnull=True).update(status=OrderStatus.NEW)
+            dispatcher = seed_dispatcher()
+            queue = list(Order.objects.filter(status=OrderStatus.NEW).order_by("created_at", "id")
+                         .only("id", "category", "planned_date"))
+            self.stdout.write(f"Очередь: {len(queue)} заявок, мастеров: {len(masters)}, "
+                              f"открытых заявок: {Order.objects.filter(status__in=OPEN_STATUSES).count()}")
+
+            sample = queue[:opts["naive_sample"]]
+            naive_ms = measure(lambda: [naive_pick(o) for o in sample], 1) / max(len(sample), 1)
+
+            index.invalidate()
+            started = time.perf_counter()
+            index.ensure_loaded()
+            load_ms = (time.perf_counter() - started) * 1000
+
+            def plan_only():
+                planner = Planner()
+                for o in queue:
+                    master_id = planner.pick(o.category, o.planned_date)
+                    if master_id:
+                        planner.reserve(master_id, o.planned_date)
+
+            plan_ms = measure(plan_only, 3)
+
+            started = time.perf_counter()
+            result = auto_assign_batch(dispatcher)
+            total_ms = (time.perf_counter() - started) * 1000
+
+            loads = sorted(index.load(m.id) for m in masters)
+            self.stdout.write(f"Загрузка индекса: {load_ms:.1f} мс (один раз на процесс)")
+            self.stdout.write(f"Выбор мастера, агрегат на заявку: {naive_ms:.2f} мс/заявку "
+                              f"(≈ {naive_ms * len(queue) / 1000:.1f} с на очередь)")
+            self.stdout.write(f"Выбор мастера, индекс: {plan_ms / max(len(queue), 1) * 1000:.1f} мкс/заявку "
+                              f"({plan_ms:.0f} мс на очередь)")
+            self.stdout.write(f"Назначение очереди целиком (план + запись): {total_ms:.0f} мс, "
+                              f"назначено {len(result.updated)}, без мастера {len(result.errors)}")
+            self.stdout.write(f"Загрузка мастеров после: мин {loads[0]}, медиана {loads[len(loads) // 2]}, "
+                              f"макс {loads[-1]}")
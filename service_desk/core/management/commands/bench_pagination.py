@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from core.benchmarks import measure, scratch_database, seed_orders
+from core.models import Order
+from core.pagination import KeysetPaginator
+
+
+class Command(BaseCommand):
+    help = "Сравнение задержки N-й страницы: Paginator (COUNT + OFFSET) против KeysetPaginator."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=200_000)
+        parser.add_argument("--per-page", type=int, default=20)
+        parser.add_argument("--pages", default="1,10,100,1000,5000")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **opts):
+        per_page = opts["per_page"]
+        pages = [int(p) for p in opts["pages"].split(",")]
+
+        with scratch_database():
+            self.stdout.write(f"Заполнение: {opts['orders']} заявок...")
+            seed_orders(opts["orders"])
+
+            qs = Order.objects.select_related("assigned_master").order_by("-created_at", "-id")
+            keyset = KeysetPaginator(Order.objects.select_related("assigned_master"), per_page)
+
+            self.stdout.write(f"{'стр.':>6} {'Paginator, мс':>14} {'Keyset, мс':>11}")
+            for number in pages:
+                if (number - 1) * per_page >= opts["orders"]:
+                    continue
+
+                def offset_page():
+                    list(Paginator(qs, per_page).get_page(number).object_list)
+
+                # Курсор N-й страницы — последняя строка (N-1)-й; ищется вне замера.
+                cursor = None
+                if number > 1:
+                    boundary = qs[(number - 1) * per_page - 1]
+                    cursor = keyset.encode_cursor(boundary, "n")
+
+                def keyset_page():
+                    list(keyset.get_page(cursor).object_list)
+
+                self.stdout.write(
+                    f"{number:>6} {measure(offset_page, opts['repeat']):>14.2f} "
+                    f"{measure(keyset_page, opts['repeat']):>11.2f}"
+                )
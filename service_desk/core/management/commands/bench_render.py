@@ -0,0 +1,103 @@
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+
+from core import caching
+from core.benchmarks import percentile, scratch_database, seed_dispatcher, seed_masters
+from core.models import Order, OrderStatus
+from core.pagination import KeysetPaginator
+from core.queries import dispatcher_orders_qs, master_active_orders_qs
+
+# (подпись, TEMPLATE_PROFILE, строки из кэша фрагментов) — первая строка — база сравнения.
+CONFIGS = [
+    ("reload, строки без кэша", "reload", False),
+    ("reload, строки из кэша", "reload", True),
+    ("production, строки без кэша", "production", False),
+    ("production, строки из кэша", "production", True),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Время рендеринга списков заявок диспетчера и мастера (шаблон целиком, без запросов к базе) "
+        "на 20/100/500 строк: TEMPLATE_PROFILE reload/production, строки заново или из кэша фрагментов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="20,100,500", help="числа строк на странице через запятую")
+        parser.add_argument("--renders", type=int, default=30, help="рендерингов на схему")
+        parser.add_argument("--warmup", type=int, default=3)
+
+    def handle(self, *args, **opts):
+        sizes = [int(size) for size in opts["sizes"].split(",")]
+        with scratch_database():
+            master = seed_masters(1)[0]
+            dispatcher = seed_dispatcher()
+            Order.objects.bulk_create([
+                Order(category="Сантехника", description=f"Заявка {i}: течёт кран на кухне, нужна замена смесителя",
+                      address=f"ул. Мира, д. {i % 90 + 1}", customer_name="Клиент", customer_contact="+79990000000",
+                      status=OrderStatus.ASSIGNED, assigned_master=master)
+                for i in range(max(sizes))
+            ])
+            pages = [
+                ("dispatcher/orders_list.html", dispatcher, ["dispatcher_row"], self.dispatcher_context),
+                ("master/orders_list.html", master, ["master_card", "master_row"], self.master_context),
+            ]
+            for template_name, user, fragments, make_context in pages:
+                self.stdout.write(f"\n{template_name}")
+                for size in sizes:
+                    results = {
+                        label: self.run(template_name, user, fragments, make_context, size, profile, warm, opts)
+                        for label, profile, warm in CONFIGS
+                    }
+                    self.report(size, results)
+
+    def dispatcher_context(self, user, size):
+        return {
+            "page": KeysetPaginator(dispatcher_orders_qs(), size).get_page(None),
+            "status_filter": "",
+            "q": "",
+            "statuses": OrderStatus.choices,
+            "masters": caching.master_roster(),
+        }
+
+    def master_context(self, user, size):
+        page = KeysetPaginator(master_active_orders_qs(user), size).get_page(None)
+        return {"orders": page.object_list, "page": page}
+
+    def run(self, template_name, user, fragments, make_context, size, profile, warm, opts) -> list:
+        templates = copy.deepcopy(settings.TEMPLATES)
+        templates[0]["OPTIONS"]["loaders"] = settings.TEMPLATE_PROFILES[profile]
+        for cache in caches.all():
+            cache.clear()
+        request = RequestFactory().get("/", SERVER_NAME="127.0.0.1")
+        request.user = user
+        timings = []
+        with override_settings(TEMPLATES=templates):
+            for i in range(opts["warmup"] + opts["renders"]):
+                if not warm:
+                    caches["fragments"].clear()
+                context = make_context(user, size)
+                rows = context["page"].object_list
+                for name in fragments:
+                    caching.prefetch_fragments(name, rows)
+                started = time.perf_counter()
+                render_to_string(template_name, context, request)
+                if i >= opts["warmup"]:
+                    timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def report(self, size, results):
+        base_p50 = percentile(next(iter(results.values())), 50)
+        self.stdout.write(f"  {size} строк")
+        for label, timings in results.items():
+            p50, p95 = percentile(timings, 50), percentile(timings, 95)
+            self.stdout.write(
+                f"    {label:<30} p50 {p50:>8.2f} мс (x{base_p50 / p50:>5.1f})  p95 {p95:>8.2f} мс  "
+                f"{p50 * 1000 / size:>7.1f} мкс/строка"
+            )
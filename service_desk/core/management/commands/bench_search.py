@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import measure, scratch_database, seed_orders
+from core.models import Order
+from core.search import icontains_q, search_orders
+
+
+def queries(orders: int) -> list:
+    """
+    Запросы от редкого к частому. Регистр как в данных: LIKE в SQLite
+    не сворачивает регистр кириллицы, иначе icontains просто ничего не найдёт.
+    """
+    return [
+        f"Клиент {orders * 7 // 9}",
+        f"+7999{orders // 3:07d}",
+        "Садовая 17",
+        "Отопление",
+        "не работает",
+    ]
+
+
+class Command(BaseCommand):
+    help = "Поиск заявок: icontains по полям (как было в админке) против полнотекстового индекса."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=1_000_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--per-page", type=int, default=20)
+        parser.add_argument("--sqlite-file", help="файл временной базы вместо памяти")
+
+    def handle(self, *args, **opts):
+        per_page = opts["per_page"]
+
+        with scratch_database(sqlite_file=opts["sqlite_file"]):
+            self.stdout.write(f"Заполнение: {opts['orders']} заявок (индекс поиска — триггерами)...")
+            seed_orders(opts["orders"])
+
+            base = Order.objects.order_by("-created_at", "-id")
+            self.stdout.write(
+                f"{'запрос':<16} {'icontains, мс':>14} {'индекс, мс':>11} "
+                f"{'count icontains':>16} {'count индекс':>13} {'найдено':>9}"
+            )
+            for q in queries(opts["orders"]):
+                like = base.filter(icontains_q(q))
+                fts = search_orders(base, q)
+                found = fts.count()
+                self.stdout.write(
+                    f"{q:<16} "
+                    f"{measure(lambda: list(like[:per_page]), opts['repeat']):>14.2f} "
+                    f"{measure(lambda: list(fts[:per_page]), opts['repeat']):>11.2f} "
+                    f"{measure(like.count, opts['repeat']):>16.2f} "
+                    f"{measure(fts.count, opts['repeat']):>13.2f} "
+                    f"{found:>9}"
+                )
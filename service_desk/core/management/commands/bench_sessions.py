@@ -0,0 +1,96 @@
+import time
+from collections import defaultdict
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core import auth
+from core.benchmarks import percentile, scratch_database, seed_dispatcher, seed_masters
+from core.models import Order, OrderStatus
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+# (подпись, SESSION_PROFILE, кэш пользователя) — первая строка — прежняя схема.
+CONFIGS = [
+    ("db", "db", False),
+    ("db + кэш пользователя", "db", True),
+    ("cached_db + кэш пользователя", "cached_db", True),
+    ("signed_cookies + кэш пользователя", "signed_cookies", True),
+]
+ENDPOINTS = ["dispatcher_new_count", "master_start", "master_complete"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Стоимость сессии и пользователя на частых JSON-точках (dispatcher_new_count, master_start, "
+        "master_complete): SQL-запросов и мс на запрос для SESSION_PROFILE db/cached_db/signed_cookies "
+        "с кэшем пользователя core.auth и без. Запросы идут через тестовый клиент в процессе, без сети: "
+        "разница — ровно работа middleware и представления."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=300, help="запросов к каждой точке на схему")
+        parser.add_argument("--warmup", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        n, warmup = opts["requests"], opts["warmup"]
+        with scratch_database():
+            master = seed_masters(1)[0]
+            dispatcher = seed_dispatcher()
+            Order.objects.bulk_create([
+                Order(category="Сантехника", description=f"Заявка {i}", address="ул. Мира, д. 1",
+                      customer_name="Клиент", customer_contact="+79990000000", status=OrderStatus.ASSIGNED,
+                      assigned_master=master)
+                for i in range(len(CONFIGS) * (n + warmup))
+            ])
+            orders = iter(Order.objects.order_by("id").values_list("id", flat=True))
+
+            results = {}
+            for label, profile, user_cache in CONFIGS:
+                results[label] = self.run(profile, user_cache, dispatcher, master, orders, n, warmup)
+        self.report(results)
+
+    def run(self, profile, user_cache, dispatcher, master, orders, n, warmup) -> dict:
+        for cache in caches.all():
+            cache.clear()
+        auth.clear()
+        samples = defaultdict(list)
+        with override_settings(SESSION_ENGINE=ENGINES[profile], USER_CACHE_TTL=30 if user_cache else 0):
+            desk, field = Client(SERVER_NAME="127.0.0.1"), Client(SERVER_NAME="127.0.0.1")
+            desk.force_login(dispatcher)
+            field.force_login(master)
+            for i in range(warmup + n):
+                order_id = next(orders)
+                for endpoint, client, method, args in [
+                    ("dispatcher_new_count", desk, "get", ()),
+                    ("master_start", field, "post", (order_id,)),
+                    ("master_complete", field, "post", (order_id,)),
+                ]:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(reverse(endpoint, args=args))
+                    ms = (time.perf_counter() - started) * 1000
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{endpoint}: HTTP {response.status_code}")
+                    if i >= warmup:
+                        samples[endpoint].append((response.request_metrics.queries, ms))
+        return samples
+
+    def report(self, results):
+        baseline = next(iter(results.values()))
+        for endpoint in ENDPOINTS:
+            self.stdout.write(f"\n{endpoint}")
+            base_q = sum(q for q, _ in baseline[endpoint]) / len(baseline[endpoint])
+            base_p50 = percentile([ms for _, ms in baseline[endpoint]], 50)
+            for label, samples in results.items():
+                queries = sum(q for q, _ in samples[endpoint]) / len(samples[endpoint])
+                timings = [ms for _, ms in samples[endpoint]]
+                p50, p95 = percentile(timings, 50), percentile(timings, 95)
+                self.stdout.write(
+                    f"  {label:<36} SQL {queries:>5.2f} ({queries - base_q:+.2f})  "
+                    f"p50 {p50:>6.2f} мс ({p50 - base_p50:+.2f})  p95 {p95:>6.2f} мс"
+                )
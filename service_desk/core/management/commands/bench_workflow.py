@@ -0,0 +1,157 @@
+import platform
+import re
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from core.benchmarks import (
+    HttpClient, compare_to_baseline, live_server, load_baseline, save_baseline, scratch_database,
+    seed_dispatcher, seed_history, seed_masters, seed_orders, summarize,
+)
+from core.models import OrderHistory
+from core.workload import index
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "bench_baseline.json"
+# Порядок точек в отчёте — порядок шагов жизненного цикла.
+ENDPOINTS = ["create_order", "dispatcher_order_detail", "dispatcher_assign", "master_start", "master_complete"]
+SUCCESS_RE = re.compile(r"/order/success/(\d+)/")
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк полного цикла заявки на живом сервере: create_order -> карточка диспетчера -> "
+        "назначение -> master_start -> master_complete в несколько потоков. Печатает p50/p95/p99 и "
+        "req/s по точкам (req/s — доля точки в общей смешанной нагрузке) и сравнивает с базовой линией."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=10_000, help="заявок в базе до начала замера")
+        parser.add_argument("--masters", type=int, default=50)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--cycles", type=int, default=25, help="полных циклов заявки на поток")
+        parser.add_argument("--warmup", type=int, default=2, help="циклов на поток до замера")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE),
+                            help="JSON базовой линии для сравнения")
+        parser.add_argument("--save-baseline", action="store_true",
+                            help="записать результат как новую базовую линию (--baseline)")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="допустимое ухудшение относительно базовой линии (0.2 = 20%%)")
+        parser.add_argument("--strict", action="store_true", help="завершиться с ошибкой при регрессии")
+
+    def handle(self, *args, **opts):
+        workers = opts["workers"]
+        self.stdout.write(f"Профиль БД: {settings.DB_PROFILE}, потоков: {workers}, циклов на поток: {opts['cycles']}")
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                scratch_database(sqlite_file=Path(tmp) / "bench_workflow.sqlite3"):
+            # Кэш процесса пережил прошлый запуск на другой временной базе: индекс
+            # загрузки перечитывается, а заявки помечаются меткой запуска, чтобы
+            # защита от дублей (core.intake) не вернула id из прошлой базы.
+            index.invalidate()
+            self.run_id = uuid.uuid4().hex[:8]
+            started = time.perf_counter()
+            masters = seed_masters(max(opts["masters"], workers))
+            dispatcher = seed_dispatcher()
+            seed_orders(opts["orders"], masters=masters)
+            seed_history(dispatcher)
+            self.stdout.write(f"Данные: {opts['orders']} заявок, {len(masters)} мастеров, "
+                              f"{OrderHistory.objects.count()} записей истории "
+                              f"за {time.perf_counter() - started:.1f} с")
+
+            with live_server() as base_url, override_settings(INTAKE_RATE_LIMITS={}):
+                # Все клиенты приходят с 127.0.0.1: лимит по IP мерил бы сам себя.
+                def prepare(worker):
+                    public, desk, master = HttpClient(base_url), HttpClient(base_url), HttpClient(base_url)
+                    public.request("/order/new/")  # csrftoken
+                    desk.login(dispatcher.username)
+                    master.login(masters[worker].username)
+                    return public, desk, master, masters[worker].id
+
+                def run(clients, worker, cycles, offset):
+                    return [sample for cycle in range(cycles)
+                            for sample in self.lifecycle(clients, worker, offset + cycle)]
+
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    clients = list(pool.map(prepare, range(workers)))
+                    list(pool.map(run, clients, range(workers), [opts["warmup"]] * workers, [0] * workers))
+                    started = time.perf_counter()
+                    samples = [s for chunk in pool.map(run, clients, range(workers), [opts["cycles"]] * workers,
+                                                       [opts["warmup"]] * workers) for s in chunk]
+                    elapsed = time.perf_counter() - started
+
+        results = self.report(samples, elapsed)
+        self.check_baseline(results, opts)
+
+    def lifecycle(self, clients, worker, cycle) -> list:
+        """Один цикл заявки; [(точка, успех, мс)]. Без id новой заявки цикл обрывается."""
+        public, desk, master, master_id = clients
+        status, ms = public.request("/order/new/", {
+            "category": "Сантехника", "description": f"Течет кран {self.run_id}-{worker}-{cycle}",
+            "address": "ул. Мира, 1", "customer_name": "Клиент", "customer_contact": f"+7998{worker:03d}{cycle:04d}",
+        })
+        match = SUCCESS_RE.search(public.location) if status == 302 else None
+        samples = [("create_order", bool(match), ms)]
+        if not match:
+            return samples
+        detail = f"/dispatcher/order/{match.group(1)}/"
+        for endpoint, path, data, ok in [
+            ("dispatcher_order_detail", detail, None, 200),
+            ("dispatcher_assign", detail, {"action": "assign", "master_id": master_id}, 302),
+            ("master_start", f"/master/order/{match.group(1)}/start/", {}, 200),
+            ("master_complete", f"/master/order/{match.group(1)}/complete/", {}, 200),
+        ]:
+            status, ms = (desk if endpoint.startswith("dispatcher") else master).request(path, data)
+            samples.append((endpoint, status == ok, ms))
+        return samples
+
+    def report(self, samples, elapsed) -> dict:
+        by_endpoint = defaultdict(list)
+        errors = defaultdict(int)
+        for endpoint, ok, ms in samples:
+            by_endpoint[endpoint].append(ms)
+            errors[endpoint] += not ok
+
+        results = {}
+        for endpoint in ENDPOINTS:
+            summary = summarize(by_endpoint[endpoint], elapsed)
+            summary["errors"] = errors[endpoint]
+            results[endpoint] = summary
+            self.stdout.write(
+                f"{endpoint:<24} запросов {summary['requests']:>6}  ошибок {summary['errors']:>4}  "
+                f"{summary['throughput']:>8.1f} req/s  p50 {summary['p50']:>7.1f}  "
+                f"p95 {summary['p95']:>7.1f}  p99 {summary['p99']:>7.1f} мс"
+            )
+        self.stdout.write(f"Всего: {len(samples)} запросов за {elapsed:.1f} с ({len(samples) / elapsed:.1f} req/s)")
+        return results
+
+    def check_baseline(self, results, opts):
+        path = Path(opts["baseline"])
+        if opts["save_baseline"]:
+            save_baseline(path, results, db_profile=settings.DB_PROFILE, workers=opts["workers"],
+                          cycles=opts["cycles"], orders=opts["orders"], python=platform.python_version())
+            self.stdout.write(f"Базовая линия записана: {path}")
+            return
+        if not path.exists():
+            self.stdout.write(f"Базовой линии нет ({path}); запишите её с --save-baseline.")
+            return
+
+        baseline = load_baseline(path)
+        meta = baseline.get("meta", {})
+        if (meta.get("workers"), meta.get("db_profile")) != (opts["workers"], settings.DB_PROFILE):
+            self.stdout.write(self.style.WARNING(
+                f"Базовая линия снята с другими параметрами: {meta}; сравнение ориентировочное."))
+        regressions = compare_to_baseline(results, baseline, opts["tolerance"])
+        for endpoint, metric, before, after in regressions:
+            self.stdout.write(self.style.ERROR(f"Регрессия {endpoint} {metric}: {before} -> {after}"))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f"Регрессий относительно {path.name} нет "
+                                                 f"(допуск {opts['tolerance']:.0%})."))
+        elif opts["strict"]:
+            raise CommandError(f"Регрессий относительно базовой линии: {len(regressions)}")
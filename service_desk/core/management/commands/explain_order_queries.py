@@ -0,0 +1,53 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.queries import HOT_QUERIES
+
+# Имя индекса в плане: SQLite — "USING [COVERING] INDEX name",
+# PostgreSQL — "Index [Only] Scan [Backward] using name" / "Bitmap Index Scan on name".
+INDEX_PATTERNS = [
+    re.compile(r"USING (?:COVERING )?INDEX (\w+)"),
+    re.compile(r"Index (?:Only )?Scan (?:Backward )?using (\w+)"),
+    re.compile(r"Bitmap Index Scan on (\w+)"),
+]
+
+
+def used_indexes(plan: str) -> list:
+    found = []
+    for pattern in INDEX_PATTERNS:
+        found += [name for name in pattern.findall(plan) if name not in found]
+    return found
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN для запросов горячих представлений (core.queries) и проверка используемых индексов."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--master-id", type=int, default=1)
+        parser.add_argument("--verbose-plan", action="store_true", help="Печатать план целиком.")
+        parser.add_argument(
+            "--strict", action="store_true",
+            help="Завершиться с ошибкой, если запрос не использует ожидаемый индекс.",
+        )
+
+    def handle(self, *args, **opts):
+        regressions = []
+        self.stdout.write(f"Бэкенд: {connection.vendor}")
+
+        for name, (build, expected) in HOT_QUERIES.items():
+            plan = build(opts["master_id"]).explain()
+            indexes = used_indexes(plan)
+            ok = any(index in indexes for index in expected)
+            status = self.style.SUCCESS("OK") if ok else self.style.ERROR("РЕГРЕССИЯ")
+            self.stdout.write(
+                f"{status:<10} {name:<36} индексы: {', '.join(indexes) or '-'} (ожидается {' | '.join(expected)})"
+            )
+            if opts["verbose_plan"]:
+                self.stdout.write("    " + plan.replace("\n", "\n    "))
+            if not ok:
+                regressions.append(name)
+
+        if regressions and opts["strict"]:
+            raise CommandError(f"Запросы без ожидаемого индекса: {', '.join(regressions)}")
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import geo
+from core.models import Order
+
+
+class Command(BaseCommand):
+    help = "Проставить координаты заявкам без них (то же, что задача geocode_pending_orders)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.GEOCODER_BATCH_SIZE)
+        parser.add_argument("--max-batches", type=int, default=None)
+        parser.add_argument("--reset", action="store_true",
+                            help="заново обработать все заявки (например, после смены GEOCODER_BACKEND)")
+
+    def handle(self, *args, **opts):
+        if opts["reset"]:
+            Order.objects.update(lat=None, lon=None, geohash="", geocoded_at=None)
+        total = geo.locate_pending(batch_size=opts["batch_size"], max_batches=opts["max_batches"])
+        located = Order.objects.filter(lat__isnull=False).count()
+        self.stdout.write(self.style.SUCCESS(f"Обработано заявок: {total}; с координатами всего: {located}."))
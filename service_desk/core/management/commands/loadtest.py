@@ -0,0 +1,95 @@
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.test import override_settings
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import HttpClient, live_server, percentile, scratch_database, seed_masters
+from core.models import Order, OrderStatus
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест создания заявок и смены статусов на живом сервере. "
+        "Профиль базы выбирается окружением: DB_PROFILE=sqlite|sqlite-tuned|postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=50, help="POST-запросов создания на поток.")
+        parser.add_argument("--orders-per-master", type=int, default=25)
+
+    def handle(self, *args, **opts):
+        workers = opts["workers"]
+        self.stdout.write(f"Профиль БД: {settings.DB_PROFILE}, потоков: {workers}")
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                scratch_database(sqlite_file=Path(tmp) / "loadtest.sqlite3"):
+            masters = seed_masters(workers)
+            Order.objects.bulk_create([
+                Order(category="Сантехника", description="Нагрузочный тест", customer_name="Клиент",
+                      customer_contact="+79990000000", status=OrderStatus.ASSIGNED, assigned_master=m)
+                for m in masters for _ in range(opts["orders_per_master"])
+            ])
+            order_ids = {
+                m.id: list(Order.objects.filter(assigned_master=m).values_list("id", flat=True)) for m in masters
+            }
+
+            with live_server() as base_url:
+                def new_client(_):
+                    client = HttpClient(base_url)
+                    client.request("/order/new/")  # csrftoken
+                    return client
+
+                def create_orders(client, worker):
+                    # Разные контакт и описание: каждая отправка — новая заявка (core.intake).
+                    return [client.request("/order/new/", {
+                        "category": "Электрика", "description": f"Не работает розетка {worker}-{i}",
+                        "address": "ул. Мира, 1", "customer_name": "Клиент",
+                        "customer_contact": f"+7999{worker:03d}{i:04d}",
+                    }) for i in range(opts["requests"])]
+
+                def resubmit_orders(client, _):
+                    # Повторная отправка одной и той же формы: ответ — уже принятая заявка, без записи.
+                    return [client.request("/order/new/", {
+                        "category": "Электрика", "description": "Не работает розетка", "address": "ул. Мира, 1",
+                        "customer_name": "Клиент", "customer_contact": "+79990000001",
+                    }) for _ in range(opts["requests"])]
+
+                def master_client(master):
+                    client = HttpClient(base_url)
+                    client.login(master.username)
+                    return client
+
+                def change_statuses(client, master):
+                    results = []
+                    for order_id in order_ids[master.id]:
+                        results.append(client.request(f"/master/order/{order_id}/start/", {}))
+                        results.append(client.request(f"/master/order/{order_id}/complete/", {}))
+                    return results
+
+                # Все клиенты теста приходят с 127.0.0.1: лимит по IP здесь мерил бы сам себя.
+                with override_settings(INTAKE_RATE_LIMITS={}):
+                    self.run_scenario("create_order", new_client, create_orders, range(workers), ok=(302,))
+                    self.run_scenario("create_order (дубли)", new_client, resubmit_orders, range(workers), ok=(302,))
+                self.run_scenario("master_start/complete", master_client, change_statuses, masters, ok=(200,))
+
+    def run_scenario(self, name, prepare, fn, args, ok):
+        """prepare(arg) — подготовка клиента вне замера (CSRF, вход), fn(client, arg) — нагрузка."""
+        args = list(args)
+        with ThreadPoolExecutor(max_workers=len(args)) as pool:
+            clients = list(pool.map(prepare, args))
+            started = time.perf_counter()
+            results = [r for chunk in pool.map(fn, clients, args) for r in chunk]
+            elapsed = time.perf_counter() - started
+
+        latencies = [ms for _, ms in results]
+        errors = sum(1 for status, _ in results if status not in ok)
+        self.stdout.write(
+            f"{name:<24} запросов {len(results):>6}  ошибок {errors:>4}  "
+            f"{len(results) / elapsed:>8.1f} req/s  "
+            f"p50 {percentile(latencies, 50):>7.1f} мс  p95 {percentile(latencies, 95):>7.1f} мс"
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитать свёртки длительностей этапов заявки (core.analytics) за последние дни. "
+        "По расписанию задача пересчитывает ANALYTICS_REFRESH_DAYS дней; команда — для начального заполнения."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=365, help="сколько последних дней пересчитать")
+
+    def handle(self, *args, **opts):
+        rows = analytics.refresh(days=opts["days"])
+        self.stdout.write(self.style.SUCCESS(f"Свёртки за {opts['days']} дн. пересчитаны: {rows} строк."))
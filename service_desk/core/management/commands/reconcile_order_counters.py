@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core import counters
+
+
+class Command(BaseCommand):
+    help = "Пересобрать счётчики OrderCounter по таблице заявок и показать расхождения."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Только показать расхождения.")
+
+    def handle(self, *args, **opts):
+        drift = counters.rebuild(dry_run=opts["dry_run"])
+        for (dimension, key, status), (stored, actual) in sorted(drift.items()):
+            self.stdout.write(f"{dimension:<9} {key or '-':<20} {status:<12} было {stored:>6}, по факту {actual:>6}")
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Расхождений нет."))
+        elif opts["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"Расхождений: {len(drift)} (не исправлено, --dry-run)."))
+        else:
+            self.stdout.write(self.style.WARNING(f"Расхождений: {len(drift)}, счётчики пересобраны."))
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Отправить готовые уведомления outbox (то же, что задача relay_outbox). С --loop работает как "
+        "отдельный воркер; несколько воркеров делят очередь через SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument("--loop", action="store_true", help="не завершаться, опрашивать очередь")
+        parser.add_argument("--interval", type=float, default=1.0, help="пауза при пустой очереди, с")
+
+    def handle(self, *args, **opts):
+        while True:
+            sent = notifications.relay(batch_size=opts["batch_size"])
+            if sent or not opts["loop"]:
+                self.stdout.write(f"Отправлено: {sent}")
+            if not opts["loop"]:
+                return
+            if not sent:
+                time.sleep(opts["interval"])
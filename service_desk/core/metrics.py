@@ -0,0 +1,166 @@
+"""
+Метрики запросов к представлениям: число SQL-запросов, время SQL,
+время рендеринга шаблонов и полное время ответа.
+
+Значения собирает core.middleware.RequestMetricsMiddleware, хранятся они
+в памяти процесса (у каждого воркера свои) и отдаются в текстовом
+формате Prometheus представлением metrics_view (/metrics).
+
+Текущий RequestMetrics лежит в contextvar, а счётчик SQL стоит на каждом
+соединении постоянно (connection_created, см. apps.py): под ASGI запросы
+асинхронного представления выполняются в потоке sync_to_async, куда
+контекст копируется, а соединения у потока свои.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.template.base import Template
+
+# Границы гистограммы времени ответа, секунды.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_current = ContextVar("request_metrics", default=None)
+_local = threading.local()
+
+
+@dataclass
+class RequestMetrics:
+    queries: int = 0
+    db_ms: float = 0.0
+    template_ms: float = 0.0
+    total_ms: float = 0.0
+
+    def server_timing(self) -> str:
+        return (f'db;dur={self.db_ms:.1f};desc="{self.queries} queries", '
+                f"tpl;dur={self.template_ms:.1f}, total;dur={self.total_ms:.1f}")
+
+
+# ---------- сбор в рамках одного запроса ----------
+
+
+def current() -> RequestMetrics | None:
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """Собирать метрики текущего контекста (запроса) в новый RequestMetrics."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def query_timer(execute, sql, params, many, context):
+    """Обёртка execute_wrapper: считает запросы и их время, если идёт сбор."""
+    metrics = current()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_ms += (time.perf_counter() - started) * 1000
+
+
+def _timed_render(render):
+    def wrapper(self, context):
+        metrics = current()
+        depth = getattr(_local, "render_depth", 0)
+        if metrics is None or depth:
+            # Вложенные include/extends уже входят во время внешнего шаблона.
+            return render(self, context)
+        _local.render_depth = 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            _local.render_depth = 0
+            metrics.template_ms += (time.perf_counter() - started) * 1000
+
+    wrapper.timed = True
+    return wrapper
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """Обработчик connection_created: счётчик SQL на соединении (один раз)."""
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+def instrument_templates():
+    """Один раз на процесс обернуть Template.render замером времени."""
+    if not getattr(Template.render, "timed", False):
+        Template.render = _timed_render(Template.render)
+
+
+# ---------- агрегаты процесса ----------
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}   # (view, method, status) -> число
+        self.views = {}      # view -> {"count", "queries", "db", "tpl", "total", "buckets"}
+
+    def observe(self, view: str, method: str, status: int, m: RequestMetrics):
+        with self.lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            v = self.views.setdefault(view, {
+                "count": 0, "queries": 0, "db": 0.0, "tpl": 0.0, "total": 0.0,
+                "buckets": [0] * len(DURATION_BUCKETS),
+            })
+            v["count"] += 1
+            v["queries"] += m.queries
+            v["db"] += m.db_ms / 1000
+            v["tpl"] += m.template_ms / 1000
+            v["total"] += m.total_ms / 1000
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if m.total_ms / 1000 <= bound:
+                    v["buckets"][i] += 1
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+            self.views.clear()
+
+    def render_prometheus(self, extra: list | None = None) -> str:
+        lines = [
+            "# HELP service_desk_requests_total HTTP-запросы по представлению, методу и статусу.",
+            "# TYPE service_desk_requests_total counter",
+        ]
+        with self.lock:
+            for (view, method, status), n in sorted(self.requests.items()):
+                lines.append(f'service_desk_requests_total{{view="{view}",method="{method}",status="{status}"}} {n}')
+
+            lines += [
+                "# HELP service_desk_request_duration_seconds Полное время ответа представления.",
+                "# TYPE service_desk_request_duration_seconds histogram",
+            ]
+            for view, v in sorted(self.views.items()):
+                for bound, n in zip(DURATION_BUCKETS, v["buckets"]):
+                    lines.append(f'service_desk_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {n}')
+                lines.append(f'service_desk_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {v["count"]}')
+                lines.append(f'service_desk_request_duration_seconds_sum{{view="{view}"}} {v["total"]:.6f}')
+                lines.append(f'service_desk_request_duration_seconds_count{{view="{view}"}} {v["count"]}')
+
+            for metric, field, help_text in [
+                ("service_desk_db_queries_total", "queries", "SQL-запросы, выполненные представлением."),
+                ("service_desk_db_duration_seconds_total", "db", "Суммарное время SQL."),
+                ("service_desk_template_duration_seconds_total", "tpl", "Суммарное время рендеринга шаблонов."),
+            ]:
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                for view, v in sorted(self.views.items()):
+                    value = v[field]
+                    lines.append(f'{metric}{{view="{view}"}} {value if field == "queries" else f"{value:.6f}"}')
+        lines += extra or []
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
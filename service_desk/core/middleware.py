@@ -0,0 +1,101 @@
+import time
+from abc import ABC, abstractmethod
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from . import auth, metrics, staticfiles
+
+
+class AsyncCapableMiddleware(ABC):
+    """
+    Основа middleware без MiddlewareMixin, работающего и под WSGI, и под
+    ASGI: в цепочке с async-представлениями синхронный middleware заставил
+    бы Django гонять весь запрос через поток (async_to_sync/sync_to_async).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.handle(request)
+
+    @abstractmethod
+    def handle(self, request):
+        """Обработка запроса под WSGI: get_response синхронный."""
+
+    @abstractmethod
+    async def __acall__(self, request):
+        """Обработка запроса под ASGI: get_response — корутина."""
+
+
+class StaticFilesMiddleware(AsyncCapableMiddleware):
+    """
+    Собранная статика (collectstatic) из STATIC_ROOT — сжатые варианты и
+    Cache-Control: immutable, см. core.staticfiles. Стоит первым: запросы
+    статики не доходят до сессий, пользователя и метрик представлений.
+    """
+
+    def handle(self, request):
+        response = staticfiles.serve(request)
+        return self.get_response(request) if response is None else response
+
+    async def __acall__(self, request):
+        response = staticfiles.serve(request)
+        return await self.get_response(request) if response is None else response
+
+
+class RequestMetricsMiddleware(AsyncCapableMiddleware):
+    """
+    Замер стоимости каждого запроса: число SQL-запросов и их время,
+    время шаблонов и полное время. Результат — заголовок Server-Timing,
+    атрибут response.request_metrics (для тестов, см. core.testing)
+    и агрегаты для /metrics.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        metrics.instrument_templates()
+        # Соединения, открытые до подключения сигнала (core.apps), — вручную.
+        for connection in connections.all(initialized_only=True):
+            metrics.instrument_connection(None, connection)
+
+    def handle(self, request):
+        started = time.perf_counter()
+        with metrics.collect() as m:
+            response = self.get_response(request)
+        return self.finish(request, response, m, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with metrics.collect() as m:
+            response = await self.get_response(request)
+        return self.finish(request, response, m, started)
+
+    def finish(self, request, response, m, started):
+        m.total_ms = (time.perf_counter() - started) * 1000
+        response["Server-Timing"] = m.server_timing()
+        response.request_metrics = m
+
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match else "") or "unresolved"
+        metrics.registry.observe(view, request.method, response.status_code, m)
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware с пользователем из кэша процесса (core.auth)."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: auth.get_user(request))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_order_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'new')), fields=['-created_at', '-id'], name='order_new_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'done'), _negated=True), fields=['assigned_master', '-created_at', '-id', 'status'], name='order_master_active_idx'),
+        ),
+    ]
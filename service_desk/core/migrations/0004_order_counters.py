@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:19
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_counters(apps, schema_editor):
+    # Логика пересчёта заморожена здесь, а не взята из core.counters:
+    # миграция не должна меняться вместе с кодом приложения.
+    Order = apps.get_model("core", "Order")
+    OrderCounter = apps.get_model("core", "OrderCounter")
+    counts = {}
+    for row in Order.objects.values("status").annotate(n=Count("id")).order_by():
+        counts[("status", "", row["status"])] = row["n"]
+    for row in Order.objects.values("category", "status").annotate(n=Count("id")).order_by():
+        counts[("category", row["category"], row["status"])] = row["n"]
+    days = Order.objects.annotate(day=TruncDate("created_at")).values("day", "status").annotate(n=Count("id"))
+    for row in days.order_by():
+        counts[("day", row["day"].isoformat(), row["status"])] = row["n"]
+    OrderCounter.objects.bulk_create(
+        [OrderCounter(dimension=d, key=k, status=s, value=v) for (d, k, s), v in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_order_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('status', 'Статус'), ('category', 'Категория'), ('day', 'День создания')], max_length=10)),
+                ('key', models.CharField(blank=True, default='', max_length=100)),
+                ('status', models.CharField(choices=[('new', 'Новая'), ('assigned', 'Назначена'), ('in_progress', 'В работе'), ('done', 'Завершена'), ('cancelled', 'Отменена')], max_length=20)),
+                ('value', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ordercounter',
+            constraint=models.UniqueConstraint(fields=('dimension', 'key', 'status'), name='order_counter_unique'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
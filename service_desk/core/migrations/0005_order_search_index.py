@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# Схема зафиксирована на момент миграции (SQL, а не импорт core.search):
+# дальнейшие правки поиска идут новыми миграциями, эта не меняется.
+DOCUMENT = "replace(replace(category || ' ' || customer_name || ' ' || customer_contact || ' ' || address || ' ' || description, 'ё', 'е'), 'Ё', 'Е')"
+
+SCHEMA = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE core_order_fts USING fts5(body, content='', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER core_order_fts_ai AFTER INSERT ON core_order BEGIN INSERT INTO core_order_fts(rowid, body) VALUES (new.id, replace(replace(new.category || ' ' || new.customer_name || ' ' || new.customer_contact || ' ' || new.address || ' ' || new.description, 'ё', 'е'), 'Ё', 'Е')); END",
+        "CREATE TRIGGER core_order_fts_ad AFTER DELETE ON core_order BEGIN INSERT INTO core_order_fts(core_order_fts, rowid, body) VALUES ('delete', old.id, replace(replace(old.category || ' ' || old.customer_name || ' ' || old.customer_contact || ' ' || old.address || ' ' || old.description, 'ё', 'е'), 'Ё', 'Е')); END",
+        "CREATE TRIGGER core_order_fts_au AFTER UPDATE OF category, customer_name, customer_contact, address, description ON core_order BEGIN INSERT INTO core_order_fts(core_order_fts, rowid, body) VALUES ('delete', old.id, replace(replace(old.category || ' ' || old.customer_name || ' ' || old.customer_contact || ' ' || old.address || ' ' || old.description, 'ё', 'е'), 'Ё', 'Е')); INSERT INTO core_order_fts(rowid, body) VALUES (new.id, replace(replace(new.category || ' ' || new.customer_name || ' ' || new.customer_contact || ' ' || new.address || ' ' || new.description, 'ё', 'е'), 'Ё', 'Е')); END",
+        # заполнение индекса существующими заявками
+        "INSERT INTO core_order_fts(rowid, body) SELECT id, " + DOCUMENT + " FROM core_order",
+    ],
+    "postgresql": [
+        "CREATE INDEX order_search_idx ON core_order USING GIN (to_tsvector('russian', coalesce(category, '') || ' ' || coalesce(customer_name, '') || ' ' || coalesce(customer_contact, '') || ' ' || coalesce(address, '') || ' ' || coalesce(description, '')))",
+    ],
+}
+
+DROP_SCHEMA = {
+    "sqlite": [
+        'DROP TRIGGER IF EXISTS core_order_fts_au',
+        'DROP TRIGGER IF EXISTS core_order_fts_ad',
+        'DROP TRIGGER IF EXISTS core_order_fts_ai',
+        'DROP TABLE IF EXISTS core_order_fts',
+    ],
+    "postgresql": [
+        'DROP INDEX IF EXISTS order_search_idx',
+    ],
+}
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql, params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+    # Схема индекса зависит от СУБД (FTS5 или GIN по tsvector), см. core.search.
+
+    dependencies = [
+        ('core', '0004_order_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(SCHEMA), run(DROP_SCHEMA)),
+    ]
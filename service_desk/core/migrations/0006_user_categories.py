@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_order_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='categories',
+            field=models.CharField(blank=True, default='', help_text='Категории заявок через запятую; пусто — мастер берёт любые.', max_length=255, verbose_name='Категории'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_categories'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('category', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('address', models.CharField(blank=True, default='', max_length=255)),
+                ('customer_name', models.CharField(max_length=100)),
+                ('customer_contact', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('new', 'Новая'), ('assigned', 'Назначена'), ('in_progress', 'В работе'), ('done', 'Завершена'), ('cancelled', 'Отменена')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('planned_date', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'архивная заявка',
+                'verbose_name_plural': 'архивные заявки',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('old_status', models.CharField(choices=[('new', 'Новая'), ('assigned', 'Назначена'), ('in_progress', 'В работе'), ('done', 'Завершена'), ('cancelled', 'Отменена')], max_length=20)),
+                ('new_status', models.CharField(choices=[('new', 'Новая'), ('assigned', 'Назначена'), ('in_progress', 'В работе'), ('done', 'Завершена'), ('cancelled', 'Отменена')], max_length=20)),
+                ('timestamp', models.DateTimeField()),
+                ('comment', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'verbose_name': 'история архивной заявки',
+                'verbose_name_plural': 'история архивных заявок',
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='orderhistory',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='orderhistory',
+            index=models.Index(fields=['order', '-timestamp'], name='history_order_ts_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedorderhistory',
+            name='changed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedorderhistory',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='core.archivedorder'),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='assigned_master',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='dispatcher',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorderhistory',
+            index=models.Index(fields=['order', '-timestamp'], name='archived_history_order_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['-created_at', '-id'], name='archived_created_id_idx'),
+        ),
+    ]
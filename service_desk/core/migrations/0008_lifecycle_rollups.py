@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LifecycleRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(max_length=100)),
+                ('stage', models.CharField(choices=[('assign', 'Создание → назначение'), ('start', 'Назначение → начало работ'), ('complete', 'Начало работ → завершение')], max_length=10)),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField()),
+                ('total_seconds', models.FloatField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='orderhistory',
+            index=models.Index(fields=['timestamp'], name='history_ts_idx'),
+        ),
+        migrations.AddField(
+            model_name='lifecyclerollup',
+            name='master',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='lifecyclerollup',
+            index=models.Index(fields=['day', 'stage'], name='rollup_day_stage_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:33
+
+from importlib import import_module
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# SQL индекса берём из замороженной 0005, а не из core.search.
+search_index = import_module("core.migrations.0005_order_search_index")
+
+
+def restore_search_index(apps, schema_editor):
+    # SQLite добавляет поле с default, пересоздавая core_order, и триггеры
+    # FTS5 (core.search) пропадают вместе со старой таблицей.
+    if schema_editor.connection.vendor == "sqlite":
+        search_index.run(search_index.DROP_SCHEMA)(apps, schema_editor)
+        search_index.run(search_index.SCHEMA)(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodedAddress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=50)),
+                ('query', models.CharField(max_length=255)),
+                ('lat', models.FloatField(blank=True, null=True)),
+                ('lon', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='geocoded_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='lon',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'new')), fields=['geohash'], name='order_new_geohash_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='geocodedaddress',
+            constraint=models.UniqueConstraint(fields=('provider', 'query'), name='geocoded_address_uniq'),
+        ),
+        migrations.RunPython(restore_search_index, migrations.RunPython.noop),
+    ]
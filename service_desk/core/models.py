@@ -1,14 +1,28 @@
+import uuid
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils import timezone
 
 
+def parse_categories(value: str) -> frozenset:
+    return frozenset(c.strip().lower() for c in (value or "").split(",") if c.strip())
+
+
 class User(AbstractUser):
     ROLE_CHOICES = [
         ("dispatcher", "Диспетчер"),
         ("master", "Мастер"),
     ]
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default="master")
+    # Для автоназначения (core.assignment): категории заявок мастера через запятую.
+    categories = models.CharField(
+        "Категории", max_length=255, blank=True, default="",
+        help_text="Категории заявок через запятую; пусто — мастер берёт любые.",
+    )
+
+    def category_set(self) -> frozenset:
+        return parse_categories(self.categories)
 
     def __str__(self):
         return f"{self.get_full_name() or self.username} ({self.get_role_display()})"
@@ -50,6 +64,52 @@ class Order(models.Model):
     planned_date = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    # Координаты адреса (core.geo): заполняются геокодером после сохранения;
+    # geocoded_at пуст — адрес ещё не обработан, lat пуст при geocoded_at —
+    # адрес не найден.
+    lat = models.FloatField(null=True, blank=True, editable=False)
+    lon = models.FloatField(null=True, blank=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, default="", editable=False)
+    geocoded_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        # Индексы под запросы core.queries (проверка: manage.py explain_order_queries).
+        # Первые три — составные ключи курсорной пагинации (core.pagination):
+        # сортировка (-created_at, -id) без фильтра, по статусу и по мастеру.
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="order_created_id_idx"),
+            models.Index(fields=["status", "-created_at", "-id"], name="order_status_created_idx"),
+            models.Index(fields=["assigned_master", "-created_at", "-id"], name="order_master_created_idx"),
+            # Частичный индекс очереди новых заявок: счётчик dispatcher_new_count
+            # и фильтр ?status=new читают только его, размер = длина очереди.
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="order_new_created_idx",
+                condition=models.Q(status="new"),
+            ),
+            # Активные заявки мастера: условие, сортировка и status в ключе,
+            # так что фильтр проверяется по индексу без чтения строк таблицы.
+            models.Index(
+                fields=["assigned_master", "-created_at", "-id", "status"],
+                name="order_master_active_idx",
+                condition=~models.Q(status="done"),
+            ),
+            # Новые заявки рядом (core.geo.nearby_new_orders): диапазоны
+            # геохеша соседних ячеек по очереди новых заявок.
+            models.Index(
+                fields=["geohash"],
+                name="order_new_geohash_idx",
+                condition=models.Q(status="new"),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Адрес при загрузке: core.geo сбрасывает координаты, если его изменили.
+        instance._loaded_address = instance.__dict__.get("address")
+        return instance
+
     def mark_done(self, by_user: User):
         self.status = OrderStatus.DONE
         self.completed_at = timezone.now()
@@ -68,8 +128,184 @@ class OrderHistory(models.Model):
     comment = models.TextField(blank=True, default="")
 
     class Meta:
-        ordering = ["-timestamp"]
+        # Без ordering по умолчанию: порядок задают запросы, которым он нужен
+        # (лента в core.queries, админка, выгрузка), а не каждый COUNT и JOIN.
+        indexes = [
+            models.Index(fields=["order", "-timestamp"], name="history_order_ts_idx"),
+            # Переходы за период: свёртки core.analytics и выгрузка истории.
+            models.Index(fields=["timestamp"], name="history_ts_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.order_id}: {self.old_status} -> {self.new_status}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    Закрытая заявка, перенесённая из Order архивацией (core.archive).
+    Те же поля и тот же id, что у исходной заявки; только для чтения.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    category = models.CharField(max_length=100)
+    description = models.TextField()
+    address = models.CharField(max_length=255, blank=True, default="")
+    customer_name = models.CharField(max_length=100)
+    customer_contact = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=OrderStatus.choices)
+    created_at = models.DateTimeField()
+    assigned_master = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    dispatcher = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    planned_date = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    lat = models.FloatField(null=True, blank=True)
+    lon = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, default="")
+    geocoded_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "архивная заявка"
+        verbose_name_plural = "архивные заявки"
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="archived_created_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"Заявка #{self.id} (архив) — {self.get_status_display()}"
+
+
+class ArchivedOrderHistory(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name="history")
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    old_status = models.CharField(max_length=20, choices=OrderStatus.choices)
+    new_status = models.CharField(max_length=20, choices=OrderStatus.choices)
+    timestamp = models.DateTimeField()
+    comment = models.TextField(blank=True, default="")
+
+    class Meta:
+        verbose_name = "история архивной заявки"
+        verbose_name_plural = "история архивных заявок"
+        indexes = [
+            models.Index(fields=["order", "-timestamp"], name="archived_history_order_ts_idx"),
+        ]
 
     def __str__(self):
         return f"#{self.order_id}: {self.old_status} -> {self.new_status}"
 
+
+class OrderCounter(models.Model):
+    """
+    Счётчики заявок по статусам в разрезах: всего, по категории, по дню создания.
+    Обновляются сервисами core.services в той же транзакции, что и статус
+    (см. core.counters); сверка — manage.py reconcile_order_counters.
+    """
+
+    DIMENSION_CHOICES = [
+        ("status", "Статус"),
+        ("category", "Категория"),
+        ("day", "День создания"),
+    ]
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=100, blank=True, default="")
+    status = models.CharField(max_length=20, choices=OrderStatus.choices)
+    value = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["dimension", "key", "status"], name="order_counter_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}:{self.key}:{self.status} = {self.value}"
+
+
+class LifecycleRollup(models.Model):
+    """
+    Свёртка длительностей этапов заявки (core.analytics): сколько заявок
+    прошли этап stage за день day в категории и у мастера, разложенных по
+    корзинам гистограммы длительности. Перцентили считаются по корзинам.
+    """
+
+    STAGE_CHOICES = [
+        ("assign", "Создание → назначение"),
+        ("start", "Назначение → начало работ"),
+        ("complete", "Начало работ → завершение"),
+    ]
+    day = models.DateField()
+    category = models.CharField(max_length=100)
+    master = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    stage = models.CharField(max_length=10, choices=STAGE_CHOICES)
+    bucket = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField()
+    total_seconds = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["day", "stage"], name="rollup_day_stage_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.stage} {self.category} #{self.bucket}: {self.count}"
+
+
+class OutboxMessage(models.Model):
+    """
+    Исходящее уведомление (core.notifications): пишется в транзакции смены
+    статуса и отправляется релеем после фиксации. key — ключ
+    идемпотентности, уходит получателю (Message-ID письма).
+    """
+
+    PENDING, SENT, FAILED = "pending", "sent", "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Ожидает отправки"),
+        (SENT, "Отправлено"),
+        (FAILED, "Не доставлено"),
+    ]
+    key = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    channel = models.CharField(max_length=10)
+    address = models.CharField(max_length=255)
+    # Без внешнего ключа: заявка может уйти в архив (core.archive) раньше, чем
+    # истечёт срок хранения сообщения.
+    order_id = models.BigIntegerField(null=True, blank=True)
+    event = models.CharField(max_length=20, blank=True, default="")
+    subject = models.CharField(max_length=255, blank=True, default="")
+    text = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(default=timezone.now)
+    # Когда релей может взять сообщение: конец окна склейки, время повтора
+    # после ошибки или конец аренды у воркера, который его сейчас отправляет.
+    available_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "available_at"], name="outbox_status_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.channel}:{self.address} #{self.order_id} [{self.status}]"
+
+
+class GeocodedAddress(models.Model):
+    """
+    Постоянный кэш геокодера (core.geo): нормализованный адрес -> координаты.
+    Пустые координаты — адрес не найден, повторно провайдер не спрашивается.
+    """
+
+    provider = models.CharField(max_length=50)
+    query = models.CharField(max_length=255)
+    lat = models.FloatField(null=True, blank=True)
+    lon = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["provider", "query"], name="geocoded_address_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.query}: {self.lat}, {self.lon}"
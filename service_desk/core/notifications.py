@@ -0,0 +1,329 @@
+"""
+Уведомления клиентов и мастеров через транзакционный outbox.
+
+Сервисы вызывают notify() внутри своей транзакции: сообщение — строка
+OutboxMessage, которая фиксируется вместе со сменой статуса (или
+откатывается вместе с ней). Отправляет их релей relay() — задача Celery
+relay_outbox — вне обработки HTTP-запроса.
+
+Сообщение становится доступно релею в конце окна NOTIFICATION_WINDOW
+секунд: события одного получателя, попавшие в одну пачку, склеиваются в
+одно SMS/письмо (повторы отбрасываются), а письма пачки уходят через одно
+SMTP-соединение. После фиксации планируется один запуск релея на окно
+(только с брокером, см. schedule_relay); CELERY_BEAT_SCHEDULE подбирает
+повторы и всё, что не успели отправить.
+
+Релей берёт пачку OUTBOX_BATCH_SIZE сообщений SELECT ... FOR UPDATE SKIP
+LOCKED и сразу сдвигает им available_at на OUTBOX_LEASE («аренда»): другие
+воркеры пропускают эти строки, поэтому пропускная способность растёт
+добавлением воркеров. Отправка идёт вне транзакции; удачные сообщения
+помечаются SENT, после ошибки — повтор с экспоненциальной задержкой,
+после OUTBOX_MAX_ATTEMPTS попыток — FAILED. Если воркер упал посреди
+отправки, аренда истекает и сообщение берёт другой; повторную доставку
+письма получатель отсекает по Message-ID из ключа идемпотентности.
+
+Глубина очереди и задержка доставки считаются по таблице (outbox_stats)
+и отдаются в /metrics.
+"""
+import hashlib
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "notify"
+# Границы гистограммы задержки доставки (от записи до отправки), секунды.
+LATENCY_BUCKETS = (5, 15, 30, 60, 120, 300, 900, 3600)
+
+
+def window_seconds() -> int:
+    return getattr(settings, "NOTIFICATION_WINDOW", 30)
+
+
+# ---------- SMS-бэкенды ----------
+
+
+class LoggingSmsBackend:
+    """Заглушка для диплома: SMS только пишутся в лог."""
+
+    def send_messages(self, messages: list) -> int:
+        for phone, text in messages:
+            logger.info("SMS to %s: %s", phone, text)
+        return len(messages)
+
+
+class LocmemSmsBackend:
+    """Бэкенд для тестов: сообщения складываются в LocmemSmsBackend.outbox."""
+
+    outbox: list = []
+
+    def send_messages(self, messages: list) -> int:
+        LocmemSmsBackend.outbox.extend(messages)
+        return len(messages)
+
+
+def get_sms_backend():
+    return import_string(getattr(settings, "SMS_BACKEND", "core.notifications.LoggingSmsBackend"))()
+
+
+# ---------- запись в outbox ----------
+
+
+def recipient(contact: str) -> tuple:
+    """Канал по виду контакта: email, если есть '@', иначе SMS."""
+    contact = contact.strip()
+    return ("email" if "@" in contact else "sms"), contact
+
+
+def notify(order_id: int | None, contact: str, text: str, event: str = "", subject: str = ""):
+    """Записать уведомление в outbox в текущей транзакции."""
+    notify_many([(order_id, contact, text, event)], subject=subject)
+
+
+def notify_many(items, subject: str = ""):
+    """То же для пачки [(id заявки, контакт, текст, событие)] — один INSERT."""
+    window_id = current_window()
+    due = window_end(window_id)
+    messages = []
+    for order_id, contact, text, event in items:
+        if contact:
+            channel, address = recipient(contact)
+            messages.append(OutboxMessage(channel=channel, address=address, order_id=order_id, event=event,
+                                          subject=subject, text=text, available_at=due))
+    if messages:
+        OutboxMessage.objects.bulk_create(messages)
+        transaction.on_commit(lambda: schedule_relay(window_id))
+
+
+def current_window() -> int:
+    return int(time.time() // window_seconds())
+
+
+def window_end(window_id: int):
+    return datetime.fromtimestamp((window_id + 1) * window_seconds(), tz=dt_timezone.utc)
+
+
+def schedule_relay(window_id: int):
+    """
+    Один запуск релея на окно — к его концу. Кэш здесь только отсекает
+    лишние запуски: сообщения лежат в outbox, поэтому с кэшем в памяти
+    процесса (locmem) воркер Celery их всё равно видит, а повторный
+    запуск релея из другого процесса ничего не отправляет дважды.
+
+    Без брокера (CELERY_TASK_ALWAYS_EAGER) запуск не планируется: eager-задача
+    отправила бы SMTP/SMS прямо в обработке запроса. Outbox тогда разбирает
+    manage.py relay_outbox --loop. Недоступный брокер тоже не роняет
+    запрос: сообщения уже зафиксированы, их подберёт Celery beat.
+    """
+    if settings.CELERY_TASK_ALWAYS_EAGER:
+        return
+    key = f"{KEY_PREFIX}:{window_id}:scheduled"
+    if cache.add(key, 1, window_seconds() * 10):
+        from .tasks import relay_outbox
+
+        countdown = max(0, (window_id + 1) * window_seconds() - time.time())
+        try:
+            relay_outbox.apply_async(kwargs={"until": window_end(window_id).isoformat()}, countdown=countdown)
+        except Exception:
+            logger.exception("Не удалось запланировать релей outbox для окна %s", window_id)
+            cache.delete(key)
+
+
+# ---------- релей ----------
+
+
+def backoff(attempts: int) -> timedelta:
+    """Задержка перед попыткой attempts + 1: OUTBOX_RETRY_BASE * 2^(attempts-1), не больше часа."""
+    return timedelta(seconds=min(settings.OUTBOX_RETRY_BASE * 2 ** (attempts - 1), 3600))
+
+
+def claim(batch_size: int | None = None, until=None) -> list:
+    """
+    Взять пачку готовых к отправке сообщений в аренду. until — считать
+    готовыми и сообщения с available_at до этого момента (запуск релея
+    к концу окна в режиме CELERY_TASK_ALWAYS_EAGER идёт сразу).
+    """
+    now = timezone.now()
+    due = max(now, until) if until else now
+    with transaction.atomic():
+        batch = list(OutboxMessage.objects
+                     .select_for_update(skip_locked=True)
+                     .filter(status=OutboxMessage.PENDING, available_at__lte=due)
+                     .order_by("available_at", "id")[:batch_size or settings.OUTBOX_BATCH_SIZE])
+        if batch:
+            OutboxMessage.objects.filter(id__in=[m.id for m in batch]).update(
+                available_at=now + timedelta(seconds=settings.OUTBOX_LEASE), attempts=F("attempts") + 1)
+    for m in batch:
+        m.attempts += 1
+    return batch
+
+
+def merge(messages: list) -> dict:
+    """{(канал, адрес): [сообщение, ...]} в порядке поступления."""
+    merged = {}
+    for m in messages:
+        merged.setdefault((m.channel, m.address), []).append(m)
+    return merged
+
+
+def _body(group: list) -> str:
+    texts = []
+    for m in group:
+        if (m.order_id, m.text) not in texts:
+            texts.append((m.order_id, m.text))
+    return "\n".join(text for _, text in texts)
+
+
+def _subject(group: list) -> str:
+    subjects = {m.subject for m in group}
+    if len(subjects) == 1 and "" not in subjects:
+        return subjects.pop()
+    order_ids = sorted({m.order_id for m in group if m.order_id})
+    if len(order_ids) == 1:
+        return f"Заявка #{order_ids[0]}: обновление статуса"
+    return "Обновления по заявкам " + ", ".join(f"#{i}" for i in order_ids)
+
+
+def idempotency_key(group: list) -> str:
+    """Ключ склеенного сообщения: ключ единственного или хеш ключей всех."""
+    if len(group) == 1:
+        return str(group[0].key)
+    return hashlib.sha1(",".join(sorted(str(m.key) for m in group)).encode()).hexdigest()
+
+
+def deliver(messages: list) -> tuple:
+    """Отправить сообщения; вернуть (id отправленных, {id: ошибка})."""
+    sent, failed = [], {}
+
+    def fail(group, error):
+        logger.warning("notification to %s failed: %s", group[0].address, error)
+        failed.update({m.id: str(error) for m in group})
+
+    sms, emails = [], []
+    for (channel, address), group in merge(messages).items():
+        (sms if channel == "sms" else emails).append(group)
+
+    if sms:
+        backend = get_sms_backend()
+        for group in sms:
+            try:
+                backend.send_messages([(group[0].address, _body(group))])
+                sent += [m.id for m in group]
+            except Exception as e:
+                fail(group, e)
+    if emails:
+        try:
+            with get_connection() as connection:
+                for group in emails:
+                    message = EmailMessage(_subject(group), _body(group), None, [group[0].address],
+                                           headers={"Message-ID": f"<{idempotency_key(group)}@service-desk>"})
+                    try:
+                        connection.send_messages([message])
+                        sent += [m.id for m in group]
+                    except Exception as e:
+                        fail(group, e)
+        except Exception as e:  # соединение не открылось
+            for group in emails:
+                if group[0].id not in sent:
+                    fail(group, e)
+    return sent, failed
+
+
+def mark(messages: list, sent: list, failed: dict):
+    now = timezone.now()
+    if sent:
+        OutboxMessage.objects.filter(id__in=sent).update(status=OutboxMessage.SENT, sent_at=now, last_error="")
+    # Один UPDATE на (число попыток, ошибку): задержка зависит от попыток.
+    retries = defaultdict(list)
+    for m in messages:
+        if m.id in failed:
+            retries[m.attempts, failed[m.id]].append(m.id)
+    for (attempts, error), ids in retries.items():
+        if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            fields = {"status": OutboxMessage.FAILED}
+        else:
+            fields = {"available_at": now + backoff(attempts)}
+        OutboxMessage.objects.filter(id__in=ids).update(last_error=error[:1000], **fields)
+
+
+def relay(batch_size: int | None = None, max_batches: int | None = None, until=None) -> int:
+    """Отправлять пачки, пока есть готовые сообщения; вернуть число отправленных."""
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        batch = claim(batch_size, until)
+        if not batch:
+            break
+        sent, failed = deliver(batch)
+        mark(batch, sent, failed)
+        total += len(sent)
+        batches += 1
+    return total
+
+
+def purge(days: int | None = None) -> int:
+    """Удалить отправленные сообщения старше OUTBOX_RETENTION_DAYS."""
+    days = settings.OUTBOX_RETENTION_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OutboxMessage.objects.filter(status=OutboxMessage.SENT, sent_at__lt=cutoff).delete()
+    return deleted
+
+
+# ---------- метрики ----------
+
+
+def outbox_stats(window: int = 300) -> dict:
+    """
+    Число сообщений по статусам, возраст старейшего неотправленного и
+    гистограмма задержки доставки сообщений, отправленных за последние
+    window секунд.
+    """
+    now = timezone.now()
+    by_status = {row["status"]: row for row in
+                 OutboxMessage.objects.values("status").annotate(n=Count("id"), oldest=Min("created_at")).order_by()}
+    pending = by_status.get(OutboxMessage.PENDING)
+    recent = OutboxMessage.objects.filter(status=OutboxMessage.SENT, sent_at__gte=now - timedelta(seconds=window))
+    latency = recent.aggregate(
+        count=Count("id"),
+        **{f"le_{bound}": Count("id", filter=Q(created_at__gte=F("sent_at") - timedelta(seconds=bound)))
+           for bound in LATENCY_BUCKETS},
+    )
+    return {
+        "messages": {status: by_status[status]["n"] if status in by_status else 0
+                     for status, _ in OutboxMessage.STATUS_CHOICES},
+        "oldest_pending": (now - pending["oldest"]).total_seconds() if pending else 0.0,
+        "latency": [(bound, latency[f"le_{bound}"]) for bound in LATENCY_BUCKETS],
+        "latency_count": latency["count"],
+    }
+
+
+def prometheus_lines() -> list:
+    stats = outbox_stats()
+    lines = [
+        "# HELP service_desk_outbox_messages Сообщения outbox по статусу.",
+        "# TYPE service_desk_outbox_messages gauge",
+    ]
+    for status, n in stats["messages"].items():
+        lines.append(f'service_desk_outbox_messages{{status="{status}"}} {n}')
+    lines += [
+        "# HELP service_desk_outbox_oldest_pending_seconds Возраст старейшего неотправленного сообщения.",
+        "# TYPE service_desk_outbox_oldest_pending_seconds gauge",
+        f"service_desk_outbox_oldest_pending_seconds {stats['oldest_pending']:.1f}",
+        "# HELP service_desk_outbox_delivery_latency_seconds Задержка доставки за последние 5 минут.",
+        "# TYPE service_desk_outbox_delivery_latency_seconds gauge",
+    ]
+    for bound, n in stats["latency"]:
+        lines.append(f'service_desk_outbox_delivery_latency_seconds_bucket{{le="{bound}"}} {n}')
+    lines.append(f'service_desk_outbox_delivery_latency_seconds_bucket{{le="+Inf"}} {stats["latency_count"]}')
+    return lines
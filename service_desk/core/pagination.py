@@ -0,0 +1,171 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+
+from django.db import connections
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class KeysetPage:
+    object_list: list
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+    estimated_total: int | None = None
+    per_page: int = 20
+    ordering: tuple = field(default=("-created_at", "-id"))
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Курсорная (keyset) пагинация вместо Paginator.
+
+    Страница выбирается условием по ключу сортировки, например
+    (created_at, id) < (курсор), поэтому не нужны ни COUNT(*), ни OFFSET:
+    стоимость любой страницы одинакова при наличии составного индекса
+    по полям сортировки (см. Order.Meta.indexes).
+
+    Курсор — непрозрачная строка (base64 от JSON), которую шаблон
+    передаёт обратно в параметре ?cursor=.
+    """
+
+    def __init__(self, queryset, per_page: int = 20, ordering=("-created_at", "-id"), estimate_total: bool = False):
+        descending = {f.startswith("-") for f in ordering}
+        if len(descending) != 1:
+            raise ValueError("Все поля сортировки должны иметь одно направление.")
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.descending = descending.pop()
+        self.fields = [f.lstrip("-") for f in self.ordering]
+        self.estimate_total = estimate_total
+
+    # ----- курсоры -----
+
+    @staticmethod
+    def _serialize(value):
+        return value.isoformat() if hasattr(value, "isoformat") else value
+
+    def encode_cursor(self, obj, direction: str) -> str:
+        return self._encode_values([getattr(obj, f) for f in self.fields], direction)
+
+    def _encode_values(self, values, direction: str) -> str:
+        payload = {"d": direction, "v": [self._serialize(v) for v in values]}
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, cursor: str):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            direction, values = payload["d"], payload["v"]
+        except (binascii.Error, ValueError, KeyError, TypeError) as e:
+            raise InvalidCursor(str(e))
+        if direction not in ("n", "p") or len(values) != len(self.fields):
+            raise InvalidCursor("Некорректный курсор.")
+
+        model = self.queryset.model
+        parsed = []
+        for name, value in zip(self.fields, values):
+            model_field = model._meta.pk if name in ("pk", "id") else model._meta.get_field(name)
+            try:
+                parsed.append(model_field.to_python(value))
+            except Exception as e:
+                raise InvalidCursor(str(e))
+        return direction, parsed
+
+    # ----- выборка -----
+
+    def _seek(self, values, forward: bool) -> Q:
+        """(f1, f2, ...) < (v1, v2, ...) в виде OR-цепочки, понятной любому бэкенду."""
+        lookup = "lt" if self.descending == forward else "gt"
+        condition = Q()
+        for i, name in enumerate(self.fields):
+            term = Q(**{f"{name}__{lookup}": values[i]})
+            for prev_name, prev_value in zip(self.fields[:i], values[:i]):
+                term &= Q(**{prev_name: prev_value})
+            condition |= term
+        # Избыточное условие f1 <= v1 даёт планировщику диапазон по индексу:
+        # без него OR-цепочка на SQLite превращается в полный просмотр.
+        return Q(**{f"{self.fields[0]}__{lookup}e": values[0]}) & condition
+
+    def _reversed_ordering(self):
+        return tuple(f[1:] if f.startswith("-") else f"-{f}" for f in self.ordering)
+
+    def get_page(self, cursor: str | None = None) -> KeysetPage:
+        """Как Paginator.get_page: некорректный курсор даёт первую страницу."""
+        direction, values = "n", None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                direction, values = "n", None
+
+        qs = self.queryset
+        if values is None:
+            rows = list(qs.order_by(*self.ordering)[: self.per_page + 1])
+            has_more, has_before = len(rows) > self.per_page, False
+            rows = rows[: self.per_page]
+        elif direction == "n":
+            rows = list(qs.filter(self._seek(values, True)).order_by(*self.ordering)[: self.per_page + 1])
+            has_more, has_before = len(rows) > self.per_page, True
+            rows = rows[: self.per_page]
+        else:
+            rows = list(qs.filter(self._seek(values, False)).order_by(*self._reversed_ordering())[: self.per_page + 1])
+            has_before, has_more = len(rows) > self.per_page, True
+            rows = rows[: self.per_page][::-1]
+
+        page = KeysetPage(object_list=rows, per_page=self.per_page, ordering=self.ordering)
+        if rows:
+            if has_more:
+                page.next_cursor = self.encode_cursor(rows[-1], "n")
+            if has_before:
+                page.previous_cursor = self.encode_cursor(rows[0], "p")
+        elif values is not None and direction == "n":
+            # Пустая страница после удаления записей — даём вернуться назад.
+            page.previous_cursor = self._encode_values(values, "p")
+        if self.estimate_total:
+            page.estimated_total = estimate_count(qs)
+        return page
+
+
+def estimate_count(queryset) -> int | None:
+    """
+    Оценка числа строк без полного COUNT(*).
+
+    PostgreSQL: оценка планировщика (EXPLAIN, "Plan Rows").
+    Остальные бэкенды дешёвой оценки не дают — возвращается None,
+    и шаблон просто не показывает общее число.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    return None
@@ -0,0 +1,137 @@
+"""
+Запросы «горячих» представлений.
+
+Собраны в одном месте, чтобы представления и команда explain_order_queries
+использовали одни и те же QuerySet: если кто-то добавит фильтр в запрос
+представления, EXPLAIN сразу покажет, попадает ли он в индекс.
+"""
+from django.db.models import Count, Prefetch
+
+from .models import ArchivedOrder, ArchivedOrderHistory, Order, OrderCounter, OrderHistory, OrderStatus
+
+# Поля, нужные спискам заявок: остальное (описание целиком, плановая дата,
+# диспетчер) в строках таблиц не выводится. Описание остаётся — его
+# показывают обрезанным.
+ORDER_LIST_FIELDS = (
+    "id", "created_at", "status", "category", "description", "address",
+    "customer_name", "customer_contact", "assigned_master",
+)
+# Поля пользователя для User.__str__ и get_full_name в шаблонах.
+USER_DISPLAY_FIELDS = ("id", "username", "first_name", "last_name", "role")
+
+
+def _related_fields(relation: str, fields=USER_DISPLAY_FIELDS) -> list:
+    return [f"{relation}__{f}" for f in fields]
+
+
+def order_list_qs():
+    """Заявки для общих списков: мастер одним JOIN, только колонки таблицы."""
+    return (Order.objects
+            .select_related("assigned_master")
+            .only(*ORDER_LIST_FIELDS, *_related_fields("assigned_master")))
+
+
+def history_prefetch(model=OrderHistory) -> Prefetch:
+    """
+    История заявки вместе с автором изменения: один запрос на всю ленту,
+    сколько бы записей в ней ни было, новые сверху (индекс history_order_ts_idx).
+    Результат — список order.timeline.
+    """
+    return Prefetch(
+        "history",
+        queryset=(model.objects
+                  .select_related("changed_by")
+                  .only("id", "order_id", "old_status", "new_status", "timestamp", "comment",
+                        *_related_fields("changed_by"))
+                  .order_by("-timestamp", "-id")),
+        to_attr="timeline",
+    )
+
+
+def order_detail_qs():
+    """Карточка заявки: мастер и диспетчер одним JOIN, история — одним prefetch."""
+    return (Order.objects
+            .select_related("assigned_master", "dispatcher")
+            .prefetch_related(history_prefetch()))
+
+
+def archived_order_detail_qs():
+    """Карточка заявки из архива (core.archive): те же JOIN и лента истории."""
+    return (ArchivedOrder.objects
+            .select_related("assigned_master", "dispatcher")
+            .prefetch_related(history_prefetch(ArchivedOrderHistory)))
+
+
+def dispatcher_orders_qs(status: str | None = None):
+    qs = order_list_qs()
+    if status:
+        qs = qs.filter(status=status)
+    return qs
+
+
+def new_orders_qs():
+    return Order.objects.filter(status=OrderStatus.NEW)
+
+
+def master_active_orders_qs(master):
+    return (Order.objects
+            .only(*ORDER_LIST_FIELDS)
+            .filter(assigned_master=master)
+            .exclude(status=OrderStatus.DONE))
+
+
+# Поля заявки в JSON API мастера (core.sync.order_data).
+ORDER_API_FIELDS = (
+    "id", "status", "category", "description", "address", "customer_name", "customer_contact",
+    "created_at", "planned_date", "assigned_master", "lat", "lon",
+)
+
+
+def master_open_orders_qs(master):
+    """Открытые (ASSIGNED/IN_PROGRESS) заявки мастера для API, новые первыми."""
+    return (Order.objects
+            .only(*ORDER_API_FIELDS)
+            .filter(assigned_master=master, status__in=(OrderStatus.ASSIGNED, OrderStatus.IN_PROGRESS))
+            .order_by("-created_at", "-id"))
+
+
+def status_counts_qs():
+    return (Order.objects.values("status")
+            .annotate(count=Count("id"))
+            .order_by("status"))
+
+
+# Имя -> (фабрика QuerySet, допустимые индексы). Фабрика получает id мастера
+# для запросов, которым он нужен. Сортировка — как в представлениях.
+# Для очереди NEW планировщик SQLite вправе выбрать и общий индекс по статусу:
+# оба дают поиск по диапазону, частичный выигрывает в размере на PostgreSQL.
+HOT_QUERIES = {
+    "dispatcher_orders": (
+        lambda master_id: dispatcher_orders_qs().order_by("-created_at", "-id")[:21],
+        ("order_created_id_idx",),
+    ),
+    "dispatcher_orders?status=assigned": (
+        lambda master_id: dispatcher_orders_qs(OrderStatus.ASSIGNED).order_by("-created_at", "-id")[:21],
+        ("order_status_created_idx",),
+    ),
+    "dispatcher_orders?status=new": (
+        lambda master_id: dispatcher_orders_qs(OrderStatus.NEW).order_by("-created_at", "-id")[:21],
+        ("order_new_created_idx", "order_status_created_idx"),
+    ),
+    "dispatcher_new_count": (
+        lambda master_id: new_orders_qs().values("id"),
+        ("order_new_created_idx", "order_status_created_idx"),
+    ),
+    "master_orders": (
+        lambda master_id: master_active_orders_qs(master_id).order_by("-created_at", "-id")[:51],
+        ("order_master_active_idx",),
+    ),
+    "order_stats": (
+        lambda master_id: OrderCounter.objects.filter(dimension="status", value__gt=0).order_by("status"),
+        ("order_counter_unique", "sqlite_autoindex_core_ordercounter_1"),
+    ),
+    "reconcile_order_counters": (
+        lambda master_id: status_counts_qs(),
+        ("order_status_created_idx",),
+    ),
+}
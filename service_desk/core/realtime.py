@@ -0,0 +1,95 @@
+"""
+Счётчик новых заявок для бейджа диспетчера.
+
+Значение хранится в кэше (settings.CACHES) и меняется инкрементально
+сервисными функциями при входе заявки в статус NEW и выходе из него,
+поэтому ни опрос, ни поток событий не выполняют COUNT(*).
+
+Полный пересчёт делается только при отсутствии ключа: при первом
+обращении и по истечении NEW_COUNT_TTL. Срок короткий намеренно: он
+ограничивает расхождение, если статус изменили в обход core.services
+(например, в админке), если incr пришёлся между COUNT и записью ключа
+и если кэш у каждого процесса свой (locmem по умолчанию) — приращения
+из соседних процессов видны после пересчёта. С общим кэшем (CACHE_URL)
+значение точное между пересчётами.
+
+Поток Server-Sent Events и ожидающий long-poll — только под ASGI: под
+WSGI Django 4.2 собирает асинхронный поток целиком до отправки, а
+ожидание держало бы поток сервера. Там адрес отвечает сразу, и
+dispatcher.js опрашивает его раз в WSGI_POLL_INTERVAL секунд.
+"""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import OrderStatus
+from .queries import new_orders_qs
+
+NEW_COUNT_KEY = "orders:new_count"
+NEW_COUNT_TTL = 5
+
+POLL_INTERVAL = 1.0       # как часто поток сверяет значение в кэше
+HEARTBEAT_INTERVAL = 15   # комментарий-пинг, чтобы прокси не рвали соединение
+STREAM_MAX_SECONDS = 300  # после этого EventSource сам переподключится
+LONG_POLL_TIMEOUT = 25    # сколько long-poll ждёт изменения (только под ASGI)
+WSGI_POLL_INTERVAL = 15   # под WSGI ответ сразу, следующий опрос — через столько секунд
+
+
+def get_new_count() -> int:
+    count = cache.get(NEW_COUNT_KEY)
+    if count is None:
+        count = new_orders_qs().count()
+        cache.add(NEW_COUNT_KEY, count, NEW_COUNT_TTL)
+    return count
+
+
+async def aget_new_count() -> int:
+    count = await cache.aget(NEW_COUNT_KEY)
+    if count is None:
+        count = await sync_to_async(get_new_count)()
+    return count
+
+
+def _apply_delta(delta: int):
+    try:
+        cache.incr(NEW_COUNT_KEY, delta)
+    except ValueError:
+        # Ключа нет — следующее чтение пересчитает значение целиком.
+        pass
+
+
+def track_status_change(old_status: str | None, new_status: str):
+    """Учесть переход заявки; применяется только после фиксации транзакции."""
+    track_status_changes([(old_status, new_status)])
+
+
+def track_status_changes(pairs):
+    delta = sum(int(new == OrderStatus.NEW) - int(old == OrderStatus.NEW) for old, new in pairs)
+    if delta:
+        transaction.on_commit(lambda: _apply_delta(delta))
+
+
+async def wait_for_change(last: int | None, timeout: float) -> int:
+    """Дождаться значения, отличного от last (или таймаута), и вернуть его."""
+    deadline = time.monotonic() + timeout
+    count = await aget_new_count()
+    while count == last and time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        count = await aget_new_count()
+    return count
+
+
+async def new_count_events(last: int | None = None):
+    """Поток Server-Sent Events: событие отправляется только при изменении счётчика."""
+    started = time.monotonic()
+    yield f"retry: {int(POLL_INTERVAL * 3000)}\n\n"
+    while time.monotonic() - started < STREAM_MAX_SECONDS:
+        count = await wait_for_change(last, HEARTBEAT_INTERVAL)
+        if count != last:
+            last = count
+            yield f"event: new_count\ndata: {count}\n\n"
+        else:
+            yield ": ping\n\n"
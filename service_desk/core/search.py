@@ -0,0 +1,174 @@
+"""
+Полнотекстовый поиск по заявкам.
+
+Индекс зависит от СУБД:
+- SQLite — таблица FTS5 core_order_fts (contentless), которую заполняют
+  триггеры на core_order. Своего стеммера у FTS5 нет, поэтому окончания
+  русских слов отсекаются в запросе (_stem), а слова ищутся по префиксу;
+- PostgreSQL — GIN-индекс по to_tsvector('russian', ...) со стеммингом
+  словаря russian.
+
+Индекс поддерживается самой базой, поэтому он не отстаёт при bulk_create и
+QuerySet.update. Триггер обновления срабатывает только на текстовые поля:
+смена статуса индекс не трогает.
+Для других СУБД остаётся icontains по тем же полям.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Поля заявки, по которым ищет и поиск, и админка.
+SEARCH_FIELDS = ("category", "customer_name", "customer_contact", "address", "description")
+FTS_TABLE = "core_order_fts"
+PG_CONFIG = "russian"
+MAX_TERMS = 8
+# Короче — предлоги и сокращения («на», «не», «ул», «д»): по префиксу в индексе
+# они совпадают с половиной словаря, поэтому ищутся icontains по SEARCH_FIELDS
+# (short_terms). Числа идут в индекс любой длины.
+MIN_WORD = 3
+
+# ---------- схема ----------
+
+
+def _sqlite_document(prefix: str = "") -> str:
+    # «ё» unicode61 не сводит к «е» — нормализуем до токенизатора.
+    joined = " || ' ' || ".join(f"{prefix}{f}" for f in SEARCH_FIELDS)
+    return f"replace(replace({joined}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+PG_DOCUMENT = "to_tsvector('{config}', {fields})".format(
+    config=PG_CONFIG,
+    fields=" || ' ' || ".join(f"coalesce({f}, '')" for f in SEARCH_FIELDS),
+)
+
+SCHEMA = {
+    "sqlite": [
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        f"body, content='', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON core_order BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, {_sqlite_document('new.')}); END",
+        f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON core_order BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, {_sqlite_document('old.')}); END",
+        f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {', '.join(SEARCH_FIELDS)} ON core_order BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, {_sqlite_document('old.')}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, {_sqlite_document('new.')}); END",
+    ],
+    "postgresql": [
+        f"CREATE INDEX order_search_idx ON core_order USING GIN ({PG_DOCUMENT})",
+    ],
+}
+
+DROP_SCHEMA = {
+    "sqlite": [
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+        f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    ],
+    "postgresql": ["DROP INDEX IF EXISTS order_search_idx"],
+}
+
+
+def create_index(connection) -> None:
+    """Создать индекс и заполнить его существующими заявками."""
+    with connection.cursor() as cursor:
+        for sql in SCHEMA.get(connection.vendor, []):
+            cursor.execute(sql)
+    rebuild_index(connection)
+
+
+def drop_index(connection) -> None:
+    with connection.cursor() as cursor:
+        for sql in DROP_SCHEMA.get(connection.vendor, []):
+            cursor.execute(sql)
+
+
+def rebuild_index(connection) -> None:
+    """Перестроить FTS5 с нуля (для PostgreSQL индекс выражения строит сама СУБД)."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}(rowid, body) SELECT id, {_sqlite_document()} FROM core_order")
+
+
+# ---------- запрос ----------
+
+# Окончания, которые отсекаются перед поиском по префиксу: «кухне» -> «кухн*»
+# найдёт и «кухня», и «кухню». Сначала длинные.
+_ENDINGS = sorted([
+    "ами", "ями", "ого", "его", "ому", "ему", "ыми", "ими", "ая", "яя", "ое", "ее", "ые", "ие",
+    "ой", "ей", "ий", "ый", "ам", "ям", "ах", "ях", "ом", "ем", "ов", "ев", "ет", "ит", "ут", "ют",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь",
+], key=len, reverse=True)
+_MIN_STEM = 3
+
+
+def terms(q: str) -> list:
+    """Значимые слова запроса в нижнем регистре, «ё» -> «е», не больше MAX_TERMS."""
+    words = re.findall(r"\w+", (q or "").lower().replace("ё", "е"))
+    return [w for w in words if len(w) >= MIN_WORD or w.isdigit()][:MAX_TERMS]
+
+
+def short_terms(q: str) -> list:
+    """Слова короче MIN_WORD (кроме чисел) как есть: для icontains, не для индекса."""
+    words = re.findall(r"\w+", q or "")
+    return [w for w in words if len(w) < MIN_WORD and not w.isdigit()][:MAX_TERMS]
+
+
+def _stem(word: str) -> str:
+    if word.isdigit():
+        return word
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def fts_match(words: list) -> str:
+    """Выражение MATCH для FTS5: все слова, каждое по префиксу основы."""
+    return " ".join(f'"{_stem(w)}"*' for w in words)
+
+
+def pg_tsquery(words: list) -> str:
+    """Аргумент to_tsquery: словарь russian сам приводит слова к основе."""
+    return " & ".join(f"{w}:*" for w in words)
+
+
+def icontains_q(q: str) -> Q:
+    """Прежний путь (как search_fields админки): каждое слово в любом из полей."""
+    condition = Q()
+    for word in (q or "").split():
+        any_field = Q()
+        for field in SEARCH_FIELDS:
+            any_field |= Q(**{f"{field}__icontains": word})
+        condition &= any_field
+    return condition
+
+
+def search_orders(queryset, q: str):
+    """
+    Отфильтровать QuerySet заявок по строке поиска; сортировку не меняет.
+    Короткие слова («ул», фамилия «Ли») сужают выборку через icontains:
+    непустой запрос никогда не возвращает всю таблицу.
+    """
+    words, short = terms(q), short_terms(q)
+    if not words and not short:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor not in ("sqlite", "postgresql"):
+        return queryset.filter(icontains_q(q))
+    if short:
+        queryset = queryset.filter(icontains_q(" ".join(short)))
+    if not words:
+        return queryset
+    if vendor == "sqlite":
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [fts_match(words)],
+        ))
+    return queryset.filter(id__in=RawSQL(
+        f"SELECT id FROM core_order WHERE {PG_DOCUMENT} @@ to_tsquery('{PG_CONFIG}', %s)",
+        [pg_tsquery(words)],
+    ))
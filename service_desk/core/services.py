@@ -1,24 +1,16 @@
 import logging
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
 from django.utils import timezone
-from django.core.mail import send_mail
 from .models import Order, OrderHistory, OrderStatus, User
+from . import counters, notifications, realtime, sync, workload
+from .transitions import TRANSITIONS, TransitionConflict
 
 logger = logging.getLogger(__name__)
 
 
-def send_email(to: str, subject: str, text: str):
-    # Для dev можно оставить консольный backend (или настроить SMTP в settings.py)
-    try:
-        send_mail(subject, text, None, [to], fail_silently=True)
-    except Exception as e:
-        logger.warning("send_email failed: %s", e)
-
-
-def send_sms(phone: str, text: str):
-    # Заглушка для диплома
-    logger.info("SMS to %s: %s", phone, text)
-
-
 def log_status_change(order: Order, by_user: User | None, old_status: str, new_status: str, comment: str = ""):
     OrderHistory.objects.create(
         order=order,
@@ -27,55 +19,242 @@ def log_status_change(order: Order, by_user: User | None, old_status: str, new_s
         new_status=new_status,
         comment=comment,
     )
+    counters.record_transition(order, old_status, new_status)
+    realtime.track_status_change(old_status, new_status)
+    workload.track_load_changes([(order, old_status, new_status)])
+
+
+@transaction.atomic
+def register_new_order(order: Order):
+    """Сохранить заявку, поступившую через публичную форму."""
+    order.status = OrderStatus.NEW
+    order.save()
+    counters.record_transition(order, None, order.status)
+    realtime.track_status_change(None, order.status)
+
+
+def check_transition(order: Order, name: str, user: User):
+    """Проверить права и исходный статус перехода по загруженной заявке; вернуть Transition."""
+    t = TRANSITIONS[name]
+    if user.role not in t.roles:
+        raise PermissionError(t.role_error)
+    if t.own_orders_only and user.role == "master" and order.assigned_master_id != user.id:
+        raise PermissionError("Это не ваша заявка.")
+    if order.status not in t.sources:
+        raise ValueError(t.error)
+    return t
+
+
+def apply_transition(order: Order, name: str, user: User, comment: str = "", **fields) -> str:
+    """
+    Выполнить переход из TRANSITIONS одним условным UPDATE.
 
+    Обычная схема «прочитать статус, проверить, save()» пропускает два
+    параллельных запроса: оба видят старый статус. Здесь проверка входит
+    в сам UPDATE ... WHERE id=? AND status=?, где status — наблюдаемый
+    статус из допустимых источников перехода. Если строка не обновилась,
+    переход уже выполнил кто-то другой (TransitionConflict). История
+    пишется в той же транзакции: её открывает вызывающий сервис
+    (@transaction.atomic), отдельной точки сохранения здесь нет.
+    Возвращает предыдущий статус.
+    """
+    t = check_transition(order, name, user)
+    own_only = t.own_orders_only and user.role == "master"
 
+    old = order.status
+    previous_master = order.assigned_master_id
+    qs = Order.objects.filter(id=order.id, status=old)
+    if own_only:
+        qs = qs.filter(assigned_master=user)
+    if qs.update(status=t.target, **fields) != 1:
+        raise TransitionConflict("Статус заявки уже изменён другим пользователем. Обновите страницу.")
+    order.status = t.target
+    for attr, value in fields.items():
+        setattr(order, attr, value)
+    log_status_change(order, user, old, t.target, comment=comment)
+    sync.track_orders([(order, previous_master)])
+    return old
+
+
+@transaction.atomic
 def assign_master(order: Order, dispatcher: User, master: User, planned_date=None):
-    if dispatcher.role != "dispatcher":
-        raise PermissionError("Только диспетчер может назначать мастера.")
     if master.role != "master":
         raise ValueError("Назначаемый пользователь должен быть мастером.")
-    if order.status not in [OrderStatus.NEW, OrderStatus.CANCELLED]:
-        raise ValueError("Назначение возможно только для новой или отмененной заявки.")
 
-    old = order.status
-    order.assigned_master = master
-    order.dispatcher = dispatcher
-    order.status = OrderStatus.ASSIGNED
+    fields = {"assigned_master": master, "dispatcher": dispatcher}
     if planned_date:
-        order.planned_date = planned_date
-    order.save()
-
-    log_status_change(order, dispatcher, old, order.status, comment=f"Назначен мастер: {master.username}")
+        fields["planned_date"] = planned_date
+    apply_transition(order, "assign", dispatcher, comment=f"Назначен мастер: {master.username}", **fields)
 
-    # Уведомления (заглушка/минимальная логика)
-    send_sms(order.customer_contact, f"Ваша заявка #{order.id} принята. Назначен мастер.")
-    send_sms(master.username, f"Вам назначена заявка #{order.id} (адрес: {order.address}).")  # если username = телефон/логин
+    # Уведомления пишутся в outbox в этой же транзакции (core.notifications)
+    notifications.notify_many([
+        (order.id, order.customer_contact, f"Ваша заявка #{order.id} принята. Назначен мастер.", "assigned"),
+        # если username = телефон/логин
+        (order.id, master.username, f"Вам назначена заявка #{order.id} (адрес: {order.address}).", "assigned"),
+    ])
 
 
+@transaction.atomic
 def start_order(order: Order, user: User):
-    if user.role != "master":
-        raise PermissionError("Начать работу может только мастер.")
-    if order.assigned_master_id != user.id:
-        raise PermissionError("Это не ваша заявка.")
-    if order.status not in [OrderStatus.ASSIGNED]:
-        raise ValueError("Перевод в 'В работе' возможен только из статуса 'Назначена'.")
-
-    old = order.status
-    order.status = OrderStatus.IN_PROGRESS
-    order.save(update_fields=["status"])
-    log_status_change(order, user, old, order.status, comment="Мастер начал работу")
+    apply_transition(order, "start", user, comment="Мастер начал работу")
+    notifications.notify(order.id, order.customer_contact, f"Мастер приступил к работе по заявке #{order.id}.",
+                         event="in_progress")
 
 
+@transaction.atomic
 def complete_order(order: Order, user: User):
     # Завершить может мастер (если назначен) или диспетчер (в дипломе допускается)
-    if user.role == "master" and order.assigned_master_id != user.id:
-        raise PermissionError("Это не ваша заявка.")
-    if order.status != OrderStatus.IN_PROGRESS:
-        raise ValueError("Завершение возможно только из статуса 'В работе'.")
+    apply_transition(order, "complete", user, comment="Заявка завершена", completed_at=timezone.now())
+    notifications.notify(order.id, order.customer_contact, f"Работы по заявке #{order.id} завершены.", event="done")
 
-    old = order.status
-    order.status = OrderStatus.DONE
-    order.completed_at = timezone.now()
-    order.save(update_fields=["status", "completed_at"])
-    log_status_change(order, user, old, order.status, comment="Заявка завершена")
 
+@transaction.atomic
+def cancel_order(order: Order, dispatcher: User):
+    apply_transition(order, "cancel", dispatcher, comment="Отменено диспетчером", dispatcher=dispatcher)
+
+
+# ---------- Async-представления (ASGI) ----------
+#
+# В Django 4.2 транзакции и on_commit доступны только синхронному коду, а
+# async ORM сам уходит в поток на каждый запрос. Поэтому переход целиком
+# (условный UPDATE, история, счётчики, outbox) выполняется одним
+# sync_to_async — один переход в поток на смену статуса, атомарность
+# прежняя. Права и исходный статус проверяются до этого по уже загруженной
+# заявке: отказ не занимает поток базы.
+
+
+async def astart_order(order: Order, user: User):
+    check_transition(order, "start", user)
+    await sync_to_async(start_order)(order, user)
+
+
+async def acomplete_order(order: Order, user: User):
+    check_transition(order, "complete", user)
+    await sync_to_async(complete_order)(order, user)
+
+
+# ---------- Массовые операции диспетчера ----------
+
+
+@dataclass
+class BulkResult:
+    """Итог массовой операции: изменённые заявки и ошибки по каждой отклонённой."""
+
+    updated: list = field(default_factory=list)
+    errors: dict = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _lock_orders(order_ids, result: BulkResult) -> list:
+    """Заблокировать заявки (select_for_update) в порядке id; отсутствующие — в ошибки."""
+    order_ids = sorted({int(i) for i in order_ids})
+    orders = list(Order.objects.select_for_update().filter(id__in=order_ids).order_by("id"))
+    found = {o.id for o in orders}
+    for order_id in order_ids:
+        if order_id not in found:
+            result.errors[order_id] = "Заявка не найдена."
+    return orders
+
+
+def _apply_bulk(changed: list, fields: list, by_user: User, comment, previous_masters: dict | None = None):
+    """
+    Записать пачку изменённых заявок: bulk_update, bulk_create истории, счётчики.
+    comment — строка или функция заявка -> строка; fields=None — строки
+    заявок уже записаны вызывающим; previous_masters — {id заявки: мастер
+    до изменения}, если изменение меняет мастера.
+    """
+    comment_for = comment if callable(comment) else (lambda order: comment)
+    if fields:
+        Order.objects.bulk_update([order for order, _ in changed], fields)
+    OrderHistory.objects.bulk_create([
+        OrderHistory(order=order, changed_by=by_user, old_status=old, new_status=order.status,
+                     comment=comment_for(order))
+        for order, old in changed
+    ])
+    counters.record_transitions([(order, old, order.status) for order, old in changed])
+    realtime.track_status_changes([(old, order.status) for order, old in changed])
+    workload.track_load_changes([(order, old, order.status) for order, old in changed])
+    previous_masters = previous_masters or {}
+    sync.track_orders([(order, previous_masters.get(order.id, order.assigned_master_id)) for order, _ in changed])
+
+
+def bulk_assign(order_ids, dispatcher: User, master: User, planned_date=None) -> BulkResult:
+    return bulk_assign_plan({master: order_ids}, dispatcher, planned_date=planned_date)
+
+
+@transaction.atomic
+def bulk_assign_plan(plan: dict, dispatcher: User, planned_date=None) -> BulkResult:
+    """
+    Назначение по плану {мастер: [id заявок]} одной пачкой: одна блокировка,
+    один bulk_update и общие дельты счётчиков на всех мастеров
+    (так пишет автоназначение очереди, см. core.assignment).
+    """
+    t = TRANSITIONS["assign"]
+    if dispatcher.role not in t.roles:
+        raise PermissionError(t.role_error)
+    if any(master.role != "master" for master in plan):
+        raise ValueError("Назначаемый пользователь должен быть мастером.")
+
+    master_of = {int(order_id): master for master, ids in plan.items() for order_id in ids}
+    result = BulkResult()
+    changed = []
+    previous_masters = {}
+    for order in _lock_orders(master_of, result):
+        if order.status not in t.sources:
+            result.errors[order.id] = t.error
+            continue
+        changed.append((order, order.status))
+        previous_masters[order.id] = order.assigned_master_id
+        order.assigned_master = master_of[order.id]
+        order.dispatcher = dispatcher
+        order.status = t.target
+        if planned_date:
+            order.planned_date = planned_date
+
+    if changed:
+        # Один UPDATE на мастера: bulk_update строит CASE на каждую строку
+        # и на тысячах заявок тратит секунды на компиляцию SQL.
+        by_master = {}
+        for order, _ in changed:
+            by_master.setdefault(order.assigned_master, []).append(order.id)
+        fields = {"dispatcher": dispatcher, "status": t.target}
+        if planned_date:
+            fields["planned_date"] = planned_date
+        for master, ids in by_master.items():
+            Order.objects.filter(id__in=ids).update(assigned_master=master, **fields)
+        _apply_bulk(changed, None, dispatcher, lambda order: f"Назначен мастер: {order.assigned_master.username}",
+                    previous_masters)
+        notify = []
+        for order, _ in changed:
+            notify.append((order.id, order.customer_contact,
+                           f"Ваша заявка #{order.id} принята. Назначен мастер.", "assigned"))
+            notify.append((order.id, order.assigned_master.username,
+                           f"Вам назначена заявка #{order.id} (адрес: {order.address}).", "assigned"))
+        notifications.notify_many(notify)
+    result.updated = [order.id for order, _ in changed]
+    return result
+
+
+@transaction.atomic
+def bulk_cancel(order_ids, dispatcher: User) -> BulkResult:
+    t = TRANSITIONS["cancel"]
+    if dispatcher.role not in t.roles:
+        raise PermissionError(t.role_error)
+
+    result = BulkResult()
+    changed = []
+    for order in _lock_orders(order_ids, result):
+        if order.status not in t.sources:
+            result.errors[order.id] = t.error
+            continue
+        changed.append((order, order.status))
+        order.status = t.target
+        order.dispatcher = dispatcher
+
+    if changed:
+        _apply_bulk(changed, ["status", "dispatcher"], dispatcher, "Отменено диспетчером")
+    result.updated = [order.id for order, _ in changed]
+    return result
@@ -0,0 +1,211 @@
+"""
+Статика: отпечатки содержимого, предварительное сжатие и отдача
+приложением с долгим кэшированием — без CDN и отдельного веб-сервера.
+
+collectstatic (хранилище CompressedManifestStaticFilesStorage) пишет в
+STATIC_ROOT файлы с хэшем содержимого в имени (core/master.3f2a9c.js,
+манифест staticfiles.json) и рядом — сжатые варианты .gz и, если
+установлен пакет brotli, .br. Сжимаются только текстовые форматы и только
+если вариант заметно меньше исходника.
+
+core.middleware.StaticFilesMiddleware отдаёт файлы из STATIC_ROOT и под
+WSGI, и под ASGI: вариант выбирается по Accept-Encoding (br, затем gzip),
+файлы с хэшем в имени получают Cache-Control: immutable на год (новое
+содержимое — новое имя), остальные — короткий STATIC_MAX_AGE с ETag.
+Список файлов строится один раз на процесс, поэтому после collectstatic
+процессы нужно перезапустить (как и при выкладке кода).
+"""
+import gzip
+import json
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, HttpResponse, HttpResponseNotAllowed
+
+try:
+    import brotli
+except ImportError:  # .br-варианты — по желанию (см. requirements.txt)
+    brotli = None
+
+COMPRESSIBLE = {".css", ".js", ".mjs", ".map", ".json", ".svg", ".txt", ".html", ".xml", ".ico", ".ttf", ".otf", ".eot"}
+MIN_SIZE = 256
+# Вариант сохраняется, только если он меньше исходника хотя бы на 5%.
+MIN_RATIO = 0.95
+# Порядок предпочтения: (Content-Encoding, расширение файла варианта).
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+IMMUTABLE = "public, max-age=31536000, immutable"
+TEXT_TYPES = {"application/javascript", "application/json", "image/svg+xml"}
+
+
+def _compressors():
+    compressors = {".gz": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressors[".br"] = lambda data: brotli.compress(data, quality=11)
+    return compressors
+
+
+def compress_file(path: str) -> list:
+    """Записать сжатые варианты файла рядом с ним; вернуть их пути."""
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE or os.path.getsize(path) < MIN_SIZE:
+        return []
+    with open(path, "rb") as f:
+        data = f.read()
+    written = []
+    for suffix, compress in _compressors().items():
+        packed = compress(data)
+        if len(packed) < len(data) * MIN_RATIO:
+            with open(path + suffix, "wb") as f:
+                f.write(packed)
+            written.append(path + suffix)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)  # вариант от прошлой сборки больше не выгоден
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage + варианты .gz/.br для исходных и хэшированных файлов."""
+
+    def stored_name(self, name):
+        # collectstatic ещё не запускался (разработка, тесты): имена без хэша.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for original, hashed in self.hashed_files.items():
+            for name in {original, hashed}:
+                if self.exists(name):
+                    compress_file(self.path(name))
+
+
+# ---------- отдача ----------
+
+
+@dataclass
+class StaticFile:
+    path: str
+    size: int
+    etag: str
+    content_type: str
+    immutable: bool
+    # Content-Encoding -> (путь, размер, ETag) сжатого варианта
+    variants: dict = field(default_factory=dict)
+
+
+_index = {}
+
+
+def _etag(stat) -> str:
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def build_index(root) -> dict:
+    """{относительный путь: StaticFile} по содержимому STATIC_ROOT."""
+    root = str(root)
+    if not os.path.isdir(root):
+        return {}
+    try:
+        with open(os.path.join(root, ManifestStaticFilesStorage.manifest_name), encoding="utf-8") as f:
+            hashed = set(json.load(f)["paths"].values())
+    except (OSError, ValueError, KeyError):
+        hashed = set()
+
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            if rel == ManifestStaticFilesStorage.manifest_name or any(
+                    name.endswith(suffix) and name[: -len(suffix)] in names for _, suffix in ENCODINGS):
+                continue
+            stat = os.stat(path)
+            content_type, encoding = mimetypes.guess_type(name)
+            static_file = StaticFile(
+                path=path, size=stat.st_size, etag=_etag(stat),
+                content_type=content_type or "application/octet-stream", immutable=rel in hashed,
+            )
+            if content_type and (content_type.startswith("text/") or content_type in TEXT_TYPES):
+                static_file.content_type += "; charset=utf-8"
+            for encoding, suffix in ENCODINGS:
+                if name + suffix in names:
+                    variant = os.stat(path + suffix)
+                    static_file.variants[encoding] = (path + suffix, variant.st_size, _etag(variant))
+            files[rel] = static_file
+    return files
+
+
+def get_index() -> dict:
+    root = str(settings.STATIC_ROOT or "")
+    if root not in _index:
+        _index[root] = build_index(root) if root else {}
+    return _index[root]
+
+
+def clear():
+    _index.clear()
+
+
+def accepted_encodings(header: str) -> set:
+    """Кодировки из Accept-Encoding; q=0 — отказ от кодировки."""
+    accepted = set()
+    for part in header.split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def static_prefix() -> str:
+    return urlsplit(settings.STATIC_URL or "").path
+
+
+def serve(request):
+    """Ответ с файлом статики или None, если путь не в STATIC_ROOT."""
+    prefix = static_prefix()
+    if not prefix or not request.path_info.startswith(prefix):
+        return None
+    static_file = get_index().get(request.path_info[len(prefix):])
+    if static_file is None:
+        return None
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+
+    path, size, etag, encoding = static_file.path, static_file.size, static_file.etag, None
+    accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    for candidate, _ in ENCODINGS:
+        if candidate in static_file.variants and candidate in accepted:
+            encoding = candidate
+            path, size, etag = static_file.variants[candidate]
+            break
+
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponse(status=304)
+    elif request.method == "HEAD":
+        response = HttpResponse(content_type=static_file.content_type)
+        response["Content-Length"] = size
+    else:
+        response = FileResponse(open(path, "rb"), content_type=static_file.content_type)
+        response.headers.pop("Content-Disposition", None)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    if static_file.variants:
+        response["Vary"] = "Accept-Encoding"
+    response["ETag"] = etag
+    if settings.SECURE_CONTENT_TYPE_NOSNIFF:
+        response["X-Content-Type-Options"] = "nosniff"
+    response["Cache-Control"] = IMMUTABLE if static_file.immutable else f"public, max-age={settings.STATIC_MAX_AGE}"
+    return response
@@ -0,0 +1,109 @@
+"""
+Синхронизация мобильного клиента мастера (JSON API /api/master/...).
+
+У каждого мастера есть версия в кэше: она увеличивается после фиксации
+любого изменения его заявок (смена статуса через core.services, правка
+заявки через Order.save). ETag ответа строится из версии, поэтому
+If-None-Match проверяется одним чтением кэша, без запроса к заявкам.
+
+Версия не восстанавливается из базы: если ключа нет (кэш перезапущен),
+берётся новое значение от текущего времени, и старые ETag просто
+перестают совпадать.
+
+Дельта (?since=) — заявки мастера с записями истории новее since. Берётся
+с запасом SINCE_OVERLAP: запись истории получает время до фиксации
+транзакции и может стать видна позже ответа с более поздним server_time.
+Лишние заявки в дельте безвредны — клиент заменяет их по id. Когда
+заявку переназначают с мастера на другого, её история уходит вместе с ней,
+поэтому прежний мастер получает отметку «полная синхронизация»: дельта
+с since раньше отметки отдаёт полный список.
+"""
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+VERSION_KEY = "sync:master:{}:version"
+RESYNC_KEY = "sync:master:{}:resync"
+RESYNC_TTL = 30 * 24 * 3600
+SINCE_OVERLAP = timedelta(seconds=60)
+
+
+def version(master_id: int) -> int:
+    key = VERSION_KEY.format(master_id)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns() // 1000, None)
+        value = cache.get(key)
+    return value
+
+
+def etag(master_id: int) -> str:
+    return f'"m{master_id}.{version(master_id)}"'
+
+
+def _bump(master_ids, resync_ids=()):
+    for master_id in master_ids:
+        try:
+            cache.incr(VERSION_KEY.format(master_id))
+        except ValueError:
+            pass  # версии ещё нет: первое чтение создаст новую
+    if resync_ids:
+        now = timezone.now()
+        cache.set_many({RESYNC_KEY.format(m): now for m in resync_ids}, RESYNC_TTL)
+
+
+def track_orders(changes):
+    """
+    Учесть изменения заявок [(заявка, прежний мастер id)] после фиксации
+    транзакции: версии прежнего и текущего мастера растут, прежний (если
+    заявку у него забрали) получает отметку полной синхронизации.
+    """
+    masters, resync = set(), set()
+    for order, previous_master in changes:
+        masters.update(m for m in (previous_master, order.assigned_master_id) if m)
+        if previous_master and previous_master != order.assigned_master_id:
+            resync.add(previous_master)
+    if masters:
+        transaction.on_commit(lambda: _bump(masters, resync))
+
+
+def on_order_change(sender, instance, **kwargs):
+    """post_save/post_delete Order (админка, правка полей): заявка текущего мастера изменилась."""
+    if instance.assigned_master_id:
+        track_orders([(instance, instance.assigned_master_id)])
+
+
+def needs_full_sync(master_id: int, since) -> bool:
+    resync_at = cache.get(RESYNC_KEY.format(master_id))
+    return resync_at is not None and resync_at >= since
+
+
+# ---------- представление ----------
+
+
+def order_data(order) -> dict:
+    return {
+        "id": order.id,
+        "status": order.status,
+        "category": order.category,
+        "description": order.description,
+        "address": order.address,
+        "customer_name": order.customer_name,
+        "customer_contact": order.customer_contact,
+        "created_at": order.created_at.isoformat(),
+        "planned_date": order.planned_date.isoformat() if order.planned_date else None,
+        "lat": order.lat,
+        "lon": order.lon,
+    }
+
+
+def history_data(entry) -> dict:
+    return {
+        "timestamp": entry.timestamp.isoformat(),
+        "old_status": entry.old_status,
+        "new_status": entry.new_status,
+        "comment": entry.comment,
+    }
@@ -1,27 +1,80 @@
+from datetime import date, datetime
+
 from celery import shared_task
+from django.db import transaction
 
+from . import analytics, archive, exports, geo, notifications
 from .models import Order
-from .services import send_sms, send_email
 
 
 @shared_task
 def send_notification(order_id: int, event_type: str) -> None:
     """
-    Фоновая задача отправки уведомлений по заявке.
+    Уведомить клиента о текущем статусе заявки.
     event_type может быть, например: 'assigned', 'in_progress', 'done'.
+
+    Сообщение пишется в outbox и уходит вместе с остальными через relay_outbox.
     """
     try:
         order = Order.objects.get(id=order_id)
     except Order.DoesNotExist:
         return
 
-    # Простейшая логика уведомлений; при необходимости можно расширить.
-    subject = f"Заявка #{order.id}: {event_type}"
     text = f"Статус вашей заявки #{order.id} изменился: {order.get_status_display()}."
+    with transaction.atomic():
+        notifications.notify(order.id, order.customer_contact, text, event=event_type)
+
+
+@shared_task
+def relay_outbox(until: str | None = None) -> int:
+    """
+    Отправить готовые сообщения outbox (core.notifications.relay). until —
+    конец окна склейки (ISO), к которому запланирован запуск.
+    """
+    return notifications.relay(until=datetime.fromisoformat(until) if until else None)
+
+
+@shared_task
+def purge_outbox() -> int:
+    """Удалить давно отправленные сообщения outbox."""
+    return notifications.purge()
 
-    if order.customer_contact:
-        # Попробуем отправить и как SMS, и как email (для диплома это достаточно как заглушка)
-        send_sms(order.customer_contact, text)
-        send_email(order.customer_contact, subject, text)
 
+@shared_task(bind=True)
+def export_orders_job(self, kind: str, fmt: str, date_from: str | None = None, date_to: str | None = None,
+                      status: str | None = None, job_id: str | None = None) -> dict:
+    """
+    Выгрузка в файл settings.EXPORT_ROOT. Прогресс — в кэше под job_id
+    (по умолчанию id задачи), см. core.exports.progress. Даты — ISO-строки.
+    """
+    return exports.write_file(
+        kind, fmt,
+        job_id=job_id or self.request.id,
+        date_from=date.fromisoformat(date_from) if date_from else None,
+        date_to=date.fromisoformat(date_to) if date_to else None,
+        status=status,
+    )
 
+
+@shared_task
+def archive_closed_orders() -> int:
+    """Ночная архивация закрытых заявок (core.archive, расписание — CELERY_BEAT_SCHEDULE)."""
+    return archive.archive_closed_orders()
+
+
+@shared_task
+def refresh_lifecycle_rollups() -> int:
+    """Пересчёт свёрток длительностей этапов за последние дни (core.analytics)."""
+    return analytics.refresh()
+
+
+@shared_task
+def geocode_orders(order_ids: list) -> int:
+    """Координаты заявок после создания или смены адреса (core.geo)."""
+    return geo.locate(order_ids)
+
+
+@shared_task
+def geocode_pending_orders() -> int:
+    """Заявки, которые ещё не геокодированы (сбой провайдера, старые данные)."""
+    return geo.locate_pending()
@@ -0,0 +1,11 @@
+from django import template
+
+from core.analytics import format_duration
+
+register = template.Library()
+
+
+@register.filter
+def duration(seconds):
+    """Секунды → «3 ч 15 мин» (core.analytics.format_duration)."""
+    return format_duration(seconds)
@@ -0,0 +1,59 @@
+"""
+{% order_row "имя" order "шаблон строки" %} — кэшируемая строка списка
+заявок (строка таблицы, карточка), вынесенная в отдельный шаблон.
+
+Шаблон строки компилируется один раз (кэширующий загрузчик, профиль
+TEMPLATE_PROFILE) и рендерится в изолированном контексте с одной
+переменной order — только при промахе кэша. В штамп строки входит
+ревизия шаблона (контрольная сумма исходника), поэтому после выкладки
+с изменённой разметкой старые строки из кэша не отдаются. Ключи, штамп
+и инвалидация — в core.caching.
+"""
+import zlib
+
+from django import template
+
+from core import caching
+
+register = template.Library()
+
+
+def template_revision(row_template) -> int:
+    """Ревизия скомпилированного шаблона; считается один раз на объект."""
+    revision = getattr(row_template, "row_revision", None)
+    if revision is None:
+        revision = row_template.row_revision = zlib.crc32(row_template.source.encode())
+    return revision
+
+
+class OrderRowNode(template.Node):
+    def __init__(self, name, order, template_name):
+        self.name = name
+        self.order = order
+        self.template_name = template_name
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        order = self.order.resolve(context)
+        # Версия списка мастеров и шаблон строки — один раз на рендеринг страницы.
+        state = context.render_context
+        if "roster_version" not in state:
+            state["roster_version"] = caching.roster_version()
+        if self not in state:
+            row_template = context.template.engine.get_template(self.template_name.resolve(context))
+            state[self] = row_template, (state["roster_version"], template_revision(row_template))
+        row_template, version = state[self]
+
+        html = caching.get_fragment(name, order, version)
+        if html is None:
+            html = row_template.render(context.new({"order": order}))
+            caching.set_fragment(name, order, version, html)
+        return html
+
+
+@register.tag
+def order_row(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 4:
+        raise template.TemplateSyntaxError(f"{bits[0]} ожидает имя фрагмента, заявку и шаблон строки.")
+    return OrderRowNode(*(parser.compile_filter(bit) for bit in bits[1:]))
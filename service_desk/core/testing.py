@@ -0,0 +1,76 @@
+"""
+Помощники для тестов: бюджеты SQL-запросов по именам URL.
+
+Число запросов берётся из response.request_metrics, который проставляет
+core.middleware.RequestMetricsMiddleware. Бюджет — верхняя граница для
+типового ответа; если представление начинает делать больше запросов
+(например, появился N+1), тест падает с перечнем имени URL и числа.
+"""
+# Имя URL -> максимум SQL-запросов на запрос (с учётом сессии и пользователя).
+# Смена статуса дороже остальных: история, условный UPDATE и строки
+# OrderCounter (новая строка счётчика — INSERT в точке сохранения),
+# уведомления — INSERT в outbox (core.notifications).
+QUERY_BUDGETS = {
+    "create_order": 0,
+    "order_success": 1,
+    "order_list": 3,
+    "assign_order": 9,
+    "order_stats": 9,
+    "dispatcher_orders": 4,
+    "dispatcher_bulk_action": 7,
+    "dispatcher_export": 2,
+    "dispatcher_export_status": 2,
+    "dispatcher_new_count": 3,
+    "dispatcher_new_count_stream": 2,
+    "dispatcher_order_detail": 6,
+    "master_orders": 3,
+    "master_order_detail": 4,
+    "master_route": 3,
+    "master_start": 8,
+    "master_complete": 8,
+    "api_master_orders": 4,
+    "api_master_order_detail": 4,
+    "metrics": 2,
+}
+
+
+def core_url_names() -> set:
+    """Имена всех маршрутов приложения core."""
+    from core import urls
+
+    return {p.name for p in urls.urlpatterns if p.name}
+
+
+def async_urlconf():
+    """
+    ROOT_URLCONF проекта с async-версиями частых точек — как под ASGI
+    (ASYNC_VIEWS=1): для override_settings(ROOT_URLCONF=...).
+    """
+    from django.urls import include, path
+
+    from core import urls
+    from service_desk import urls as project_urls
+
+    class AsyncUrls:
+        urlpatterns = [p for p in project_urls.urlpatterns if getattr(p, "urlconf_name", None) is not urls] + [
+            path("", include(urls.build_urlpatterns(async_views=True))),
+        ]
+
+    return AsyncUrls
+
+
+class QueryBudgetMixin:
+    """Примесь к TestCase: assertQueryBudget(response) по имени URL."""
+
+    query_budgets = QUERY_BUDGETS
+
+    def assertQueryBudget(self, response, url_name: str | None = None):
+        url_name = url_name or response.resolver_match.url_name
+        metrics = getattr(response, "request_metrics", None)
+        self.assertIsNotNone(metrics, "Нет request_metrics: RequestMetricsMiddleware не подключен.")
+        budget = self.query_budgets[url_name]
+        self.assertLessEqual(
+            metrics.queries, budget,
+            f"{url_name}: {metrics.queries} SQL-запросов при бюджете {budget}",
+        )
+        return metrics
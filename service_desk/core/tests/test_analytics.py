@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import analytics
+from ..models import LifecycleRollup, Order, OrderHistory, OrderStatus, User
+
+
+class LifecycleAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master",
+                                               first_name="Пётр")
+        now = timezone.now().replace(microsecond=0)
+        self.now = now
+        # Назначение через 10 и 50 минут, начало через час, завершение через 40 минут работы.
+        self.fast = self.make(now - timedelta(hours=4), assigned=10, started=60, completed=100)
+        self.slow = self.make(now - timedelta(hours=4), assigned=50)
+
+    def make(self, created_at, assigned=None, started=None, completed=None):
+        order = Order.objects.create(category="Сантехника", description="Течет кран", customer_name="Иван",
+                                     customer_contact="+79990000000", assigned_master=self.master)
+        Order.objects.filter(id=order.id).update(
+            created_at=created_at,
+            completed_at=created_at + timedelta(minutes=completed) if completed else None,
+        )
+        for minutes, status in [(assigned, OrderStatus.ASSIGNED), (started, OrderStatus.IN_PROGRESS),
+                                (completed, OrderStatus.DONE)]:
+            if minutes is not None:
+                entry = OrderHistory.objects.create(order=order, changed_by=self.dispatcher,
+                                                    old_status=OrderStatus.NEW, new_status=status)
+                OrderHistory.objects.filter(id=entry.id).update(timestamp=created_at + timedelta(minutes=minutes))
+        return order
+
+    def test_refresh_rolls_up_durations_in_sql(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(5):  # SAVEPOINT, свёртка, удаление, вставка, RELEASE
+                analytics.refresh(days=2)
+        stages = dict(LifecycleRollup.objects.values_list("stage").annotate(n=Sum("count")).order_by())
+        self.assertEqual(stages, {"assign": 2, "start": 1, "complete": 1})
+        self.assertAlmostEqual(
+            LifecycleRollup.objects.filter(stage="assign").aggregate(s=Sum("total_seconds"))["s"], 3600, delta=1)
+        # Повторный прогон заменяет строки, а не добавляет.
+        analytics.refresh(days=2)
+        self.assertEqual(LifecycleRollup.objects.filter(stage="assign").aggregate(n=Sum("count"))["n"], 2)
+
+    def test_summary_is_cached_until_next_refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            analytics.refresh(days=2)
+        rows = analytics.summary()["master"]
+        self.assertEqual(rows[0]["key"], "Пётр")
+        assign, start, complete = rows[0]["stages"]
+        self.assertEqual((assign["count"], start["count"], complete["count"]), (2, 1, 1))
+        self.assertAlmostEqual(assign["avg"], 30 * 60, delta=1)
+        self.assertTrue(30 * 60 <= complete["p50"] <= 3600)
+        with self.assertNumQueries(0):
+            analytics.summary()
+
+        self.make(self.now - timedelta(hours=1), assigned=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            analytics.refresh(days=2)
+        self.assertEqual(analytics.summary()["master"][0]["stages"][0]["count"], 3)
+
+        self.client.force_login(self.dispatcher)
+        response = self.client.get(reverse("order_stats"))
+        self.assertContains(response, "Длительность этапов")
+        self.assertContains(response, "Пётр")
+
+    def test_summary_outlives_no_refresh_interval(self):
+        # Версию поднимает воркер: с locmem веб-процесс видит новые данные только по истечении TTL.
+        minutes = sorted(settings.CELERY_BEAT_SCHEDULE["refresh-lifecycle-rollups"]["schedule"].minute)
+        interval = max(b - a for a, b in zip(minutes, minutes[1:] + [minutes[0] + 60])) * 60
+        self.assertLessEqual(analytics.SUMMARY_TTL, interval)
+
+    def test_percentile_interpolates_inside_bucket(self):
+        self.assertIsNone(analytics.percentile({}, 50))
+        # 10 заявок в корзине 1–5 минут: медиана посередине.
+        self.assertEqual(analytics.percentile({1: 10}, 50), 180)
+        self.assertEqual(analytics.percentile({0: 5, 1: 5}, 50), 60)
+        self.assertEqual(analytics.format_duration(3 * 3600 + 15 * 60), "3 ч 15 мин")
+        self.assertEqual(analytics.format_duration(26 * 3600), "1 д 2 ч")
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Order, OrderHistory, OrderStatus, User
+from ..services import assign_master, cancel_order, complete_order, register_new_order, start_order
+
+
+class MasterApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master")
+        self.other = User.objects.create_user(username="other", password="123", role="master")
+        self.orders = [self.assigned(self.master, i) for i in range(2)]
+        self.client.force_login(self.master)
+
+    def assigned(self, master, i=0):
+        order = Order(category="Сантехника", description=f"Течет кран {i}", customer_name="Иван",
+                      customer_contact="+79990000000")
+        with self.captureOnCommitCallbacks(execute=True):
+            register_new_order(order)
+            assign_master(order, self.dispatcher, master)
+        return order
+
+    def get(self, url_name, *args, **kwargs):
+        return self.client.get(reverse(url_name, args=args), **kwargs)
+
+    def test_etag_returns_304_without_order_query(self):
+        response = self.get("api_master_orders")
+        self.assertEqual([o["id"] for o in response.json()["orders"]], [o.id for o in reversed(self.orders)])
+        etag = response["ETag"]
+        with self.assertNumQueries(1):  # только сессия: пользователь — из кэша процесса (core.auth)
+            self.assertEqual(self.get("api_master_orders", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            start_order(self.orders[0], self.master)
+        response = self.get("api_master_orders", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_since_returns_changes_and_removed(self):
+        server_time = self.get("api_master_orders").json()["server_time"]
+        OrderHistory.objects.update(timestamp=timezone.now() - timedelta(hours=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            start_order(self.orders[0], self.master)
+            complete_order(self.orders[0], self.master)
+        new = self.assigned(self.master, 2)
+
+        data = self.get("api_master_orders", data={"since": server_time}).json()
+        self.assertFalse(data["full"])
+        self.assertEqual([o["id"] for o in data["orders"]], [new.id])
+        self.assertEqual(data["removed"], [self.orders[0].id])
+        self.assertEqual(self.get("api_master_orders", data={"since": "вчера"}).status_code, 400)
+
+    def test_reassigned_order_forces_full_sync_for_previous_master(self):
+        server_time = self.get("api_master_orders").json()["server_time"]
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_order(self.orders[0], self.dispatcher)
+            assign_master(self.orders[0], self.dispatcher, self.other)
+        data = self.get("api_master_orders", data={"since": server_time}).json()
+        self.assertTrue(data["full"])
+        self.assertEqual([o["id"] for o in data["orders"]], [self.orders[1].id])
+
+    def test_detail_with_history_and_only_own_orders(self):
+        data = self.get("api_master_order_detail", self.orders[0].id).json()
+        self.assertEqual(data["status"], OrderStatus.ASSIGNED)
+        self.assertEqual([h["new_status"] for h in data["history"]], [OrderStatus.ASSIGNED])
+        self.assertEqual(self.get("api_master_order_detail", self.assigned(self.other).id).status_code, 404)
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import archive, counters, exports
+from ..models import ArchivedOrder, ArchivedOrderHistory, Order, OrderHistory, OrderStatus, User
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher",
+                                                   is_staff=True, is_superuser=True)
+        long_ago = timezone.now() - timedelta(days=200)
+        self.done = self.make(OrderStatus.DONE, long_ago, completed_at=long_ago)
+        self.cancelled = self.make(OrderStatus.CANCELLED, long_ago)
+        # Отменена давно созданная заявка, но вчера: ещё рано.
+        self.recently_cancelled = self.make(OrderStatus.CANCELLED, long_ago, history_at=timezone.now())
+        self.recent_done = self.make(OrderStatus.DONE, long_ago, completed_at=timezone.now())
+        self.open = self.make(OrderStatus.ASSIGNED, long_ago)
+        counters.rebuild()
+
+    def make(self, status, created_at, completed_at=None, history_at=None):
+        order = Order.objects.create(category="Сантехника", description="Течет кран", customer_name="Иван",
+                                     customer_contact="+79990000000", status=status, completed_at=completed_at)
+        history = OrderHistory.objects.create(order=order, changed_by=self.dispatcher, old_status=OrderStatus.NEW,
+                                              new_status=status, comment="закрыта")
+        Order.objects.filter(id=order.id).update(created_at=created_at)
+        OrderHistory.objects.filter(id=history.id).update(timestamp=history_at or created_at)
+        return order
+
+    def test_moves_old_closed_orders_in_batches(self):
+        moved = []
+        self.assertEqual(archive.archive_closed_orders(days=90, batch_size=1, on_batch=moved.append), 2)
+        self.assertEqual(moved, [1, 2])
+        self.assertEqual(set(ArchivedOrder.objects.values_list("id", flat=True)), {self.done.id, self.cancelled.id})
+        self.assertEqual(set(Order.objects.values_list("id", flat=True)),
+                         {self.recently_cancelled.id, self.recent_done.id, self.open.id})
+        self.assertEqual(ArchivedOrderHistory.objects.filter(order_id=self.done.id).count(), 1)
+        self.assertFalse(OrderHistory.objects.filter(order_id__in=[self.done.id, self.cancelled.id]).exists())
+        # Статистика считает и архив.
+        self.assertEqual(counters.rebuild(dry_run=True), {})
+        self.assertEqual(archive.archive_closed_orders(days=90), 0)
+
+    def test_archive_keeps_coordinates(self):
+        now = timezone.now()
+        Order.objects.filter(id=self.done.id).update(lat=55.75, lon=37.62, geohash="ucfv0j3", geocoded_at=now)
+        archive.archive_closed_orders(days=90)
+        archived = ArchivedOrder.objects.get(id=self.done.id)
+        self.assertEqual((archived.lat, archived.lon, archived.geohash, archived.geocoded_at),
+                         (55.75, 37.62, "ucfv0j3", now))
+
+    def test_archived_order_is_found_by_detail_admin_and_export(self):
+        archive.archive_closed_orders(days=90)
+        self.client.force_login(self.dispatcher)
+        url = reverse("dispatcher_order_detail", args=[self.done.id])
+        response = self.client.get(url)
+        self.assertContains(response, "архив")
+        self.assertContains(response, "закрыта")  # комментарий из истории
+        self.assertNotContains(response, 'value="assign"')
+
+        response = self.client.post(url, {"action": "cancel"})
+        self.assertRedirects(response, url)
+        self.assertEqual(ArchivedOrder.objects.get(id=self.done.id).status, OrderStatus.DONE)
+
+        response = self.client.get(reverse("admin:core_order_change", args=[self.done.id]))
+        self.assertRedirects(response, reverse("admin:core_archivedorder_change", args=[self.done.id]))
+
+        exported = [row[0] for row in exports.export_queryset("orders")]
+        self.assertEqual(exported, sorted(Order.objects.values_list("id", flat=True).union(
+            ArchivedOrder.objects.values_list("id", flat=True))))
@@ -0,0 +1,88 @@
+from collections import Counter
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import workload
+from ..assignment import Planner, auto_assign, auto_assign_batch
+from ..models import Order, OrderHistory, OrderStatus, User
+from ..services import complete_order, start_order
+
+
+class AutoAssignmentTests(TestCase):
+    def setUp(self):
+        workload.index.invalidate()
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.plumber = User.objects.create_user(username="plumber", role="master", categories="Сантехника, Отопление")
+        self.electrician = User.objects.create_user(username="electric", role="master", categories="Электрика")
+        self.generalist = User.objects.create_user(username="any", role="master")
+        self.planned = timezone.now() + timezone.timedelta(days=1)
+
+    def make(self, category="Сантехника", status=OrderStatus.NEW, master=None, planned_date=None):
+        return Order.objects.create(category=category, description="-", customer_name="Иван",
+                                    customer_contact="+79990000000", status=status,
+                                    assigned_master=master, planned_date=planned_date)
+
+    def pick(self, category="Сантехника", planned_date=None):
+        workload.index.invalidate()
+        return Planner().pick(category, planned_date)
+
+    def test_category_match_then_load(self):
+        self.assertEqual(self.pick("сантехника"), self.plumber.id)
+        self.assertEqual(self.pick("Электрика"), self.electrician.id)
+        self.assertEqual(self.pick("Вентиляция"), self.generalist.id)
+        for _ in range(3):
+            self.make(status=OrderStatus.IN_PROGRESS, master=self.plumber)
+        # Три открытые заявки дороже штрафа универсала.
+        self.assertEqual(self.pick(), self.generalist.id)
+
+    def test_planned_date_conflict(self):
+        self.make(status=OrderStatus.ASSIGNED, master=self.plumber, planned_date=self.planned)
+        self.assertEqual(self.pick(planned_date=self.planned + timezone.timedelta(hours=1)), self.generalist.id)
+        self.assertEqual(self.pick(planned_date=self.planned + timezone.timedelta(hours=5)), self.plumber.id)
+
+    def test_index_is_updated_incrementally(self):
+        Planner()  # загрузка индекса
+        order = self.make()
+        with self.captureOnCommitCallbacks(execute=True):
+            master = auto_assign(order, self.dispatcher)
+        self.assertEqual(master, self.plumber)
+        with self.assertNumQueries(0):
+            self.assertEqual(workload.index.load(self.plumber.id), 1)
+            self.assertEqual(Planner().pick("Сантехника"), self.plumber.id)
+
+        order.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            start_order(order, self.plumber)
+            complete_order(order, self.plumber)
+        self.assertEqual(workload.index.load(self.plumber.id), 0)
+
+    def test_apply_replaces_master_orders_instead_of_mutating(self):
+        self.make(status=OrderStatus.ASSIGNED, master=self.plumber, planned_date=self.planned)
+        Planner()
+        seen = workload.index.open[self.plumber.id]
+        before = dict(seen)
+        workload.index.apply([(self.plumber.id, 10 ** 6, self.planned, True)])
+        self.assertEqual(seen, before)  # словарь, который обходит Planner в другом потоке, цел
+        self.assertEqual(workload.index.load(self.plumber.id), 2)
+
+    def test_batch_over_new_queue(self):
+        orders = [self.make() for _ in range(6)]
+        self.make(category="Электрика", status=OrderStatus.DONE)
+        result = auto_assign_batch(self.dispatcher)
+        self.assertEqual(sorted(result.updated), [o.id for o in orders])
+        assigned = Counter(Order.objects.filter(id__in=result.updated).values_list("assigned_master", flat=True))
+        # Равная оценка — меньший id, поэтому мастер по профилю получает на две больше.
+        self.assertEqual(assigned, {self.plumber.id: 4, self.generalist.id: 2})
+        self.assertEqual(OrderHistory.objects.filter(order__in=orders, new_status=OrderStatus.ASSIGNED).count(), 6)
+
+    def test_dispatcher_actions(self):
+        order, other = self.make(category="Электрика"), self.make(category="Электрика")
+        self.client.force_login(self.dispatcher)
+        self.client.post(reverse("dispatcher_order_detail", args=[order.id]), {"action": "auto_assign"})
+        self.client.post(reverse("dispatcher_bulk_action"), {"action": "auto_assign", "order_ids": [other.id]})
+        self.assertEqual(
+            set(Order.objects.filter(id__in=[order.id, other.id]).values_list("assigned_master", "status")),
+            {(self.electrician.id, OrderStatus.ASSIGNED)},
+        )
@@ -0,0 +1,71 @@
+import asyncio
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils.module_loading import import_string
+
+from .. import auth, realtime, views
+from ..models import Order, OrderHistory, OrderStatus, User
+from ..services import assign_master, register_new_order
+from ..testing import async_urlconf
+
+
+@override_settings(ROOT_URLCONF=async_urlconf())
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        auth.clear()
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master")
+        self.order = Order(category="Сантехника", description="Течет кран", customer_name="Иван",
+                           customer_contact="+79990000000")
+        with self.captureOnCommitCallbacks(execute=True):
+            register_new_order(self.order)
+            assign_master(self.order, self.dispatcher, self.master)
+
+    def login(self, user):
+        self.client.force_login(user)
+        self.async_client.cookies = self.client.cookies
+
+    def test_middleware_keeps_async_views_on_the_event_loop(self):
+        # Один синхронный middleware — и Django гонит весь запрос через поток.
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(getattr(import_string(path), "async_capable", False), path)
+        for view in (views.amaster_start, views.amaster_complete, views.adispatcher_new_count, views.aorder_success):
+            self.assertTrue(asyncio.iscoroutinefunction(view), view.__name__)
+        self.assertIs(resolve(reverse("master_start", args=[1])).func, views.amaster_start)
+
+    async def test_master_start_and_complete_under_asgi(self):
+        await sync_to_async(self.login)(self.master)
+        for url_name in ("master_start", "master_complete"):
+            response = await self.async_client.post(reverse(url_name, args=[self.order.id]))
+            self.assertEqual(response.json(), {"ok": True})
+        order = await Order.objects.aget(id=self.order.id)
+        self.assertEqual(order.status, OrderStatus.DONE)
+        self.assertEqual(await OrderHistory.objects.filter(order=order).acount(), 3)
+        self.assertGreater(response.request_metrics.queries, 0)  # SQL из потока sync_to_async учтён
+
+        response = await self.async_client.post(reverse("master_start", args=[self.order.id]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((await self.async_client.post(reverse("master_start", args=[0]))).status_code, 404)
+
+    async def test_counter_and_success_page_under_asgi(self):
+        response = await self.async_client.get(reverse("dispatcher_new_count"))
+        self.assertEqual(response.status_code, 302)  # не вошёл — на страницу входа
+
+        await sync_to_async(self.login)(self.dispatcher)
+        self.assertEqual((await self.async_client.get(reverse("dispatcher_new_count"))).json(), {"new_count": 0})
+        response = await self.async_client.get(reverse("order_success", args=[self.order.id]))
+        self.assertContains(response, f"#{self.order.id}")
+        self.assertContains(response, "disp")
+
+    async def test_long_poll_waits_for_change_under_asgi(self):
+        await sync_to_async(self.login)(self.dispatcher)
+        with mock.patch.object(realtime, "wait_for_change", return_value=1) as wait:
+            response = await self.async_client.get(reverse("dispatcher_new_count_stream"), {"since": 0})
+        wait.assert_called_once_with(0, timeout=realtime.LONG_POLL_TIMEOUT)
+        self.assertEqual(response.json(), {"new_count": 1})
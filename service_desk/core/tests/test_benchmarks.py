@@ -0,0 +1,33 @@
+from django.test import TestCase
+
+from .. import benchmarks
+from ..models import Order, OrderHistory, OrderStatus, User
+
+
+class WorkflowBenchmarkTests(TestCase):
+    def test_seed_history_follows_lifecycle(self):
+        master = User.objects.create_user(username="mast", role="master")
+        dispatcher = User.objects.create_user(username="disp", role="dispatcher")
+        for status in (OrderStatus.NEW, OrderStatus.ASSIGNED, OrderStatus.DONE, OrderStatus.CANCELLED):
+            Order.objects.create(category="Сантехника", description="x", customer_name="Иван",
+                                 customer_contact="+79990000000", status=status, assigned_master=master)
+        self.assertEqual(benchmarks.seed_history(dispatcher), 1 + 3 + 1)
+        done = OrderHistory.objects.filter(order__status=OrderStatus.DONE).order_by("timestamp")
+        self.assertEqual([(h.new_status, h.changed_by_id) for h in done], [
+            (OrderStatus.ASSIGNED, dispatcher.id), (OrderStatus.IN_PROGRESS, master.id), (OrderStatus.DONE, master.id),
+        ])
+
+    def test_compare_to_baseline_flags_regressions(self):
+        baseline = {"endpoints": {"create_order": {"p50": 10, "p95": 50, "p99": 100, "throughput": 20, "errors": 0}}}
+        same = {"create_order": {"p50": 11, "p95": 55, "p99": 110, "throughput": 18, "errors": 0},
+                "new_endpoint": {"p50": 999, "p95": 999, "p99": 999, "throughput": 1, "errors": 0}}
+        self.assertEqual(benchmarks.compare_to_baseline(same, baseline, tolerance=0.2), [])
+
+        worse = {"create_order": {"p50": 10, "p95": 80, "p99": 100, "throughput": 10, "errors": 2}}
+        self.assertEqual(benchmarks.compare_to_baseline(worse, baseline, tolerance=0.2), [
+            ("create_order", "p95", 50, 80), ("create_order", "throughput", 20, 10), ("create_order", "errors", 0, 2),
+        ])
+
+    def test_summarize_percentiles(self):
+        summary = benchmarks.summarize([float(ms) for ms in range(1, 101)], elapsed=2.0)
+        self.assertEqual(summary, {"requests": 100, "throughput": 50.0, "p50": 50.0, "p95": 95.0, "p99": 99.0})
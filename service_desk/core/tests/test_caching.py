@@ -0,0 +1,119 @@
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import auth, caching
+from ..models import Order, User
+from ..services import assign_master
+from ..templatetags.fragments import template_revision
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        for backend in caches.all():
+            backend.clear()
+        caching.reset_stats()
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master", first_name="Пётр")
+        self.order = Order.objects.create(category="Сантехника", description="Течет кран", customer_name="Иван",
+                                          customer_contact="+79990000000")
+        self.client.force_login(self.dispatcher)
+
+    def get_list(self):
+        return self.client.get(reverse("dispatcher_orders"))
+
+    def test_second_render_is_served_from_cache(self):
+        self.get_list()
+        self.assertEqual(caching.stats()["fragments"], {"hit": 0, "miss": 1})
+        self.assertEqual(caching.stats()["roster"], {"hit": 0, "miss": 1})
+        response = self.get_list()
+        self.assertContains(response, "Течет кран")
+        self.assertEqual(caching.stats()["fragments"], {"hit": 1, "miss": 1})
+        self.assertEqual(caching.stats()["roster"], {"hit": 1, "miss": 1})
+
+    def test_status_change_without_signals_rerenders_row(self):
+        self.get_list()
+        with self.captureOnCommitCallbacks(execute=True):
+            assign_master(self.order, self.dispatcher, self.master)
+        response = self.get_list()
+        self.assertContains(response, "Назначена")
+        self.assertContains(response, "Пётр")
+        self.assertEqual(caching.stats()["fragments"]["hit"], 0)
+
+    def test_order_save_and_master_rename_invalidate(self):
+        self.get_list()
+        self.order.address = "ул. Новая, д. 1"
+        self.order.save()
+        self.assertContains(self.get_list(), "ул. Новая")
+
+        self.master.first_name = "Павел"
+        self.master.save()
+        response = self.get_list()
+        self.assertContains(response, "Павел")
+        self.assertNotContains(response, "Пётр")
+        # Вход мастера (last_login) версию списка не меняет.
+        version = caching.roster_version()
+        self.client.force_login(self.master)
+        self.assertEqual(caching.roster_version(), version)
+
+    def test_row_template_compiled_once_and_stamped_with_revision(self):
+        self.get_list()
+        engine = engines["django"].engine
+        row = engine.get_template("dispatcher/_order_row.html")
+        self.assertIs(engine.get_template("dispatcher/_order_row.html"), row)  # TEMPLATE_PROFILE=production
+        stamp, html = caches["fragments"].get(caching.fragment_key("dispatcher_row", self.order.id))
+        self.assertEqual(stamp[-1], (caching.roster_version(), template_revision(row)))
+        self.assertIn(reverse("dispatcher_order_detail", args=[self.order.id]), html)
+
+        # Выкладка с другой разметкой строки: старая строка из кэша не отдаётся.
+        self.addCleanup(setattr, row, "row_revision", row.row_revision)
+        row.row_revision += 1
+        self.get_list()
+        self.assertEqual(caching.stats()["fragments"], {"hit": 0, "miss": 2})
+
+    def test_metrics_export_cache_counters(self):
+        self.get_list()
+        self.client.force_login(User.objects.create_user(username="admin", role="dispatcher", is_staff=True))
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('service_desk_cache_requests_total{cache="fragments",result="miss"} 1', body)
+        self.assertIn('service_desk_cache_requests_total{cache="roster",result="miss"} 1', body)
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        auth.clear()
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.client.force_login(self.dispatcher)
+
+    def new_count(self):
+        return self.client.get(reverse("dispatcher_new_count"))
+
+    def test_user_is_read_once_per_process(self):
+        with self.assertNumQueries(2):  # сессия и пользователь
+            self.assertEqual(self.new_count().status_code, 200)
+        with self.assertNumQueries(1):  # только сессия
+            self.assertEqual(self.new_count().status_code, 200)
+
+        # Смена роли в этом процессе сбрасывает запись сразу.
+        self.dispatcher.role = "master"
+        self.dispatcher.save()
+        self.assertEqual(self.new_count().status_code, 403)
+
+    def test_password_change_elsewhere_applies_after_ttl(self):
+        self.new_count()
+        # Как если бы пароль сменили в другом процессе: сигнал сюда не дошёл.
+        User.objects.filter(id=self.dispatcher.id).update(password="!")
+        self.assertEqual(self.new_count().status_code, 200)  # копия в кэше ещё жива
+        with mock.patch("core.auth.time.monotonic", return_value=time.monotonic() + 3600):
+            self.assertEqual(self.new_count().status_code, 302)  # хеш сессии не совпал: выход
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_signed_cookie_sessions_need_no_queries(self):
+        self.client.force_login(self.dispatcher)
+        self.new_count()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.new_count().json(), {"new_count": 0})
@@ -0,0 +1,124 @@
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import counters, realtime
+from ..models import Order, OrderStatus, User
+from ..services import assign_master, cancel_order, complete_order, register_new_order, start_order
+
+
+class NewOrderCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master")
+
+    def submit(self, description="Течет кран"):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("create_order"), {
+                "category": "Сантехника", "description": description, "address": "Москва",
+                "customer_name": "Иван", "customer_contact": "+79990000000",
+            })
+        return Order.objects.latest("id")
+
+    def test_counter_follows_transitions_without_count_queries(self):
+        self.assertEqual(realtime.get_new_count(), 0)
+        first, second = self.submit(), self.submit("Течет кран на кухне")
+        with self.assertNumQueries(0):
+            self.assertEqual(realtime.get_new_count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assign_master(first, self.dispatcher, self.master)
+            cancel_order(second, self.dispatcher)
+        self.assertEqual(realtime.get_new_count(), 0)
+
+    def test_long_poll_returns_changed_value(self):
+        self.submit()
+        self.client.login(username="disp", password="123")
+        response = self.client.get(reverse("dispatcher_new_count_stream"), {"since": 0})
+        self.assertEqual(response.json()["new_count"], 1)
+
+    def test_long_poll_does_not_wait_under_wsgi(self):
+        self.client.login(username="disp", password="123")
+        started = time.monotonic()
+        response = self.client.get(reverse("dispatcher_new_count_stream"), {"since": 0})
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.json(), {"new_count": 0, "retry": realtime.WSGI_POLL_INTERVAL})
+
+    def test_event_stream_is_refused_under_wsgi(self):
+        # Под WSGI async-поток был бы собран целиком до отправки: 204, клиент уходит на long-poll.
+        self.client.login(username="disp", password="123")
+        response = self.client.get(reverse("dispatcher_new_count_stream"), HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response.status_code, 204)
+
+    def test_stream_is_dispatcher_only(self):
+        self.client.login(username="mast", password="123")
+        response = self.client.get(reverse("dispatcher_new_count_stream"))
+        self.assertEqual(response.status_code, 403)
+
+
+class OrderCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()  # таблицы длительностей страницы статистики (core.analytics)
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master")
+
+    def new_order(self, category="Сантехника"):
+        order = Order(category=category, description="Течет кран", customer_name="Иван",
+                      customer_contact="+79990000000")
+        register_new_order(order)
+        return order
+
+    def totals(self):
+        return {row["status"]: row["count"] for row in counters.status_totals()}
+
+    def test_transitions_move_counters(self):
+        first, second = self.new_order(), self.new_order("Электрика")
+        assign_master(first, self.dispatcher, self.master)
+        start_order(first, self.master)
+        complete_order(first, self.master)
+        cancel_order(second, self.dispatcher)
+
+        self.assertEqual(self.totals(), {OrderStatus.DONE: 1, OrderStatus.CANCELLED: 1})
+        self.assertEqual(counters.rebuild(dry_run=True), {})
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        self.new_order()
+        Order.objects.update(status=OrderStatus.IN_PROGRESS)  # в обход сервисов
+
+        out = StringIO()
+        call_command("reconcile_order_counters", stdout=out)
+        self.assertIn("Расхождений: 6", out.getvalue())
+        self.assertEqual(self.totals(), {OrderStatus.IN_PROGRESS: 1})
+
+    def test_counter_rows_updated_in_global_order(self):
+        # Встречные переходы должны блокировать строки в одном порядке.
+        first, second = self.new_order(), self.new_order()
+        assign_master(first, self.dispatcher, self.master)
+        cancel_order(second, self.dispatcher)
+        orders = {OrderStatus.ASSIGNED: first, OrderStatus.CANCELLED: second}
+        for old, new in [(OrderStatus.ASSIGNED, OrderStatus.CANCELLED), (OrderStatus.CANCELLED, OrderStatus.ASSIGNED)]:
+            with mock.patch.object(counters, "_upsert") as upsert:
+                counters.record_transition(orders[old], old, new)
+            keys = [row[:3] for row in upsert.call_args.args[0]]
+            self.assertEqual(keys, sorted(keys))
+
+    def test_transition_writes_counters_in_one_query(self):
+        order = self.new_order()
+        with self.assertNumQueries(1):
+            counters.record_transition(order, OrderStatus.NEW, OrderStatus.ASSIGNED)
+        with self.assertNumQueries(1):
+            counters.record_transition(order, OrderStatus.ASSIGNED, OrderStatus.CANCELLED)  # новые строки
+        self.assertEqual(self.totals(), {OrderStatus.CANCELLED: 1})
+
+    def test_stats_page_reads_counters(self):
+        self.new_order()
+        self.client.login(username="disp", password="123")
+        with self.assertNumQueries(8):  # сессия, пользователь, пять чтений OrderCounter и свёртки
+            response = self.client.get(reverse("order_stats"))
+        self.assertEqual(list(response.context["order_counts"]), [{"status": "new", "count": 1}])
@@ -0,0 +1,26 @@
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ..db import apply_sqlite_pragmas
+from ..models import Order
+
+
+class SqlitePragmaTests(TestCase):
+    @override_settings(SQLITE_PRAGMAS={"busy_timeout": 1234})
+    def test_pragmas_applied_on_connect(self):
+        apply_sqlite_pragmas(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 1234)
+
+
+class ImmediateTransactionTests(TransactionTestCase):
+    """Транзакция сразу берёт блокировку записи, а не повышает её на INSERT."""
+
+    def test_atomic_starts_with_begin_immediate(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with transaction.atomic():
+                Order.objects.create(category="Сантехника", description="x",
+                                     customer_name="Иван", customer_contact="+79990000000")
+        self.assertEqual(ctx.captured_queries[0]["sql"], "BEGIN IMMEDIATE")
@@ -0,0 +1,94 @@
+import csv
+import io
+import itertools
+import tempfile
+import zipfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import archive, exports
+from ..models import Order, OrderStatus, User
+from ..services import assign_master, register_new_order
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master")
+        self.orders = []
+        for i in range(3):
+            order = Order(category="Сантехника", description=f"Заявка {i}; «кавычки»", customer_name="Иван",
+                          customer_contact="+79990000000")
+            register_new_order(order)
+            self.orders.append(order)
+        assign_master(self.orders[0], self.dispatcher, self.master)
+        # Третья заявка — вне периода выгрузки.
+        Order.objects.filter(id=self.orders[2].id).update(created_at=timezone.now() - timezone.timedelta(days=40))
+        self.client.force_login(self.dispatcher)
+
+    def download(self, **params):
+        response = self.client.get(reverse("dispatcher_export"), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_csv_filters_by_period_and_status(self):
+        today = timezone.localdate().isoformat()
+        body = self.download(date_from=today, date_to=today).decode("utf-8-sig")
+        lines = list(csv.reader(body.splitlines(), delimiter=";"))
+        self.assertEqual(lines[0][:4], ["ID", "Создана", "Категория", "Статус"])
+        self.assertEqual([int(row[0]) for row in lines[1:]], [self.orders[0].id, self.orders[1].id])
+        self.assertEqual(lines[1][3], "Назначена")
+        self.assertEqual(lines[2][7], "Заявка 1; «кавычки»")
+
+        body = self.download(kind="history", status=OrderStatus.ASSIGNED).decode("utf-8-sig")
+        rows = list(csv.reader(body.splitlines(), delimiter=";"))[1:]
+        self.assertEqual([(int(r[1]), r[4], r[5]) for r in rows], [(self.orders[0].id, "Назначена", "disp")])
+
+    def test_csv_neutralizes_formulas_but_keeps_phones(self):
+        body = b"".join(exports.csv_chunks([
+            ["=HYPERLINK(\"http://evil\")", "+79990000000", "-1+cmd|' /C calc'!A0", "@SUM(A1)", "Иван", 5],
+        ])).decode("utf-8-sig")
+        row = next(csv.reader(body.splitlines(), delimiter=";"))
+        self.assertEqual(row, ["'=HYPERLINK(\"http://evil\")", "+79990000000", "'-1+cmd|' /C calc'!A0",
+                               "'@SUM(A1)", "Иван", "5"])
+
+    def test_xlsx_is_valid_workbook(self):
+        body = self.download(format="xlsx")
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            self.assertIn("xl/workbook.xml", archive.namelist())
+            sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+        self.assertEqual(sheet.count("<row>"), 4)
+        self.assertIn("Заявка 1; «кавычки»", sheet)
+
+    def test_chunks_are_produced_lazily(self):
+        # Бесконечный источник строк: куски должны отдаваться, не дожидаясь конца.
+        endless = ([i, "строка"] for i in itertools.count())
+        for chunks in (exports.csv_chunks, exports.xlsx_chunks):
+            with self.subTest(chunks.__name__):
+                first = next(chunks(endless))
+                self.assertTrue(first)
+
+    def test_background_job_writes_file_and_reports_progress(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(EXPORT_ROOT=root):
+            response = self.client.get(reverse("dispatcher_export"), {"background": 1, "format": "csv"})
+            self.assertEqual(response.status_code, 202)
+            job = response.json()
+            status = self.client.get(job["status_url"]).json()
+            self.assertEqual(status, {"state": "done", "done": 3, "total": 3})
+
+            path = exports.progress(job["job_id"])["path"]
+            with open(path, encoding="utf-8-sig") as f:
+                self.assertEqual(len(f.read().splitlines()), 4)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as root:
+            out = StringIO()
+            call_command("export_orders", "orders", "--format", "xlsx", "--output", f"{root}/o.xlsx",
+                         stdout=out, stderr=StringIO())
+            self.assertIn("Выгружено строк: 3", out.getvalue())
+            self.assertTrue(zipfile.is_zipfile(f"{root}/o.xlsx"))
@@ -0,0 +1,127 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import geo
+from ..models import GeocodedAddress, Order, OrderStatus, User
+
+
+class GeoTests(TestCase):
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master")
+
+    def make(self, address, status=OrderStatus.NEW, **fields):
+        order = Order(category="Сантехника", description="Течет кран", customer_name="Иван",
+                      customer_contact="+79990000000", address=address, status=status, **fields)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        geo.locate_pending()  # как geocode_pending_orders по расписанию
+        order.refresh_from_db()
+        return order
+
+    def test_geohash_and_neighbours(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        cells = geo.neighbours(55.75, 37.62, 6)
+        self.assertEqual(len(cells), 9)
+        self.assertIn(geo.encode(55.75, 37.62, 6), cells)
+        self.assertEqual(geo.precision_for(2, 55.75), 5)
+        self.assertAlmostEqual(geo.distance_km((55.75, 37.62), (55.76, 37.62)), 1.11, places=2)
+
+    def test_new_order_is_geocoded_through_persistent_cache(self):
+        order = self.make("ул. Мира, д. 7, кв. 3")
+        self.assertEqual((order.lat, order.lon), (55.7815, 37.6336))  # по улице из справочника
+        self.assertEqual(order.geohash, geo.encode(55.7815, 37.6336))
+        self.assertEqual(GeocodedAddress.objects.get().query, "ул мира д 7 кв 3")
+
+        with mock.patch.object(geo.GazetteerGeocoder, "geocode", return_value=None) as geocode:
+            again = self.make("Ул. Мира,  д. 7, кв. 3")
+            missing = self.make("Неизвестная ул.")
+        self.assertEqual(geocode.call_count, 1)  # только для нового адреса
+        self.assertEqual(again.geohash, order.geohash)
+        self.assertIsNotNone(missing.geocoded_at)
+
+        # Смена адреса сбрасывает координаты, и следующий прогон находит новые.
+        order.address = "ул. Ленина, д. 1"
+        order.save()
+        order.refresh_from_db()
+        self.assertIsNone(order.geocoded_at)
+        geo.locate_pending()
+        order.refresh_from_db()
+        self.assertEqual((order.lat, order.lon), (55.7520, 37.6170))
+
+    def test_saving_without_broker_does_not_geocode(self):
+        with mock.patch("core.tasks.geocode_orders.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                order = Order.objects.create(category="Сантехника", description="Течет кран", customer_name="Иван",
+                                             customer_contact="+79990000000", address="ул. Мира, д. 1")
+        delay.assert_not_called()
+        order.refresh_from_db()
+        self.assertIsNone(order.geocoded_at)
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=False)
+    def test_broker_outage_does_not_fail_save(self):
+        with mock.patch("core.tasks.geocode_orders.delay", side_effect=OSError("connection refused")) as delay:
+            with self.assertLogs("core.geo", "ERROR"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    order = Order.objects.create(category="Сантехника", description="Течет кран",
+                                                 customer_name="Иван", customer_contact="+79990000000",
+                                                 address="ул. Мира, д. 1")
+        delay.assert_called_once_with([order.id])
+        self.assertEqual(geo.locate_pending(), 1)
+
+    def test_locate_skips_order_whose_address_changed_meanwhile(self):
+        order = Order.objects.create(category="Сантехника", description="Течет кран", customer_name="Иван",
+                                     customer_contact="+79990000000", address="ул. Мира, д. 1")
+        geocode_many = geo.geocode_many
+
+        def edit_during_geocoding(addresses, geocoder=None):
+            Order.objects.filter(id=order.id).update(address="ул. Ленина, д. 1")
+            return geocode_many(addresses, geocoder)
+
+        with mock.patch.object(geo, "geocode_many", side_effect=edit_during_geocoding):
+            self.assertEqual(geo.locate([order.id]), 0)
+        order.refresh_from_db()
+        self.assertIsNone(order.geocoded_at)  # остаётся в очереди под новым адресом
+
+    def test_unexpected_provider_response_does_not_abort_batch(self):
+        response = io.BytesIO(b'{"statusCode": 403, "error": "Forbidden"}')
+        with mock.patch("urllib.request.urlopen", return_value=response), self.assertLogs("core.geo", "WARNING"):
+            self.assertEqual(geo.geocode_many(["ул. Мира, д. 1"], geo.YandexGeocoder()), {})
+        self.assertFalse(GeocodedAddress.objects.exists())
+
+    def test_nearby_new_orders_use_geohash_cells(self):
+        center = self.make("ул. Мира, д. 1")
+        near = self.make("ул. Мира, д. 10")
+        self.make("ул. Гагарина, д. 3")  # ~9 км
+        self.make("ул. Мира, д. 1", status=OrderStatus.ASSIGNED)
+        found = geo.nearby_new_orders(center.lat, center.lon, radius_km=2, exclude=center.id)
+        self.assertEqual([o.id for _, o in found], [near.id])
+
+        self.client.force_login(self.dispatcher)
+        response = self.client.get(reverse("dispatcher_order_detail", args=[center.id]))
+        self.assertContains(response, "Новые заявки рядом")
+        self.assertContains(response, "pt=37.633,55.7822")
+
+    def test_master_route_visits_nearest_orders_first(self):
+        day = timezone.localdate()
+        at = timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.min.time()))
+        # По плановому времени: Ленина, Гагарина, Мира — в таком порядке петля через весь город.
+        for hours, address in [(9, "ул. Ленина, д. 1"), (10, "ул. Гагарина"), (11, "ул. Советская"),
+                               (12, "ул. Мира"), (13, "нет такого адреса")]:
+            self.make(address, status=OrderStatus.ASSIGNED, assigned_master=self.master,
+                      planned_date=at + timedelta(hours=hours))
+        stops, total = geo.master_route(self.master, day)
+        self.assertEqual([o.address for o, _ in stops],
+                         ["ул. Ленина, д. 1", "ул. Мира", "ул. Советская", "ул. Гагарина", "нет такого адреса"])
+        by_time = geo._path_length([(o.lat, o.lon) for o in geo.master_day_orders(self.master, day) if o.lat])
+        self.assertLess(total, by_time)
+
+        self.client.force_login(self.master)
+        response = self.client.get(reverse("master_route"), {"date": day.isoformat()})
+        self.assertContains(response, "rtext=")
+        self.assertContains(response, "нет координат")
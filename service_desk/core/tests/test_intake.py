@@ -0,0 +1,47 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import intake
+from ..models import Order
+
+
+@override_settings(INTAKE_RATE_LIMITS={"ip": (3, 3600), "contact": (2, 3600)}, INTAKE_DEDUP_WINDOW=600)
+class IntakeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def post(self, i=0, contact="+7 (999) 000-00-00", ip="10.0.0.1", **extra):
+        data = {"category": "Сантехника", "description": f"Течет кран {i}", "address": "Москва",
+                "customer_name": "Иван", "customer_contact": contact, **extra}
+        return self.client.post(reverse("create_order"), data, REMOTE_ADDR=ip)
+
+    def test_duplicate_returns_existing_order_without_insert(self):
+        first = self.post()
+        order = Order.objects.get()
+        with self.assertNumQueries(1):  # только чтение уже принятой заявки
+            again = self.post(contact="89990000000", description="  ТЕЧЕТ   кран 0 ")
+        self.assertRedirects(first, reverse("order_success", args=[order.id]))
+        self.assertRedirects(again, reverse("order_success", args=[order.id]), fetch_redirect_response=False)
+        self.assertEqual(Order.objects.count(), 1)
+        # Дубли не расходуют лимит контакта (ёмкость 2).
+        self.assertEqual(self.post(1).status_code, 302)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_rate_limit_per_contact_and_ip(self):
+        self.post(0), self.post(1)
+        response = self.post(2)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        self.assertContains(response, "Слишком много заявок", status_code=429)
+
+        self.post(3, contact="a@example.com")
+        self.assertEqual(self.post(4, contact="b@example.com").status_code, 429)  # IP: ёмкость 3
+        self.assertEqual(self.post(5, contact="b@example.com", ip="10.0.0.2").status_code, 302)
+        self.assertEqual(Order.objects.count(), 4)
+
+    def test_bucket_refills(self):
+        now = 1_000_000.0
+        self.assertEqual(intake.take_token("t", "k", 1, 60, now=now), 0)
+        self.assertAlmostEqual(intake.take_token("t", "k", 1, 60, now=now + 15), 45)
+        self.assertEqual(intake.take_token("t", "k", 1, 60, now=now + 61), 0)
@@ -0,0 +1,114 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import notifications
+from ..models import Order, OutboxMessage, User
+from ..services import assign_master, complete_order, start_order
+
+
+@override_settings(
+    SMS_BACKEND="core.notifications.LocmemSmsBackend",
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+)
+class NotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        notifications.LocmemSmsBackend.outbox = []
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="+79991112233", password="123", role="master")
+        self.order = Order.objects.create(category="Сантехника", description="Течет кран",
+                                          customer_name="Иван", customer_contact="ivan@example.com")
+
+    def test_without_broker_request_does_not_send(self):
+        # Eager-релей отправлял бы SMTP/SMS внутри запроса; вместо него — relay_outbox.
+        with self.captureOnCommitCallbacks(execute=True):
+            assign_master(self.order, self.dispatcher, self.master)
+        self.assertEqual(mail.outbox, [])
+        OutboxMessage.objects.update(available_at=timezone.now())
+        call_command("relay_outbox", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(notifications.LocmemSmsBackend.outbox[0][0], "+79991112233")
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=False)
+    def test_broker_outage_does_not_fail_request(self):
+        with mock.patch("core.tasks.relay_outbox.apply_async", side_effect=OSError("connection refused")):
+            with self.assertLogs("core.notifications", "ERROR"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    assign_master(self.order, self.dispatcher, self.master)
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.PENDING).count(), 2)
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=False)
+    def test_window_merges_events_per_recipient(self):
+        with mock.patch("core.tasks.relay_outbox.apply_async") as schedule, \
+                mock.patch("core.notifications.current_window", return_value=1):
+            with self.captureOnCommitCallbacks(execute=True):
+                assign_master(self.order, self.dispatcher, self.master)
+            with self.captureOnCommitCallbacks(execute=True):
+                start_order(self.order, self.master)
+            with self.captureOnCommitCallbacks(execute=True):
+                complete_order(self.order, self.master)
+        self.assertEqual(schedule.call_count, 1)
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.PENDING).count(), 4)
+
+        with mock.patch("core.notifications.get_connection", wraps=mail.get_connection) as connect:
+            self.assertEqual(notifications.relay(), 4)
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(len(mail.outbox[0].body.splitlines()), 3)
+        self.assertIn("@service-desk>", mail.outbox[0].extra_headers["Message-ID"])
+        self.assertEqual(len(notifications.LocmemSmsBackend.outbox), 1)
+        self.assertFalse(OutboxMessage.objects.exclude(status=OutboxMessage.SENT).exists())
+        self.assertEqual(notifications.relay(), 0)  # отправленное не уходит повторно
+
+    def test_relay_does_not_depend_on_web_process_cache(self):
+        # Воркер Celery с CELERY_BROKER_URL не видит locmem веб-процесса.
+        with mock.patch("core.tasks.relay_outbox.apply_async"):
+            with self.captureOnCommitCallbacks(execute=True):
+                assign_master(self.order, self.dispatcher, self.master)
+        cache.clear()
+        OutboxMessage.objects.update(available_at=timezone.now())
+        self.assertEqual(notifications.relay(), 2)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_rolled_back_transition_leaves_no_message(self):
+        with mock.patch("core.services.log_status_change", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                assign_master(self.order, self.dispatcher, self.master)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_BASE=30)
+    def test_failed_delivery_is_retried_with_backoff(self):
+        notifications.notify(self.order.id, "+79990000000", "Тест")
+        OutboxMessage.objects.update(available_at=timezone.now())
+        with mock.patch.object(notifications.LocmemSmsBackend, "send_messages", side_effect=OSError("timeout")):
+            self.assertEqual(notifications.relay(), 0)
+            message = OutboxMessage.objects.get()
+            self.assertEqual((message.status, message.attempts, message.last_error),
+                             (OutboxMessage.PENDING, 1, "timeout"))
+            self.assertGreater(message.available_at, timezone.now() + timedelta(seconds=25))
+            self.assertEqual(notifications.relay(), 0)  # повтор ещё не наступил
+
+            OutboxMessage.objects.update(available_at=timezone.now())
+            notifications.relay()
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.FAILED)
+        self.assertEqual(notifications.LocmemSmsBackend.outbox, [])
+
+    def test_claimed_batch_is_leased_to_one_worker(self):
+        for i in range(3):
+            notifications.notify(self.order.id, f"+7999000000{i}", "Тест")
+        OutboxMessage.objects.update(available_at=timezone.now())
+        first = notifications.claim(batch_size=2)
+        second = notifications.claim(batch_size=2)
+        self.assertEqual((len(first), len(second)), (2, 1))
+        self.assertFalse({m.id for m in first} & {m.id for m in second})
+        self.assertEqual(notifications.claim(), [])
+
+        lines = notifications.prometheus_lines()
+        self.assertIn('service_desk_outbox_messages{status="pending"} 3', lines)
@@ -0,0 +1,118 @@
+import threading
+import time
+
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Order, OrderHistory, OrderStatus, User
+from ..services import assign_master, bulk_assign, complete_order, register_new_order, start_order
+from ..transitions import TransitionConflict
+
+
+class AssignMasterTests(TestCase):
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master")
+        self.order = Order.objects.create(
+            category="Сантехника",
+            description="Течет кран",
+            address="Москва",
+            customer_name="Иван",
+            customer_contact="+79990000000",
+            status=OrderStatus.NEW
+        )
+
+    def test_assign_changes_status(self):
+        assign_master(self.order, self.dispatcher, self.master, planned_date=timezone.now())
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, OrderStatus.ASSIGNED)
+        self.assertEqual(self.order.assigned_master_id, self.master.id)
+        self.assertEqual(self.order.dispatcher_id, self.dispatcher.id)
+
+
+class BulkOperationTests(TestCase):
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master")
+        self.orders = []
+        for i in range(5):
+            order = Order(category="Сантехника", description=f"Заявка {i}", customer_name="Иван",
+                          customer_contact="+79990000000")
+            register_new_order(order)
+            self.orders.append(order)
+        Order.objects.filter(id=self.orders[0].id).update(status=OrderStatus.DONE)
+
+    def test_bulk_assign_reports_per_order_errors(self):
+        ids = [o.id for o in self.orders] + [999999]
+        # Число запросов не зависит от числа заявок: выборка с блокировкой,
+        # bulk_update, bulk_create истории, один upsert всех счётчиков
+        # и один INSERT уведомлений в outbox.
+        with self.assertNumQueries(7):
+            result = bulk_assign(ids, self.dispatcher, self.master)
+
+        self.assertEqual(result.updated, [o.id for o in self.orders[1:]])
+        self.assertEqual(set(result.errors), {self.orders[0].id, 999999})
+        self.assertEqual(Order.objects.filter(status=OrderStatus.ASSIGNED).count(), 4)
+        self.assertEqual(OrderHistory.objects.filter(new_status=OrderStatus.ASSIGNED).count(), 4)
+
+    def test_bulk_cancel_view(self):
+        self.client.login(username="disp", password="123")
+        response = self.client.post(reverse("dispatcher_bulk_action"), {
+            "action": "cancel", "order_ids": [o.id for o in self.orders[1:3]],
+        })
+        self.assertRedirects(response, reverse("dispatcher_orders"))
+        self.assertEqual(Order.objects.filter(status=OrderStatus.CANCELLED).count(), 2)
+
+
+class ConcurrentTransitionTests(TransactionTestCase):
+    """Параллельные клики: у каждого перехода ровно один победитель."""
+
+    THREADS = 8
+
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master")
+        self.order = Order.objects.create(category="Сантехника", description="Течет кран",
+                                          customer_name="Иван", customer_contact="+79990000000")
+
+    def race(self, action) -> list:
+        """Запустить action(свежая копия заявки) в нескольких потоках одновременно."""
+        barrier = threading.Barrier(self.THREADS)
+        outcomes = []
+
+        def worker():
+            barrier.wait()
+            try:
+                # Тестовая SQLite в памяти не ждёт блокировку, а сразу отвечает
+                # "table is locked" — повторяем, как повторил бы ожидающий сервер БД.
+                for _ in range(200):
+                    try:
+                        action(Order.objects.get(id=self.order.id))
+                        outcomes.append("ok")
+                        return
+                    except OperationalError:
+                        time.sleep(0.005)
+            except (TransitionConflict, ValueError, PermissionError) as e:
+                outcomes.append(type(e).__name__)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return outcomes
+
+    def test_exactly_one_winner_per_transition(self):
+        steps = [
+            ("assigned", lambda o: assign_master(o, self.dispatcher, self.master)),
+            ("in_progress", lambda o: start_order(o, self.master)),
+            ("done", lambda o: complete_order(o, self.master)),
+        ]
+        for status, action in steps:
+            outcomes = self.race(action)
+            self.assertEqual(outcomes.count("ok"), 1, outcomes)
+            self.assertEqual(OrderHistory.objects.filter(order=self.order, new_status=status).count(), 1)
@@ -0,0 +1,55 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Order, User
+from ..pagination import KeysetPaginator
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        for i in range(7):
+            Order.objects.create(
+                category="Электрика",
+                description=f"Заявка {i}",
+                customer_name="Иван",
+                customer_contact="+79990000000",
+            )
+        self.expected = list(Order.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+    def test_walk_forward_and_back(self):
+        paginator = KeysetPaginator(Order.objects.all(), per_page=3)
+        seen, page = [], paginator.get_page()
+        pages = [page]
+        seen += [o.id for o in page]
+        while page.has_next:
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+            seen += [o.id for o in page]
+        self.assertEqual(seen, self.expected)
+        self.assertFalse(pages[0].has_previous)
+
+        back = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual([o.id for o in back], [o.id for o in pages[-2]])
+
+    def test_invalid_cursor_gives_first_page(self):
+        page = KeysetPaginator(Order.objects.all(), per_page=3).get_page("не-курсор")
+        self.assertEqual([o.id for o in page], self.expected[:3])
+
+    def test_dispatcher_list_uses_cursor(self):
+        self.client.login(username="disp", password="123")
+        first = self.client.get(reverse("dispatcher_orders"))
+        self.assertEqual(first.status_code, 200)
+        page = first.context["page"]
+        self.assertFalse(page.has_next)
+        self.assertEqual([o.id for o in page.object_list], self.expected)
+
+
+class HotQueryIndexTests(TestCase):
+    def test_hot_queries_use_planned_indexes(self):
+        out = StringIO()
+        call_command("explain_order_queries", strict=True, stdout=out)
+        self.assertNotIn("РЕГРЕССИЯ", out.getvalue())
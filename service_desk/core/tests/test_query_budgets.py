@@ -0,0 +1,133 @@
+import tempfile
+
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import registry
+from ..models import Order, OrderHistory, OrderStatus, User
+from ..services import assign_master, register_new_order, start_order
+from ..testing import QueryBudgetMixin, core_url_names
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Каждый маршрут core укладывается в свой бюджет SQL-запросов."""
+
+    def setUp(self):
+        cache.clear()
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master")
+        self.orders = []
+        for i in range(3):
+            order = Order(category="Сантехника", description=f"Заявка {i}", customer_name="Иван",
+                          customer_contact="+79990000000")
+            register_new_order(order)
+            self.orders.append(order)
+        for order in self.orders[:2]:
+            assign_master(order, self.dispatcher, self.master)
+        start_order(self.orders[1], self.master)
+
+    def check(self, url_name, *args, method="get", data=None, user=None):
+        if user:
+            self.client.force_login(user)
+        response = getattr(self.client, method)(reverse(url_name, args=args), data or {})
+        self.assertLess(response.status_code, 400, url_name)
+        self.assertIn("Server-Timing", response)
+        self.assertQueryBudget(response, url_name)
+        self.checked.add(url_name)
+        return response
+
+    def test_every_core_url_within_budget(self):
+        self.checked = set()
+        order, assigned, started = self.orders[2], self.orders[0], self.orders[1]
+        self.check("create_order")
+        self.check("order_success", order.id)
+        self.check("metrics")
+
+        self.check("order_list", user=self.dispatcher)
+        self.check("order_stats")
+        self.check("dispatcher_orders")
+        self.check("dispatcher_new_count")
+        self.check("dispatcher_new_count_stream", data={"since": -1})
+        self.check("dispatcher_order_detail", order.id)
+        self.check("assign_order", order.id, method="post", data={"master_id": self.master.id})
+        self.check("dispatcher_bulk_action", method="post", data={"action": "cancel", "order_ids": [order.id]})
+        self.check("dispatcher_export", data={"format": "csv"})
+        with tempfile.TemporaryDirectory() as root, override_settings(EXPORT_ROOT=root):
+            job_id = self.client.get(reverse("dispatcher_export"), {"background": 1}).json()["job_id"]
+            self.check("dispatcher_export_status", job_id)
+
+        self.check("master_orders", user=self.master)
+        self.check("master_order_detail", assigned.id)
+        self.check("master_route")
+        self.check("master_start", assigned.id, method="post")
+        self.check("master_complete", started.id, method="post")
+        self.check("api_master_orders")
+        self.check("api_master_order_detail", started.id)
+
+        self.assertEqual(self.checked, core_url_names())
+
+    def test_metrics_endpoint_exports_prometheus_text(self):
+        registry.reset()
+        self.client.get(reverse("create_order"))
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('service_desk_requests_total{view="create_order",method="GET",status="200"} 1', body)
+        self.assertIn('service_desk_db_queries_total{view="create_order"} 0', body)
+
+
+class QueryCountScalingTests(QueryBudgetMixin, TestCase):
+    """Число запросов не зависит от длины истории и количества строк в списке."""
+
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher")
+        self.master = User.objects.create_user(username="mast", password="123", role="master")
+        self.order = self.make_order(self.master)
+
+    def make_order(self, master):
+        return Order.objects.create(category="Сантехника", description="Течет кран", customer_name="Иван",
+                                    customer_contact="+79990000000", status=OrderStatus.ASSIGNED,
+                                    assigned_master=master)
+
+    def add_history(self, count):
+        # У каждой записи свой автор: ленивый changed_by дал бы по запросу на строку.
+        authors = [User.objects.create_user(username=f"author{OrderHistory.objects.count() + i}", role="dispatcher")
+                   for i in range(count)]
+        OrderHistory.objects.bulk_create([
+            OrderHistory(order=self.order, changed_by=a, old_status=OrderStatus.NEW,
+                         new_status=OrderStatus.ASSIGNED, comment="повтор")
+            for a in authors
+        ])
+
+    def queries(self, url_name, *args, user):
+        # Сравниваются холодные запросы: тёплый кэш мастеров/строк дал бы меньше.
+        for backend in caches.all():
+            backend.clear()
+        self.client.force_login(user)
+        response = self.client.get(reverse(url_name, args=args))
+        self.assertEqual(response.status_code, 200)
+        return self.assertQueryBudget(response, url_name).queries
+
+    def test_detail_views_do_not_grow_with_history(self):
+        for url_name, user in [("dispatcher_order_detail", self.dispatcher), ("master_order_detail", self.master)]:
+            with self.subTest(url_name):
+                self.add_history(1)
+                short = self.queries(url_name, self.order.id, user=user)
+                self.add_history(30)
+                self.assertEqual(self.queries(url_name, self.order.id, user=user), short)
+
+    def test_lists_do_not_grow_with_rows(self):
+        cases = [("order_list", self.dispatcher), ("dispatcher_orders", self.dispatcher),
+                 ("master_orders", self.master)]
+        for url_name, user in cases:
+            with self.subTest(url_name):
+                few = self.queries(url_name, user=user)
+                for i in range(10):
+                    master = User.objects.create_user(username=f"m_{url_name}_{i}", role="master")
+                    self.make_order(self.master if url_name == "master_orders" else master)
+                self.assertEqual(self.queries(url_name, user=user), few)
+
+    def test_history_shows_author(self):
+        self.add_history(2)
+        self.client.force_login(self.dispatcher)
+        response = self.client.get(reverse("dispatcher_order_detail", args=[self.order.id]))
+        self.assertContains(response, "author", count=2)
@@ -0,0 +1,59 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Order, User
+
+
+class OrderSearchTests(TestCase):
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(username="disp", password="123", role="dispatcher",
+                                                   is_staff=True, is_superuser=True)
+        self.leak = self.make("Сантехника", "Течёт кран на кухне", "ул. Садовая, д. 5", "Иван", "+79991112233")
+        self.light = self.make("Электрика", "Нет света в комнате", "ул. Мира, д. 1", "Пётр", "petr@example.com")
+
+    def make(self, category, description, address, name, contact):
+        return Order.objects.create(category=category, description=description, address=address,
+                                    customer_name=name, customer_contact=contact)
+
+    def find(self, q):
+        return set(search.search_orders(Order.objects.all(), q).values_list("id", flat=True))
+
+    def test_word_forms_case_and_yo(self):
+        self.assertEqual(self.find("кухня"), {self.leak.id})
+        self.assertEqual(self.find("ТЕЧЕТ КРАН"), {self.leak.id})
+        self.assertEqual(self.find("пётр"), {self.light.id})
+        self.assertEqual(self.find("садовой"), {self.leak.id})
+
+    def test_contacts_and_all_words_required(self):
+        self.assertEqual(self.find("+7999111"), {self.leak.id})
+        self.assertEqual(self.find("petr@example.com"), {self.light.id})
+        self.assertEqual(self.find("кран света"), set())
+        self.assertEqual(self.find("  "), {self.leak.id, self.light.id})
+
+    def test_short_words_narrow_instead_of_being_dropped(self):
+        self.assertEqual(self.find("ул Мира"), {self.light.id})
+        self.assertEqual(self.find("Нет света"), {self.light.id})
+        self.assertEqual(self.find("ли кран"), set())
+        self.assertEqual(self.find("Ли"), set())
+        self.assertEqual(self.find("д. 5"), {self.leak.id})
+
+    def test_index_follows_updates_and_deletes(self):
+        Order.objects.filter(id=self.leak.id).update(address="пр. Гагарина, д. 10")
+        self.assertEqual(self.find("Гагарина"), {self.leak.id})
+        self.assertEqual(self.find("Садовая"), set())
+        self.light.delete()
+        self.assertEqual(self.find("света"), set())
+
+    def test_dispatcher_orders_and_admin_use_index(self):
+        self.client.force_login(self.dispatcher)
+        response = self.client.get(reverse("dispatcher_orders"), {"q": "кран"})
+        self.assertEqual([o.id for o in response.context["page"].object_list], [self.leak.id])
+        self.assertContains(response, 'value="кран"')
+
+        response = self.client.get(reverse("admin:core_order_changelist"), {"q": "света"})
+        self.assertEqual([o.id for o in response.context["cl"].result_list], [self.light.id])
+        response = self.client.get(reverse("admin:core_order_changelist"), {"q": "ул"})
+        self.assertEqual(len(response.context["cl"].result_list), 2)
+        response = self.client.get(reverse("admin:core_order_changelist"), {"q": "Ли"})
+        self.assertEqual(list(response.context["cl"].result_list), [])
@@ -0,0 +1,69 @@
+import gzip
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import staticfiles
+from ..models import User
+
+
+class StaticFilesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.TemporaryDirectory()
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.root.name))
+        call_command("collectstatic", interactive=False, verbosity=0, ignore_patterns=["admin/*"])
+        with open(settings.BASE_DIR / "static" / "core" / "master.js", "rb") as f:
+            cls.source = f.read()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.root.cleanup()
+
+    def setUp(self):
+        staticfiles.clear()
+        self.addCleanup(staticfiles.clear)
+
+    def get(self, url, **headers):
+        response = self.client.get(url, headers=headers)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_templates_link_fingerprinted_files(self):
+        master = User.objects.create_user(username="mast", password="123", role="master")
+        self.client.force_login(master)
+        hashed = staticfiles_storage.url("core/master.js")
+        self.assertRegex(hashed, r"^/static/core/master\.[0-9a-f]{12}\.js$")
+        self.assertContains(self.client.get(reverse("master_orders")), f'src="{hashed}"')
+
+    def test_fingerprinted_file_is_precompressed_and_immutable(self):
+        url = staticfiles_storage.url("core/master.js")
+        response, body = self.get(url, accept_encoding="gzip, deflate, br;q=0")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(gzip.decompress(body), self.source)
+
+        response, body = self.get(url)
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(body, self.source)
+        self.assertTrue(response["Content-Type"].endswith("; charset=utf-8"))
+
+    @override_settings(STATIC_MAX_AGE=60)
+    def test_unhashed_name_revalidates_with_etag(self):
+        response, _ = self.get("/static/core/master.js")
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        response, body = self.get("/static/core/master.js", if_none_match=response["ETag"])
+        self.assertEqual((response.status_code, body), (304, b""))
+        self.assertEqual(self.client.get("/static/core/missing.js").status_code, 404)
+
+    def test_accept_encoding_parsing(self):
+        self.assertEqual(staticfiles.accepted_encodings("gzip;q=0, br; q=0.5, identity"), {"br", "identity"})
+        self.assertEqual(staticfiles.accepted_encodings(""), set())
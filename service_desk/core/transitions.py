@@ -0,0 +1,65 @@
+"""
+Таблица допустимых переходов статуса заявки.
+
+Проверка и запись перехода выполняются одним условным UPDATE
+(см. services.apply_transition), поэтому таблица — единственное место,
+где описано, из каких статусов и кем возможен переход.
+"""
+from dataclasses import dataclass
+
+from .models import OrderStatus
+
+
+class TransitionConflict(ValueError):
+    """Статус заявки изменился параллельно — переход уже выполнил кто-то другой."""
+
+
+@dataclass(frozen=True)
+class Transition:
+    name: str
+    sources: tuple
+    target: str
+    roles: tuple
+    error: str
+    role_error: str = "Недостаточно прав для смены статуса."
+    # Мастер может выполнить переход только по своей заявке.
+    own_orders_only: bool = False
+
+
+TRANSITIONS = {
+    t.name: t for t in [
+        Transition(
+            name="assign",
+            sources=(OrderStatus.NEW, OrderStatus.CANCELLED),
+            target=OrderStatus.ASSIGNED,
+            roles=("dispatcher",),
+            error="Назначение возможно только для новой или отмененной заявки.",
+            role_error="Только диспетчер может назначать мастера.",
+        ),
+        Transition(
+            name="start",
+            sources=(OrderStatus.ASSIGNED,),
+            target=OrderStatus.IN_PROGRESS,
+            roles=("master",),
+            error="Перевод в 'В работе' возможен только из статуса 'Назначена'.",
+            role_error="Начать работу может только мастер.",
+            own_orders_only=True,
+        ),
+        Transition(
+            name="complete",
+            sources=(OrderStatus.IN_PROGRESS,),
+            target=OrderStatus.DONE,
+            roles=("master", "dispatcher"),
+            error="Завершение возможно только из статуса 'В работе'.",
+            own_orders_only=True,
+        ),
+        Transition(
+            name="cancel",
+            sources=(OrderStatus.NEW, OrderStatus.ASSIGNED, OrderStatus.IN_PROGRESS, OrderStatus.CANCELLED),
+            target=OrderStatus.CANCELLED,
+            roles=("dispatcher",),
+            error="Нельзя отменить завершенную заявку.",
+            role_error="Только диспетчер может отменять заявки.",
+        ),
+    ]
+}
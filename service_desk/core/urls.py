@@ -1,26 +1,54 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from .views import OrderListView, AssignOrderView, StatsView
 
-urlpatterns = [
-    # Public
-    path("order/new/", views.create_order, name="create_order"),
-    path("order/success/<int:order_id>/", views.order_success, name="order_success"),
-
-    # CBV примеры
-    path("orders/", OrderListView.as_view(), name="order_list"),
-    path("orders/<int:pk>/assign/", AssignOrderView.as_view(), name="assign_order"),
-    path("analytics/stats/", StatsView.as_view(), name="order_stats"),
-
-    # Dispatcher
-    path("dispatcher/", views.dispatcher_orders, name="dispatcher_orders"),
-    path("dispatcher/new_count/", views.dispatcher_new_count, name="dispatcher_new_count"),
-    path("dispatcher/order/<int:order_id>/", views.dispatcher_order_detail, name="dispatcher_order_detail"),
-
-    # Master
-    path("master/", views.master_orders, name="master_orders"),
-    path("master/order/<int:order_id>/", views.master_order_detail, name="master_order_detail"),
-    path("master/order/<int:order_id>/start/", views.master_start, name="master_start"),
-    path("master/order/<int:order_id>/complete/", views.master_complete, name="master_complete"),
-]
+
+def build_urlpatterns(async_views: bool) -> list:
+    """
+    Маршруты core. async_views (settings.ASYNC_VIEWS, под ASGI) — частые
+    точки на async-версиях представлений, иначе синхронные.
+    """
+    frequent = {
+        "order_success": views.aorder_success if async_views else views.order_success,
+        "dispatcher_new_count": views.adispatcher_new_count if async_views else views.dispatcher_new_count,
+        "master_start": views.amaster_start if async_views else views.master_start,
+        "master_complete": views.amaster_complete if async_views else views.master_complete,
+    }
+    return [
+        # Public
+        path("order/new/", views.create_order, name="create_order"),
+        path("order/success/<int:order_id>/", frequent["order_success"], name="order_success"),
+
+        # CBV примеры
+        path("orders/", OrderListView.as_view(), name="order_list"),
+        path("orders/<int:pk>/assign/", AssignOrderView.as_view(), name="assign_order"),
+        path("analytics/stats/", StatsView.as_view(), name="order_stats"),
+
+        # Dispatcher
+        path("dispatcher/", views.dispatcher_orders, name="dispatcher_orders"),
+        path("dispatcher/new_count/", frequent["dispatcher_new_count"], name="dispatcher_new_count"),
+        path("dispatcher/new_count/stream/", views.dispatcher_new_count_stream, name="dispatcher_new_count_stream"),
+        path("dispatcher/bulk/", views.dispatcher_bulk_action, name="dispatcher_bulk_action"),
+        path("dispatcher/export/", views.dispatcher_export, name="dispatcher_export"),
+        path("dispatcher/export/<str:job_id>/", views.dispatcher_export_status, name="dispatcher_export_status"),
+        path("dispatcher/order/<int:order_id>/", views.dispatcher_order_detail, name="dispatcher_order_detail"),
+
+        # Master
+        path("master/", views.master_orders, name="master_orders"),
+        path("master/route/", views.master_route, name="master_route"),
+        path("master/order/<int:order_id>/", views.master_order_detail, name="master_order_detail"),
+        path("master/order/<int:order_id>/start/", frequent["master_start"], name="master_start"),
+        path("master/order/<int:order_id>/complete/", frequent["master_complete"], name="master_complete"),
+
+        # Master JSON API (мобильный клиент)
+        path("api/master/orders/", views.api_master_orders, name="api_master_orders"),
+        path("api/master/orders/<int:order_id>/", views.api_master_order_detail, name="api_master_order_detail"),
+
+        # Metrics
+        path("metrics", views.metrics_view, name="metrics"),
+    ]
+
+
+urlpatterns = build_urlpatterns(settings.ASYNC_VIEWS)
 
@@ -2,17 +2,37 @@ from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.paginator import Paginator
-from django.db.models import Count
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponseBadRequest
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import prefetch_related_objects
+from django.http import (
+    Http404, HttpResponse, JsonResponse, HttpResponseForbidden, HttpResponseBadRequest, StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.views import View
 from django.views.generic import ListView, TemplateView
 
-from .forms import PublicOrderForm, AssignOrderForm, OrderForm
-from .models import Order, OrderStatus, User
-from .services import assign_master, start_order, complete_order
+from .assignment import auto_assign, auto_assign_batch
+from .forms import PublicOrderForm, AssignOrderForm, AutoAssignForm, OrderForm, BulkActionForm, ExportForm
+from .metrics import registry
+from .models import LifecycleRollup, Order, OrderHistory, OrderStatus, User
+from .pagination import KeysetPaginator
+from .queries import (
+    archived_order_detail_qs, dispatcher_orders_qs, history_prefetch, master_active_orders_qs,
+    master_open_orders_qs, order_detail_qs, order_list_qs,
+)
+from .search import search_orders
+from .tasks import export_orders_job
+from .services import (
+    assign_master, start_order, complete_order, cancel_order, bulk_assign, bulk_cancel,
+    astart_order, acomplete_order,
+)
+from . import analytics, auth, caching, counters, exports, geo, intake, notifications, realtime, sync
 
 # ---------- Auth ----------
 
@@ -59,6 +79,15 @@ class OrderListView(LoginRequiredMixin, ListView):
     model = Order
     template_name = "orders/order_list.html"
     context_object_name = "orders"
+    page_size = 50
+
+    def get_queryset(self):
+        return order_list_qs()
+
+    def get_context_data(self, **kwargs):
+        # Курсорная пагинация вместо загрузки всех заявок одной страницей.
+        page = KeysetPaginator(self.object_list, self.page_size).get_page(self.request.GET.get("cursor"))
+        return super().get_context_data(object_list=page.object_list, page=page, **kwargs)
 
 
 class AssignOrderView(LoginRequiredMixin, View):
@@ -92,11 +121,22 @@ class StatsView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["order_counts"] = (
-            Order.objects.values("status")
-            .annotate(count=Count("id"))
-            .order_by("status")
-        )
+        # Готовые счётчики (core.counters) вместо GROUP BY по всей таблице.
+        context["order_counts"] = counters.status_totals()
+        context["statuses"] = OrderStatus.choices
+        context["breakdowns"] = [
+            ("По категориям", counters.breakdown("category")),
+            ("По дням (последние 30)", counters.breakdown("day", limit=30)),
+        ]
+        # Длительности этапов — из свёрток core.analytics, не из истории.
+        context["stages"] = LifecycleRollup.STAGE_CHOICES
+        durations = analytics.summary()
+        context["durations"] = [
+            ("По категориям", durations["category"]),
+            ("По мастерам", durations["master"]),
+            ("По дням", durations["day"]),
+        ]
+        context["durations_window"] = settings.ANALYTICS_WINDOW_DAYS
         return context
 
 
@@ -107,10 +147,16 @@ def create_order(request):
     if request.method == "POST":
         form = PublicOrderForm(request.POST)
         if form.is_valid():
-            order = form.save(commit=False)
-            order.status = OrderStatus.NEW
-            order.save()
-            return redirect("order_success", order_id=order.id)
+            try:
+                result = intake.submit(form.save(commit=False), request.META.get("REMOTE_ADDR", ""))
+            except intake.RateLimited as e:
+                response = render(request, "public/order_form.html",
+                                  {"form": form, "rate_limit_error": str(e)}, status=429)
+                response["Retry-After"] = str(int(e.retry_after) + 1)
+                return response
+            if result.duplicate:
+                messages.info(request, "Такая заявка уже принята — показываем её.")
+            return redirect("order_success", order_id=result.order.id)
     else:
         form = PublicOrderForm()
 
@@ -122,6 +168,28 @@ def order_success(request, order_id: int):
     return render(request, "public/order_success.html", {"order": order})
 
 
+# ---------- Async-версии частых точек (ASGI) ----------
+#
+# С settings.ASYNC_VIEWS (включается явно, под ASGI-сервером) core.urls
+# ставит их вместо синхронных: представление не занимает поток на весь
+# запрос, а уходит в него только за сессией/пользователем, заявкой и
+# самим переходом. Под WSGI остаются синхронные версии — там async-
+# представление обошлось бы в отдельный цикл событий на каждый запрос.
+
+
+async def _aget_order(order_id: int) -> Order:
+    try:
+        return await Order.objects.aget(id=order_id)
+    except Order.DoesNotExist:
+        raise Http404("Заявка не найдена.")
+
+
+async def aorder_success(request, order_id: int):
+    order = await _aget_order(order_id)
+    await auth.aget_user(request)  # base.html показывает пользователя: сессия читается здесь, не в шаблоне
+    return render(request, "public/order_success.html", {"order": order})
+
+
 # ---------- Dispatcher ----------
 
 
@@ -130,28 +198,148 @@ def dispatcher_orders(request):
     if not require_role(request.user, "dispatcher"):
         return HttpResponseForbidden("Доступ только для диспетчера.")
 
-    qs = Order.objects.select_related("assigned_master").order_by("-created_at")
-
     status = request.GET.get("status")
-    if status in [s[0] for s in OrderStatus.choices]:
-        qs = qs.filter(status=status)
+    if status not in [s[0] for s in OrderStatus.choices]:
+        status = None
+    q = request.GET.get("q", "").strip()
+    qs = search_orders(dispatcher_orders_qs(status), q)
 
-    paginator = Paginator(qs, 20)
-    page = paginator.get_page(request.GET.get("page", 1))
+    page = KeysetPaginator(qs, 20, estimate_total=True).get_page(request.GET.get("cursor"))
+    caching.prefetch_fragments("dispatcher_row", page.object_list)
 
     return render(request, "dispatcher/orders_list.html", {
         "page": page,
         "status_filter": status or "",
+        "q": q,
         "statuses": OrderStatus.choices,
+        "masters": caching.master_roster(),
     })
 
 
+@login_required
+def dispatcher_bulk_action(request):
+    """Массовое назначение/отмена отмеченных в списке заявок одной транзакцией."""
+    if not require_role(request.user, "dispatcher"):
+        return HttpResponseForbidden("Доступ только для диспетчера.")
+    if request.method != "POST":
+        return redirect("dispatcher_orders")
+
+    form = BulkActionForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, " ".join(form.non_field_errors()) or "Некорректные данные.")
+        return redirect("dispatcher_orders")
+
+    data = form.cleaned_data
+    if data["action"] == "assign":
+        master = get_object_or_404(User, id=data["master_id"], role="master")
+        result = bulk_assign(data["order_ids"], request.user, master, planned_date=data.get("planned_date"))
+    elif data["action"] == "auto_assign":
+        result = auto_assign_batch(request.user, order_ids=data["order_ids"])
+    else:
+        result = bulk_cancel(data["order_ids"], request.user)
+
+    if result.updated:
+        messages.success(request, f"Обработано заявок: {len(result.updated)}.")
+    for order_id, error in result.errors.items():
+        messages.error(request, f"Заявка #{order_id}: {error}")
+    return redirect("dispatcher_orders")
+
+
+@login_required
+def dispatcher_export(request):
+    """
+    Выгрузка заявок или истории за период потоком (CSV/XLSX).
+    С background=1 выгрузка уходит в Celery и пишется в файл; ответ —
+    id задачи и адрес, где смотреть прогресс.
+    """
+    if not require_role(request.user, "dispatcher"):
+        return HttpResponseForbidden("Доступ только для диспетчера.")
+
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(" ".join(form.non_field_errors()) or "Некорректные параметры выгрузки.")
+    kind, fmt, filters = form.cleaned_data["kind"], form.cleaned_data["format"], form.filters()
+
+    if request.GET.get("background"):
+        job_id = exports.new_job_id()
+        export_orders_job.apply_async(kwargs={
+            "kind": kind, "fmt": fmt, "status": filters["status"],
+            "date_from": filters["date_from"] and filters["date_from"].isoformat(),
+            "date_to": filters["date_to"] and filters["date_to"].isoformat(),
+        }, task_id=job_id)
+        return JsonResponse({
+            "job_id": job_id,
+            "status_url": reverse("dispatcher_export_status", args=[job_id]),
+        }, status=202)
+
+    _, content_type = exports.FORMATS[fmt]
+    response = StreamingHttpResponse(exports.stream(kind, fmt, **filters), content_type=content_type)
+    response["Content-Disposition"] = (
+        f'attachment; filename="{exports.filename(kind, fmt, filters["date_from"], filters["date_to"])}"'
+    )
+    return response
+
+
+@login_required
+def dispatcher_export_status(request, job_id: str):
+    if not require_role(request.user, "dispatcher"):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    state = exports.progress(job_id)
+    if state is None:
+        return JsonResponse({"error": "not found"}, status=404)
+    # Путь на сервере клиенту не нужен.
+    return JsonResponse({k: v for k, v in state.items() if k != "path"})
+
+
 @login_required
 def dispatcher_new_count(request):
     if not require_role(request.user, "dispatcher"):
         return JsonResponse({"error": "forbidden"}, status=403)
-    cnt = Order.objects.filter(status=OrderStatus.NEW).count()
-    return JsonResponse({"new_count": cnt})
+    return JsonResponse({"new_count": realtime.get_new_count()})
+
+
+@auth.login_required_async
+async def adispatcher_new_count(request):
+    if not require_role(request.user, "dispatcher"):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    return JsonResponse({"new_count": await realtime.aget_new_count()})
+
+
+async def dispatcher_new_count_stream(request):
+    """
+    Счётчик новых заявок без опроса по таймеру.
+
+    Accept: text/event-stream — поток Server-Sent Events, событие только
+    при изменении счётчика; только под ASGI, под WSGI — 204, и клиент
+    переходит на опрос. Иначе под ASGI — long-poll: ответ приходит, когда
+    значение отличается от ?since=, или через LONG_POLL_TIMEOUT секунд.
+    Под WSGI ответ сразу, с интервалом следующего опроса в retry.
+    """
+    if not require_role(await auth.aget_user(request), "dispatcher"):
+        return JsonResponse({"error": "forbidden"}, status=403)
+
+    try:
+        since = int(request.GET["since"])
+    except (KeyError, ValueError):
+        since = None
+
+    if "text/event-stream" in request.headers.get("Accept", ""):
+        if not isinstance(request, ASGIRequest):
+            # WSGI-обработчик Django 4.2 собрал бы async-поток в список до
+            # отправки: клиент ничего не получит, а поток сервера занят.
+            # 204 — сигнал EventSource не переподключаться (dispatcher.js → long-poll).
+            return HttpResponse(status=204)
+        response = StreamingHttpResponse(realtime.new_count_events(since), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    if not isinstance(request, ASGIRequest):
+        # Ожидание заняло бы поток WSGI-сервера на весь таймаут.
+        count = await realtime.aget_new_count()
+        return JsonResponse({"new_count": count, "retry": realtime.WSGI_POLL_INTERVAL})
+    count = await realtime.wait_for_change(since, timeout=realtime.LONG_POLL_TIMEOUT)
+    return JsonResponse({"new_count": count})
 
 
 @login_required
@@ -159,8 +347,10 @@ def dispatcher_order_detail(request, order_id: int):
     if not require_role(request.user, "dispatcher"):
         return HttpResponseForbidden("Доступ только для диспетчера.")
 
-    order = get_object_or_404(Order.objects.select_related("assigned_master", "dispatcher"), id=order_id)
-    masters = User.objects.filter(role="master", is_active=True).order_by("first_name", "username")
+    order = Order.objects.select_related("assigned_master", "dispatcher").filter(id=order_id).first()
+    if order is None:
+        # Закрытая заявка могла уйти в архив (core.archive): карточка только для чтения.
+        return _archived_order_detail(request, order_id)
 
     if request.method == "POST":
         action = request.POST.get("action")
@@ -180,25 +370,51 @@ def dispatcher_order_detail(request, order_id: int):
 
             return redirect("dispatcher_order_detail", order_id=order.id)
 
+        if action == "auto_assign":
+            form = AutoAssignForm(request.POST)
+            if not form.is_valid():
+                return HttpResponseBadRequest("Некорректные данные назначения.")
+            try:
+                master = auto_assign(order, request.user, planned_date=form.cleaned_data.get("planned_date"))
+                messages.success(request,
+                                 f"Заявка #{order.id} назначена мастеру {master.username} автоматически.")
+            except ValueError as e:
+                messages.error(request, str(e))
+            return redirect("dispatcher_order_detail", order_id=order.id)
+
         if action == "cancel":
-            if order.status in [OrderStatus.DONE]:
-                messages.error(request, "Нельзя отменить завершенную заявку.")
-            else:
-                old = order.status
-                order.status = OrderStatus.CANCELLED
-                order.dispatcher = request.user
-                order.save(update_fields=["status", "dispatcher"])
-                from .services import log_status_change
-                log_status_change(order, request.user, old, order.status, comment="Отменено диспетчером")
+            try:
+                cancel_order(order, request.user)
                 messages.success(request, f"Заявка #{order.id} отменена.")
+            except ValueError as e:
+                messages.error(request, str(e))
             return redirect("dispatcher_order_detail", order_id=order.id)
 
+    # История подгружается только для показа карточки: POST выше её не читает.
+    prefetch_related_objects([order], history_prefetch())
     return render(request, "dispatcher/order_detail.html", {
         "order": order,
-        "history": order.history.all(),
-        "masters": masters,
+        "history": order.timeline,
+        "masters": caching.master_roster(),
         "statuses": OrderStatus,
-        "map_url": f"https://yandex.ru/maps/?text={order.address}" if order.address else "",
+        "map_url": geo.map_url(order),
+        # Новые заявки рядом — кандидаты в тот же выезд (core.geo).
+        "nearby": (geo.nearby_new_orders(order.lat, order.lon, exclude=order.id)
+                   if order.lat is not None else []),
+        "nearby_radius": settings.NEARBY_RADIUS_KM,
+    })
+
+
+def _archived_order_detail(request, order_id: int):
+    order = get_object_or_404(archived_order_detail_qs(), id=order_id)
+    if request.method == "POST":
+        messages.error(request, f"Заявка #{order.id} в архиве и не изменяется.")
+        return redirect("dispatcher_order_detail", order_id=order.id)
+    return render(request, "dispatcher/order_detail.html", {
+        "order": order,
+        "history": order.timeline,
+        "archived": True,
+        "map_url": geo.map_url(order),
     })
 
 
@@ -210,12 +426,11 @@ def master_orders(request):
     if not require_role(request.user, "master"):
         return HttpResponseForbidden("Доступ только для мастера.")
 
-    qs = (Order.objects
-          .filter(assigned_master=request.user)
-          .exclude(status=OrderStatus.DONE)
-          .order_by("-created_at"))
+    page = KeysetPaginator(master_active_orders_qs(request.user), 50).get_page(request.GET.get("cursor"))
+    for name in ("master_card", "master_row"):
+        caching.prefetch_fragments(name, page.object_list)
 
-    return render(request, "master/orders_list.html", {"orders": qs})
+    return render(request, "master/orders_list.html", {"orders": page.object_list, "page": page})
 
 
 @login_required
@@ -223,12 +438,28 @@ def master_order_detail(request, order_id: int):
     if not require_role(request.user, "master"):
         return HttpResponseForbidden("Доступ только для мастера.")
 
-    order = get_object_or_404(Order, id=order_id, assigned_master=request.user)
+    order = get_object_or_404(order_detail_qs(), id=order_id, assigned_master=request.user)
     return render(request, "master/order_detail.html", {
         "order": order,
-        "history": order.history.all(),
+        "history": order.timeline,
         "statuses": OrderStatus,
-        "map_url": f"https://yandex.ru/maps/?text={order.address}" if order.address else "",
+        "map_url": geo.map_url(order),
+    })
+
+
+@login_required
+def master_route(request):
+    """Порядок объезда заявок мастера на день ?date=ГГГГ-ММ-ДД (по умолчанию сегодня)."""
+    if not require_role(request.user, "master"):
+        return HttpResponseForbidden("Доступ только для мастера.")
+
+    day = parse_date(request.GET.get("date") or "") or timezone.localdate()
+    stops, total_km = geo.master_route(request.user, day)
+    return render(request, "master/route.html", {
+        "day": day,
+        "stops": stops,
+        "total_km": total_km,
+        "route_url": geo.route_url(stops, settings.ROUTE_START),
     })
 
 
@@ -261,3 +492,101 @@ def master_complete(request, order_id: int):
     except Exception as e:
         return JsonResponse({"ok": False, "error": str(e)}, status=400)
 
+
+async def _master_action(request, order_id: int, action):
+    if not require_role(request.user, "master"):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    if request.method != "POST":
+        return JsonResponse({"error": "method"}, status=405)
+
+    order = await _aget_order(order_id)
+    try:
+        await action(order, request.user)
+        return JsonResponse({"ok": True})
+    except Exception as e:
+        return JsonResponse({"ok": False, "error": str(e)}, status=400)
+
+
+@auth.login_required_async
+async def amaster_start(request, order_id: int):
+    return await _master_action(request, order_id, astart_order)
+
+
+@auth.login_required_async
+async def amaster_complete(request, order_id: int):
+    return await _master_action(request, order_id, acomplete_order)
+
+
+# ---------- Master JSON API ----------
+
+
+def _master_etag(request, *args, **kwargs):
+    # ETag — версия заявок мастера (core.sync): If-None-Match сверяется без запроса к заявкам.
+    if request.user.is_authenticated and request.user.role == "master":
+        return sync.etag(request.user.id)
+    return None
+
+
+def _parse_since(value: str):
+    # «+» смещения в неэкранированном query string превращается в пробел.
+    since = parse_datetime(value.replace(" ", "+"))
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_master_etag)
+def api_master_orders(request):
+    """
+    Открытые заявки мастера. Без since — полный список; с ?since=<server_time
+    прошлого ответа> — только изменившиеся заявки и id ушедших из списка.
+    """
+    if not require_role(request.user, "master"):
+        return JsonResponse({"error": "forbidden"}, status=403)
+
+    since = None
+    if request.GET.get("since"):
+        since = _parse_since(request.GET["since"])
+        if since is None:
+            return JsonResponse({"error": "since: ожидается дата и время ISO 8601"}, status=400)
+
+    now = timezone.now()
+    full = since is None or sync.needs_full_sync(request.user.id, since)
+    qs = master_open_orders_qs(request.user)
+    removed = []
+    if not full:
+        changed = set(OrderHistory.objects
+                      .filter(order__assigned_master=request.user, timestamp__gt=since - sync.SINCE_OVERLAP)
+                      .values_list("order_id", flat=True).distinct())
+        qs = qs.filter(id__in=changed) if changed else qs.none()
+    orders = [sync.order_data(o) for o in qs]
+    if not full:
+        removed = sorted(changed - {o["id"] for o in orders})
+    return JsonResponse({"server_time": now.isoformat(), "full": full, "orders": orders, "removed": removed})
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_master_etag)
+def api_master_order_detail(request, order_id: int):
+    if not require_role(request.user, "master"):
+        return JsonResponse({"error": "forbidden"}, status=403)
+
+    order = order_detail_qs().filter(id=order_id, assigned_master=request.user).first()
+    if order is None:
+        return JsonResponse({"error": "not found"}, status=404)
+    return JsonResponse({**sync.order_data(order), "history": [sync.history_data(h) for h in order.timeline]})
+
+
+# ---------- Metrics ----------
+
+
+def metrics_view(request):
+    """Метрики процесса в текстовом формате Prometheus (см. core.metrics)."""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden("Доступ запрещён.")
+    extra = caching.prometheus_lines() + notifications.prometheus_lines()
+    return HttpResponse(registry.render_prometheus(extra=extra),
+                        content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,124 @@
+"""
+Индекс загрузки мастеров в памяти процесса (для core.assignment).
+
+Загрузка мастера — его открытые заявки (ASSIGNED/IN_PROGRESS) с плановыми
+датами. Вместо COUNT по заявкам на каждый запрос индекс загружается
+целиком один раз и затем меняется инкрементально: core.services сообщает
+о каждой смене статуса (track_load_changes), изменения применяются после
+фиксации транзакции.
+
+Правки в обход сервисов (админка) и в других процессах индекс видит
+только после полной перезагрузки раз в REFRESH_SECONDS. Изменение
+мастера (post_save User) сбрасывает индекс сразу.
+"""
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from .models import Order, OrderStatus, User, parse_categories
+
+OPEN_STATUSES = (OrderStatus.ASSIGNED, OrderStatus.IN_PROGRESS)
+REFRESH_SECONDS = 300
+
+
+@dataclass(frozen=True)
+class MasterInfo:
+    id: int
+    username: str
+    categories: frozenset
+
+
+class LoadIndex:
+    """Открытые заявки мастеров: {master_id: {order_id: planned_date}}."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded_at = None
+        self.masters = {}
+        self.by_category = {}
+        self.generalists = ()
+        self.open = {}
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded_at = None
+
+    def ensure_loaded(self):
+        with self.lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at > REFRESH_SECONDS:
+                self.reload()
+
+    def reload(self):
+        """Полная загрузка: два запроса — мастера и их открытые заявки."""
+        masters = {
+            row["id"]: MasterInfo(row["id"], row["username"], parse_categories(row["categories"]))
+            for row in User.objects.filter(role="master", is_active=True).values("id", "username", "categories")
+        }
+        open_orders = defaultdict(dict)
+        rows = (Order.objects
+                .filter(status__in=OPEN_STATUSES, assigned_master__isnull=False)
+                .values_list("assigned_master_id", "id", "planned_date"))
+        for master_id, order_id, planned in rows.iterator(chunk_size=5000):
+            open_orders[master_id][order_id] = planned
+
+        by_category = defaultdict(list)
+        for m in masters.values():
+            for category in m.categories:
+                by_category[category].append(m.id)
+        with self.lock:
+            self.masters = masters
+            self.by_category = {k: tuple(v) for k, v in by_category.items()}
+            self.generalists = tuple(m.id for m in masters.values() if not m.categories)
+            self.open = open_orders
+            self.loaded_at = time.monotonic()
+
+    def load(self, master_id: int) -> int:
+        return len(self.open.get(master_id, ()))
+
+    def apply(self, changes):
+        """
+        changes: [(master_id, order_id, planned_date, стала ли открытой)].
+
+        Словари заявок мастеров не меняются на месте, а заменяются копией:
+        Planner читает их без блокировки из других потоков, и обход словаря,
+        изменённого посреди итерации, упал бы с RuntimeError.
+        """
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            for master_id, order_id, planned, is_open in changes:
+                orders = dict(self.open.get(master_id, {}))
+                if is_open:
+                    orders[order_id] = planned
+                else:
+                    orders.pop(order_id, None)
+                self.open[master_id] = orders
+
+
+index = LoadIndex()
+
+
+def track_load_changes(changes):
+    """
+    Учесть переходы [(заявка, старый статус, новый)] в индексе загрузки после
+    фиксации транзакции. Вызывается из core.services вместе со счётчиками.
+    """
+    updates = []
+    for order, old_status, new_status in changes:
+        was_open, is_open = old_status in OPEN_STATUSES, new_status in OPEN_STATUSES
+        if was_open != is_open and order.assigned_master_id:
+            updates.append((order.assigned_master_id, order.id, order.planned_date, is_open))
+    if updates:
+        transaction.on_commit(lambda: index.apply(updates))
+
+
+def invalidate_masters(sender, instance, **kwargs):
+    """Обработчик post_save/post_delete User: состав мастеров или их категории изменились."""
+    update_fields = kwargs.get("update_fields")
+    if update_fields and set(update_fields) <= {"last_login", "password"}:
+        return  # вход в систему и смена пароля на назначение не влияют
+    if instance.role == "master" or instance.id in index.masters:
+        index.invalidate()
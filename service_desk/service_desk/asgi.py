@@ -1,6 +1,9 @@
+# Асинхронные представления (поток счётчика новых заявок
+# dispatcher_new_count_stream, частые точки мастера и диспетчера — см.
+# ASYNC_VIEWS в settings, включается явно) работают без выделения потока
+# на соединение только под ASGI-сервером: uvicorn service_desk.asgi:application
 import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "service_desk.settings")
 application = get_asgi_application()
-
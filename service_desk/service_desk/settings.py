@@ -1,5 +1,10 @@
+import os
 from pathlib import Path
 
+import django
+from celery.schedules import crontab
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = "dev-secret-key-change-me"
@@ -17,23 +22,44 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Собранная статика из STATIC_ROOT: .gz/.br, Cache-Control: immutable (core.staticfiles)
+    "core.middleware.StaticFilesMiddleware",
+    "core.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
-    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # AuthenticationMiddleware + пользователь из кэша процесса (USER_CACHE_TTL)
+    "core.middleware.CachedAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
 ROOT_URLCONF = "service_desk.urls"
 
+# Загрузка шаблонов. По умолчанию (production) — кэширующий загрузчик, тот
+# же, что Django 4.2 включает сам: шаблон разбирается один раз на процесс,
+# runserver сбрасывает кэш при правке шаблона. Он записан явно только ради
+# отладочного переключателя TEMPLATE_PROFILE=reload — разбирать шаблоны
+# заново при каждом рендеринге (сравнение в bench_render); только с DEBUG.
+TEMPLATE_PROFILE = os.environ.get("TEMPLATE_PROFILE", "production")
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+TEMPLATE_PROFILES = {
+    "production": [("django.template.loaders.cached.Loader", TEMPLATE_LOADERS)],
+    "reload": TEMPLATE_LOADERS,
+}
+if TEMPLATE_PROFILE == "reload" and not DEBUG:
+    raise ImproperlyConfigured("TEMPLATE_PROFILE=reload — отладочный режим, он требует DEBUG.")
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
-        "APP_DIRS": True,
         "OPTIONS": {
+            "loaders": TEMPLATE_PROFILES[TEMPLATE_PROFILE],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -46,12 +72,81 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "service_desk.wsgi.application"
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# Профиль базы данных задаётся окружением (DB_PROFILE):
+#   sqlite        — как раньше, файл db.sqlite3 (по умолчанию);
+#   sqlite-tuned  — SQLite для небольших установок: WAL, synchronous=NORMAL
+#                   (PRAGMA выставляет core.db при подключении) и ожидание
+#                   блокировки записи до DB_BUSY_TIMEOUT секунд (20 по умолчанию);
+#   postgres      — PostgreSQL с постоянными соединениями и health-check.
+# Пул соединений (DB_POOL): "pgbouncer" — внешний PgBouncer в режиме транзакций,
+# "native" — встроенный пул psycopg (Django 5.1+).
+DB_PROFILE = os.environ.get("DB_PROFILE", "sqlite")
+DB_POOL = os.environ.get("DB_POOL", "")
+
+if DB_PROFILE == "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "service_desk"),
+            "USER": os.environ.get("DB_USER", "service_desk"),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", "127.0.0.1"),
+            "PORT": os.environ.get("DB_PORT", "5432"),
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
     }
-}
+    if DB_POOL == "pgbouncer":
+        # Соединения держит PgBouncer; серверные курсоры несовместимы с режимом транзакций.
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = True
+    elif DB_POOL == "native":
+        # До 5.1 OPTIONS уходят в psycopg.connect как есть, и "pool" ломает каждое подключение.
+        if django.VERSION < (5, 1):
+            raise ImproperlyConfigured("DB_POOL=native требует Django 5.1+; используйте DB_POOL=pgbouncer.")
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN", "2")),
+            "max_size": int(os.environ.get("DB_POOL_MAX", "20")),
+        }
+else:
+    DATABASES = {
+        "default": {
+            # BEGIN IMMEDIATE вместо BEGIN: см. core/backends/sqlite3/base.py
+            "ENGINE": "core.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+        }
+    }
+    if DB_PROFILE == "sqlite-tuned":
+        DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", "60"))
+        # Единственный источник ожидания блокировки: timeout модуля sqlite3 и есть
+        # busy_timeout соединения, поэтому в SQLITE_PRAGMAS его нет.
+        DATABASES["default"]["OPTIONS"] = {"timeout": float(os.environ.get("DB_BUSY_TIMEOUT", "20"))}
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+} if DB_PROFILE == "sqlite-tuned" else {}
+
+# Хранение сессий задаётся окружением (SESSION_PROFILE):
+#   db              — таблица django_session, запрос на каждый запрос (по умолчанию);
+#   cached_db       — кэш default с записью в базу: чтение из кэша;
+#   signed_cookies  — сессия в подписанной cookie, без хранилища на сервере
+#                     (выход не отзывает копии cookie; данные видны клиенту).
+SESSION_PROFILE = os.environ.get("SESSION_PROFILE", "db")
+SESSION_ENGINE = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}[SESSION_PROFILE]
+# Пользователь запроса в памяти процесса (core.auth), секунды; 0 — выключено
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "30"))
+# Async-версии частых точек (master_start/complete, dispatcher_new_count,
+# order_success) вместо синхронных. Только по явному ASYNC_VIEWS=1 и только
+# под ASGI: под WSGI async-представление стоит отдельного цикла событий на
+# запрос, а на SQLite замеры bench_asgi не показали выигрыша и под ASGI.
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "") == "1"
 
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -67,6 +162,15 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "static"] if (BASE_DIR / "static").exists() else []
+# collectstatic: имена с хэшем содержимого (манифест) и варианты .gz/.br,
+# отдача — core.middleware.StaticFilesMiddleware (см. core/staticfiles.py)
+STATIC_ROOT = Path(os.environ.get("STATIC_ROOT", BASE_DIR / "staticfiles"))
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "core.staticfiles.CompressedManifestStaticFilesStorage"},
+}
+# Cache-Control для файлов без хэша в имени, секунды
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", "60"))
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # ВАЖНО: кастомный пользователь
@@ -76,3 +180,106 @@ AUTH_USER_MODEL = "core.User"
 LOGIN_URL = "login"
 LOGOUT_REDIRECT_URL = "login"
 
+
+# Celery: без брокера задачи выполняются синхронно (режим разработки);
+# релей уведомлений тогда не запускается из запроса — см. manage.py relay_outbox
+CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "")
+CELERY_TASK_ALWAYS_EAGER = not CELERY_BROKER_URL
+
+# Кэши: locmem в одном процессе, общий Redis при CACHE_URL (несколько
+# процессов). "fragments" — отрендеренные строки заявок (core.caching),
+# отдельно, чтобы их вытеснение не задевало лимиты и прогресс выгрузок.
+CACHE_URL = os.environ.get("CACHE_URL", "")
+if CACHE_URL:
+    CACHES = {
+        alias: {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+            "KEY_PREFIX": f"sd:{alias}",
+            "TIMEOUT": 3600,
+        }
+        for alias in ("default", "fragments")
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "default",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        },
+        "fragments": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "fragments",
+            "TIMEOUT": 3600,
+            "OPTIONS": {"MAX_ENTRIES": 20000},
+        },
+    }
+
+# Уведомления (core.notifications): окно склейки в секундах и SMS-бэкенд
+NOTIFICATION_WINDOW = int(os.environ.get("NOTIFICATION_WINDOW", "30"))
+SMS_BACKEND = os.environ.get("SMS_BACKEND", "core.notifications.LoggingSmsBackend")
+# Релей outbox: размер пачки, аренда пачки воркером (с), первая задержка
+# повтора (с, далее удваивается), попыток до FAILED, хранение отправленных (дни)
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_LEASE = int(os.environ.get("OUTBOX_LEASE", "60"))
+OUTBOX_RETRY_BASE = int(os.environ.get("OUTBOX_RETRY_BASE", "30"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETENTION_DAYS = int(os.environ.get("OUTBOX_RETENTION_DAYS", "7"))
+
+# Публичный приём заявок (core.intake): кэш состояния, лимиты
+# «ёмкость, период в секундах» по IP и по контакту, окно поиска дублей
+INTAKE_CACHE = os.environ.get("INTAKE_CACHE", "default")
+INTAKE_RATE_LIMITS = {
+    "ip": (int(os.environ.get("INTAKE_IP_LIMIT", "10")), 3600),
+    "contact": (int(os.environ.get("INTAKE_CONTACT_LIMIT", "3")), 3600),
+}
+INTAKE_DEDUP_WINDOW = int(os.environ.get("INTAKE_DEDUP_WINDOW", "600"))
+
+# Архивация закрытых заявок (core.archive): через сколько дней после
+# закрытия, пачками по сколько заявок; запуск — Celery beat каждую ночь
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "500"))
+CELERY_BEAT_SCHEDULE = {
+    "archive-closed-orders": {
+        "task": "core.tasks.archive_closed_orders",
+        "schedule": crontab(hour=3, minute=30),
+    },
+    "relay-outbox": {
+        "task": "core.tasks.relay_outbox",
+        "schedule": crontab(),  # каждую минуту: повторы и пропущенные окна
+    },
+    "purge-outbox": {
+        "task": "core.tasks.purge_outbox",
+        "schedule": crontab(hour=4, minute=0),
+    },
+    "geocode-pending-orders": {
+        "task": "core.tasks.geocode_pending_orders",
+        "schedule": crontab(minute="*/10"),
+    },
+    "refresh-lifecycle-rollups": {
+        "task": "core.tasks.refresh_lifecycle_rollups",
+        "schedule": crontab(minute="*/15"),  # = core.analytics.SUMMARY_TTL
+    },
+}
+
+# Координаты заявок (core.geo): геокодер, офлайн-справочник для него,
+# пачка фоновой обработки, радиус «рядом» (км) и точка старта маршрута
+# мастера «широта,долгота» (пусто — от первой по времени заявки)
+GEOCODER_BACKEND = os.environ.get("GEOCODER_BACKEND", "core.geo.GazetteerGeocoder")
+GEOCODER_GAZETTEER = os.environ.get("GEOCODER_GAZETTEER", str(BASE_DIR / "core" / "data" / "gazetteer.csv"))
+GEOCODER_API_KEY = os.environ.get("GEOCODER_API_KEY", "")
+GEOCODER_TIMEOUT = float(os.environ.get("GEOCODER_TIMEOUT", "5"))
+GEOCODER_BATCH_SIZE = int(os.environ.get("GEOCODER_BATCH_SIZE", "200"))
+NEARBY_RADIUS_KM = float(os.environ.get("NEARBY_RADIUS_KM", "2"))
+ROUTE_START = tuple(map(float, os.environ["ROUTE_START"].split(","))) if os.environ.get("ROUTE_START") else None
+
+# Длительности этапов заявки (core.analytics): сколько последних дней
+# пересчитывает задача по расписанию и за сколько дней строится страница
+ANALYTICS_REFRESH_DAYS = int(os.environ.get("ANALYTICS_REFRESH_DAYS", "2"))
+ANALYTICS_WINDOW_DAYS = int(os.environ.get("ANALYTICS_WINDOW_DAYS", "30"))
+
+# Фоновые выгрузки (core.exports): каталог файлов
+EXPORT_ROOT = os.environ.get("EXPORT_ROOT", str(BASE_DIR / "exports"))
+
+# /metrics (Prometheus): доступ с этих адресов или для is_staff
+METRICS_ALLOWED_IPS = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1").split(",")
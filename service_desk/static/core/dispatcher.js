@@ -0,0 +1,50 @@
+// Список заявок диспетчера: таблица DataTables и счётчик новых заявок.
+// Адрес потока счётчика — атрибут data-stream-url тега <script>.
+(function () {
+  var streamUrl = document.currentScript.dataset.streamUrl;
+
+  $(function () {
+    // Страницы, поиск (?q=) и порядок строк задаёт сервер (курсорная
+    // пагинация): DataTables видит только текущую страницу, поэтому его
+    // собственные пагинация, поиск, сортировка и «Записи с … по …» выключены.
+    $("#ordersTable").DataTable({
+      paging: false,
+      searching: false,
+      info: false,
+      ordering: false,
+      language: { url: "https://cdn.datatables.net/plug-ins/1.13.8/i18n/ru.json" }
+    });
+
+    // Счётчик новых заявок приходит с сервера только при изменении:
+    // Server-Sent Events (под ASGI), а без EventSource или когда сервер
+    // отказался от потока (WSGI отвечает 204) — long-poll того же адреса.
+    // WSGI не ждёт изменения: отвечает сразу и передаёт в retry, через
+    // сколько секунд спросить снова.
+    var last;
+    function showNewCount(count) { last = count; $("#newCountBadge").text(count); }
+
+    function longPoll(since) {
+      $.getJSON(streamUrl, since === undefined ? {} : {since: since})
+        .done(function (data) {
+          showNewCount(data.new_count);
+          if (data.retry) {
+            setTimeout(function () { longPoll(data.new_count); }, data.retry * 1000);
+          } else {
+            longPoll(data.new_count);
+          }
+        })
+        .fail(function () { setTimeout(function () { longPoll(since); }, 5000); });
+    }
+
+    if (window.EventSource) {
+      var source = new EventSource(streamUrl);
+      source.addEventListener("new_count", function (e) { showNewCount(e.data); });
+      source.onerror = function () {
+        // CLOSED — браузер не будет переподключаться (204, не тот Content-Type).
+        if (source.readyState === EventSource.CLOSED) { longPoll(last); }
+      };
+    } else {
+      longPoll();
+    }
+  });
+})();
@@ -0,0 +1,25 @@
+// Кнопки мастера «Начать» / «Завершить» (список заявок и карточка заявки).
+// CSRF-токен и адрес после завершения приходят атрибутами тега <script>:
+// data-csrf, data-after-complete (без него строка заявки просто скрывается).
+(function () {
+  var options = document.currentScript.dataset;
+
+  function post(orderId, action) {
+    return $.post("/master/order/" + orderId + "/" + action + "/", {"csrfmiddlewaretoken": options.csrf})
+      .fail(function (xhr) { alert(xhr.responseJSON?.error || "Ошибка"); });
+  }
+
+  window.startOrder = function (orderId) {
+    post(orderId, "start").done(function () { location.reload(); });
+  };
+
+  window.completeOrder = function (orderId) {
+    post(orderId, "complete").done(function () {
+      if (options.afterComplete) {
+        window.location.href = options.afterComplete;
+      } else {
+        $("#order_" + orderId).fadeOut();
+      }
+    });
+  };
+})();